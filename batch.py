@@ -0,0 +1,98 @@
+"""
+Batch exam papers for printed, proctored sessions.
+
+Generates reproducible paper variants from one or more missions, then grades a CSV of
+answer sheets (Candidate, Variant, Q1, Q2, ... holding the marked option letters) against
+the manifest written with the papers:
+
+    python batch.py generate --mission "Mission Alpha (Default)" --questions 50 --variants 300 --seed 7 --output papers
+    python batch.py grade --manifest papers/manifest.json --sheets sheets.csv --output results.csv
+
+Run it from the app's directory, so it reads the same question store as the app.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from quiz.papers import MANIFEST_FILE, generate_variants, grade_sheet_file, write_papers
+
+# Answer sheet files smaller than this are graded in this process; a pool only adds start-up time.
+GRADE_POOL_MIN_BYTES = 16 * 1024 * 1024
+
+
+def generate(args):
+    """Writes args.variants papers and their manifest to args.output."""
+    started = time.perf_counter()
+    try:
+        bank, papers = generate_variants(args.mission, args.questions, args.variants, args.seed, args.distinct)
+    except KeyError as e:
+        print(f"error: {e.args[0]}", file=sys.stderr)
+        return 1
+    write_papers(args.output, bank, papers, args.seed, args.distinct)
+    shortest = min(len(paper) for paper in papers)
+    print(
+        f"{len(papers)} papers of {shortest}-{max(len(paper) for paper in papers)} questions written to "
+        f"{args.output} in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+    if shortest < args.questions:
+        print(f"warning: the missions hold fewer than {args.questions} questions for some papers", file=sys.stderr)
+    return 0
+
+
+def grade(args):
+    """Grades args.sheets against args.manifest and writes one result row per sheet."""
+    started = time.perf_counter()
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if args.workers > 1 and os.path.getsize(args.sheets) >= GRADE_POOL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = grade_sheet_file(args.sheets, manifest, pool)
+    else:
+        results = grade_sheet_file(args.sheets, manifest)
+    results.to_csv(args.output or sys.stdout, index=False)
+
+    unknown = int(results["Total"].isna().sum())
+    print(
+        f"{len(results)} sheets graded in {time.perf_counter() - started:.1f}s, "
+        f"mean score {results['Score %'].mean():.1f}%",
+        file=sys.stderr,
+    )
+    if unknown:
+        print(f"warning: {unknown} sheets name a variant that isn't in the manifest", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="write seeded paper variants and their manifest")
+    generate_parser.add_argument("--mission", action="append", required=True, help="mission to draw from (repeat for several)")
+    generate_parser.add_argument("--questions", type=int, required=True, help="questions per paper")
+    generate_parser.add_argument("--variants", type=int, required=True, help="number of distinct papers")
+    generate_parser.add_argument("--seed", type=int, default=0, help="seed; the same seed reproduces the same papers")
+    generate_parser.add_argument("--distinct", action="store_true", help="skip near-duplicate questions")
+    generate_parser.add_argument("--output", required=True, help=f"directory for the papers and {MANIFEST_FILE}")
+
+    grade_parser = commands.add_parser("grade", help="grade a CSV of answer sheets")
+    grade_parser.add_argument("--manifest", required=True, help=f"{MANIFEST_FILE} written by generate")
+    grade_parser.add_argument("--sheets", required=True, help="answer sheet CSV: Candidate, Variant, Q1, Q2, ...")
+    grade_parser.add_argument("--output", help="results CSV (stdout if omitted)")
+    grade_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="grading processes for large files")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        if args.questions < 1 or args.variants < 1:
+            parser.error("--questions and --variants must be at least 1")
+        return generate(args)
+    return grade(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Headless benchmark suite for the quiz hot paths.
+
+Generates synthetic bilingual banks in the questions.csv layout, then times upload
+ingestion, bank loading, uniform, near-duplicate-free and adaptive exam sampling,
+grading, Study Notes paging and full script reruns (through Streamlit's AppTest) for
+each bank size. The JSON report can be compared against an earlier run to catch
+regressions:
+
+    python bench.py --sizes 100 1000 10000 --output bench.json
+    python bench.py --compare bench.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from quiz.answers import grade_answers
+from quiz.ingest import ingest_csv
+from quiz.missions import delete_test, load_test
+from quiz.runtime import get_bank_cache, get_store
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.py")
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+EXAM_SIZE = 100
+# A metric counts as a regression when it is this much slower than the baseline.
+REGRESSION_THRESHOLD = 0.25
+
+HINDI_WORDS = ["हवाई", "अड्डा", "सुरक्षा", "यात्री", "सामान", "जांच", "विमान", "टर्मिनल", "कर्मचारी", "नियम"]
+ENGLISH_WORDS = ["airport", "security", "passenger", "baggage", "screening", "aircraft", "terminal", "staff", "rule", "cargo"]
+# English text draws from numbered variants of these words, so unrelated synthetic questions share
+# about as few words as real ones and aren't indexed as near-duplicates of each other.
+ENGLISH_VOCABULARY = [f"{word}{i}" for word in ENGLISH_WORDS for i in range(100)]
+
+
+def make_synthetic_bank(n, seed=0):
+    """Returns a DataFrame of n distinct questions with English and Hindi text, in the questions.csv layout."""
+    rng = np.random.default_rng(seed)
+
+    def sentences(words, count, length):
+        picks = rng.integers(0, len(words), size=(count, length))
+        return [" ".join(words[i] for i in row) for row in picks]
+
+    df = pd.DataFrame({"Question Number": np.arange(1, n + 1)})
+    df["Question (English)"] = [f"Q{i}: {text}?" for i, text in enumerate(sentences(ENGLISH_VOCABULARY, n, 12))]
+    df["Question (Hindi)"] = [f"प्र{i}: {text}?" for i, text in enumerate(sentences(HINDI_WORDS, n, 12))]
+    for letter in ["A", "B", "C", "D"]:
+        df[f"Option {letter} (English)"] = [f"{letter}{i} {text}" for i, text in enumerate(sentences(ENGLISH_VOCABULARY, n, 4))]
+        df[f"Option {letter} (Hindi)"] = sentences(HINDI_WORDS, n, 4)
+    correct = rng.integers(0, 4, size=n)
+    options_en = df[[f"Option {letter} (English)" for letter in "ABCD"]].to_numpy()
+    options_hi = df[[f"Option {letter} (Hindi)" for letter in "ABCD"]].to_numpy()
+    # Mix the two accepted answer formats: full option text and a bare letter.
+    df["Correct Answer (English)"] = np.where(
+        np.arange(n) % 2 == 0, options_en[np.arange(n), correct], np.array(list("ABCD"))[correct]
+    )
+    df["Correct Answer (Hindi)"] = options_hi[np.arange(n), correct]
+    return df
+
+
+def timed(fn, repeat):
+    """Runs fn repeat times and returns (median ms, p95 ms, last result)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return {"median_ms": statistics.median(samples), "p95_ms": p95}, result
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def bench_rerun(screen, test_name, session, repeat):
+    """Times full script reruns of one screen through AppTest, with the given session state."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    for key, value in session.items():
+        at.session_state[key] = value
+    at.session_state["selected_test"] = test_name
+    at.session_state["current_screen"] = screen
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{screen} screen failed: {at.exception}")
+    stats, _ = timed(at.run, repeat)
+    return stats
+
+
+def bench_size(n, repeat):
+    """Runs every benchmark against a synthetic bank of n questions."""
+    test_name = f"Bench {n}"
+    csv_bytes = make_synthetic_bank(n).to_csv(index=False).encode("utf-8")
+    results = {"questions": n, "csv_bytes": len(csv_bytes)}
+
+    started = time.perf_counter()
+    report = ingest_csv(io.BytesIO(csv_bytes), test_name, get_store())
+    elapsed = time.perf_counter() - started
+    if not report.ok:
+        raise RuntimeError(f"Ingest failed for {n} questions: {report.fatal}")
+
+    # Peak memory is measured on a second import, since tracing slows allocation-heavy code down.
+    tracemalloc.start()
+    ingest_csv(io.BytesIO(csv_bytes), f"{test_name} (traced)", get_store())
+    peak_traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    delete_test(f"{test_name} (traced)")
+    results["ingest"] = {
+        "seconds": elapsed,
+        "rows_per_second": report.rows_per_second,
+        "peak_traced_mb": peak_traced / (1024 * 1024),
+        "rows_written": report.rows_written,
+    }
+
+    cache = get_bank_cache()
+
+    def cold_load():
+        cache.invalidate(test_name)
+        return load_test(test_name)
+
+    results["load_cold"], bank = timed(cold_load, max(1, repeat // 4))
+    results["load_cached"], _ = timed(lambda: load_test(test_name), repeat)
+
+    k = min(EXAM_SIZE, n)
+    results["sample"], question_ids = timed(lambda: bank.sample(k), repeat)
+    bank.duplicate_groups()  # group labels are loaded once per bank, like the adaptive statistics
+    results["sample_distinct"], _ = timed(lambda: bank.sample(k, distinct=True), repeat)
+    bank.adaptive_sampler()  # statistics are loaded once per bank, outside the timed draw
+    results["sample_adaptive"], _ = timed(lambda: bank.sample_adaptive(k), repeat)
+    results["fetch_question"], _ = timed(lambda: bank.row(question_ids[0]), repeat)
+
+    # Grade a whole-bank exam to exercise the vectorized path at full size.
+    all_ids = bank.first_question_id + np.arange(n)
+    answers = np.random.default_rng(1).integers(-1, 4, size=n).astype(np.int8)
+    results["grade_full_bank"], _ = timed(
+        lambda: grade_answers(answers, bank.answer_key[bank.positions(all_ids)]).sum(), repeat
+    )
+    results["notes_page"], _ = timed(lambda: bank.page(0, min(25, n)), repeat)
+
+    exam_answers = np.random.default_rng(2).integers(0, 4, size=k).astype(np.int8)
+    exam_state = {
+        "question_ids": question_ids,
+        "answers": array("b", exam_answers.tobytes()),
+        "test_started": True,
+    }
+    results["rerun_notes"] = bench_rerun("notes", test_name, {}, repeat)
+    results["rerun_results"] = bench_rerun("results", test_name, {**exam_state, "test_submitted": True}, repeat)
+    results["rerun_test"] = bench_rerun("test", test_name, exam_state, repeat)
+    results["max_rss_mb"] = max_rss_mb()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(APP_PATH), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Prints metrics that got slower than the baseline by more than REGRESSION_THRESHOLD. Returns the count."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    for size, metrics in report["results"].items():
+        for name, value in metrics.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not isinstance(value, dict) or not isinstance(old, dict) or "median_ms" not in value:
+                continue
+            if old["median_ms"] > 0 and value["median_ms"] > old["median_ms"] * (1 + REGRESSION_THRESHOLD):
+                regressions += 1
+                print(f"REGRESSION {size} {name}: {old['median_ms']:.3f} ms -> {value['median_ms']:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="bank sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions per timed operation")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="quiz-bench-") as workdir:
+        # The app keeps its stores relative to the working directory.
+        os.chdir(workdir)
+        try:
+            for n in args.sizes:
+                report["results"][str(n)] = bench_size(n, args.repeat)
+                print(f"{n:>7} questions: done", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare and compare(report, args.compare):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
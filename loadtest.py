@@ -0,0 +1,245 @@
+"""
+Load test: simulated candidates taking exams concurrently against one app worker.
+
+Each simulated candidate is a Streamlit session driven through the real script with
+AppTest. It opens the home screen, launches a mission from its setup screen, answers and
+moves through every question, then submits and lands on the results screen, pausing for a
+random think time between actions. For each number of concurrent candidates, the report
+gives rerun latency percentiles (overall and per step), throughput and resident memory
+per session. No browser or network is needed:
+
+    python loadtest.py --users 1 5 10 20 --bank-size 1000 --questions 20 --think 0.5
+    python loadtest.py --users 10 --state-server --output load.json
+
+AppTest runs the script in this process and swaps process-wide Streamlit globals on each
+run, so script runs are executed one at a time. Sessions, think time and the app's
+background threads still overlap. A real worker's script runs also share one core (the
+GIL), so time spent queueing for a run approximates the slowdown candidates would see.
+Answering and navigating rerun the whole script here, where the browser only reruns the
+question fragment, so those latencies are an upper bound.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench import APP_PATH, git_commit, make_synthetic_bank, max_rss_mb
+from quiz import runtime
+from quiz.ingest import ingest_csv
+from quiz.runtime import get_store
+from quiz.stateserver import start_server
+
+DEFAULT_USERS = [1, 5, 10, 20]
+QUANTILES = (50, 95, 99)
+# Steps of one exam, in order; latencies are reported for each.
+STEPS = ("home", "setup", "launch", "answer", "next", "submit")
+
+_run_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """Resident set size of this process right now, in MB (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return max_rss_mb()
+
+
+def percentiles(samples):
+    """Returns {"p50_ms", "p95_ms", "p99_ms"} of a list of seconds."""
+    if not samples:
+        return {}
+    values = np.percentile(np.asarray(samples) * 1000, QUANTILES)
+    return {f"p{q}_ms": float(value) for q, value in zip(QUANTILES, values)}
+
+
+class Candidate:
+    """One simulated candidate: a Streamlit session and the latency of every rerun it triggered."""
+
+    def __init__(self, test_name, questions, timer_minutes, think, seed):
+        from streamlit.testing.v1 import AppTest
+
+        self.test_name = test_name
+        self.questions = questions
+        self.timer_minutes = timer_minutes
+        self.think = think
+        self.rng = random.Random(seed)
+        self.app = AppTest.from_file(APP_PATH, default_timeout=120)
+        self.latencies = {step: [] for step in STEPS}
+        self.service = []
+        self.error = None
+
+    def pause(self):
+        """Waits an exponentially distributed think time with mean self.think."""
+        if self.think > 0:
+            time.sleep(self.rng.expovariate(1 / self.think))
+
+    def rerun(self, step):
+        """Runs the script once, recording the latency including the wait for earlier runs to finish."""
+        started = time.perf_counter()
+        with _run_lock:
+            run_started = time.perf_counter()
+            self.app.run()
+            finished = time.perf_counter()
+        self.latencies[step].append(finished - started)
+        self.service.append(finished - run_started)
+        if self.app.exception:
+            raise RuntimeError(f"{step} failed: {self.app.exception[0].value}")
+
+    def button(self, label):
+        return next(button for button in self.app.button if label in button.label)
+
+    def take_exam(self):
+        """Runs one exam from the home screen to the results screen. Returns self."""
+        try:
+            self.rerun("home")
+            self.pause()
+            self.app.button(key=f"start_{self.test_name}").click()
+            self.rerun("setup")
+            self.pause()
+            self.app.slider[0].set_value(self.questions)
+            timer = next(box for box in self.app.checkbox if box.label == "Enable Mission Timer?")
+            if self.timer_minutes:
+                timer.check()
+                self.app.number_input[0].set_value(self.timer_minutes)
+            else:
+                timer.uncheck()
+            self.button("Launch Mission").click()
+            self.rerun("launch")
+            count = len(self.app.session_state.question_ids)
+            for position in range(count):
+                self.pause()
+                radio = self.app.radio[0]
+                radio.set_value(radio.options[self.rng.randrange(len(radio.options))])
+                self.rerun("answer")
+                self.pause()
+                if position < count - 1:
+                    self.button("Next Log").click()
+                    self.rerun("next")
+                else:
+                    self.button("Transmit Logs").click()
+                    self.rerun("submit")
+            if self.app.session_state.current_screen != "results":
+                raise RuntimeError(f"ended on the {self.app.session_state.current_screen} screen")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        return self
+
+
+def run_level(users, test_name, args):
+    """Runs users candidates at once, each taking one exam. Returns the level's report."""
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        candidates = list(pool.map(
+            lambda i: Candidate(test_name, args.questions, args.timer_minutes, args.think, args.seed * 1000 + i).take_exam(),
+            range(users),
+        ))
+    wall = time.perf_counter() - started
+    # Every session is still referenced here, so its state is part of the resident memory.
+    rss_after = current_rss_mb()
+
+    latencies = [sample for candidate in candidates for samples in candidate.latencies.values() for sample in samples]
+    errors = [candidate.error for candidate in candidates if candidate.error]
+    return {
+        "users": users,
+        "reruns": len(latencies),
+        "exams_completed": users - len(errors),
+        "errors": errors[:5],
+        "wall_seconds": wall,
+        "reruns_per_second": len(latencies) / wall,
+        "exams_per_minute": (users - len(errors)) / wall * 60,
+        "latency": percentiles(latencies),
+        "steps": {
+            step: percentiles([sample for candidate in candidates for sample in candidate.latencies[step]])
+            for step in STEPS
+        },
+        "service_p50_ms": percentiles([sample for candidate in candidates for sample in candidate.service]).get("p50_ms"),
+        "rss_mb": rss_after,
+        "rss_per_session_mb": (rss_after - rss_before) / users,
+    }
+
+
+def capacity(levels, max_p95_ms):
+    """Returns the most concurrent candidates whose p95 rerun latency stayed within max_p95_ms, or 0."""
+    within = [level["users"] for level in levels if not level["errors"] and level["latency"].get("p95_ms", 0) <= max_p95_ms]
+    return max(within, default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=DEFAULT_USERS, help="concurrent candidates to simulate, one run per value")
+    parser.add_argument("--bank-size", type=int, default=1000, help="questions in the synthetic mission")
+    parser.add_argument("--questions", type=int, default=20, help="questions per exam (a multiple of 5, at most 100)")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between actions, in seconds")
+    parser.add_argument("--timer-minutes", type=int, default=0, help="exam timer (0 for untimed exams)")
+    parser.add_argument("--max-p95-ms", type=float, default=500.0, help="p95 rerun latency a worker should stay within")
+    parser.add_argument("--state-server", action="store_true", help="keep state on a state server started on localhost")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the candidates' answers and think times")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    if args.questions % 5 or not 5 <= args.questions <= min(100, args.bank_size):
+        parser.error("--questions must be a multiple of 5 between 5 and min(100, --bank-size)")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "levels": [],
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="quiz-load-") as workdir:
+        # The app keeps its stores relative to the working directory.
+        os.chdir(workdir)
+        try:
+            if args.state_server:
+                server = start_server(os.path.join(workdir, "state"))
+                runtime.STATE_URL = f"http://127.0.0.1:{server.server_port}"
+            test_name = f"Load {args.bank_size}"
+            csv_bytes = make_synthetic_bank(args.bank_size).to_csv(index=False).encode("utf-8")
+            if args.state_server:
+                ingest_report = runtime.get_backend().import_mission(io.BytesIO(csv_bytes), test_name)
+            else:
+                ingest_report = ingest_csv(io.BytesIO(csv_bytes), test_name, get_store())
+            if not ingest_report.ok:
+                raise RuntimeError(f"Ingest failed: {ingest_report.fatal}")
+            # One untimed candidate warms the caches and imports, so the first level isn't charged for them.
+            Candidate(test_name, args.questions, 0, 0, -1).take_exam()
+            for users in args.users:
+                level = run_level(users, test_name, args)
+                report["levels"].append(level)
+                print(
+                    f"{users:>4} users: p50 {level['latency'].get('p50_ms', 0):7.1f} ms  "
+                    f"p95 {level['latency'].get('p95_ms', 0):7.1f} ms  p99 {level['latency'].get('p99_ms', 0):7.1f} ms  "
+                    f"{level['reruns_per_second']:6.1f} reruns/s  {level['rss_per_session_mb']:6.2f} MB/session"
+                    + (f"  {len(level['errors'])} errors" if level["errors"] else ""),
+                    file=sys.stderr,
+                )
+        finally:
+            os.chdir(cwd)
+    report["capacity_users"] = capacity(report["levels"], args.max_p95_ms)
+    print(f"Up to {report['capacity_users']} concurrent candidates within p95 {args.max_p95_ms:.0f} ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""
+Core of the AirPort Quest Prep quiz app.
+
+Everything here can be imported without a Streamlit context, so workers, scripts
+and benchmarks share the same storage, ingestion and grading code as the UI in test.py.
+"""
+
+# Directory holding the app's databases and files, relative to the working directory.
+DATA_DIR = "uploaded_tests"
@@ -0,0 +1,154 @@
+"""Adaptive question selection: difficulty-weighted sampling over per-question statistics."""
+
+import random
+import threading
+import time
+
+import numpy as np
+
+# Every question keeps at least this weight, so mastered questions still come up occasionally.
+ADAPTIVE_MIN_WEIGHT = 0.05
+# Questions answered within this window are skipped once when drawn, spacing out repeats.
+ADAPTIVE_COOLDOWN_SECONDS = 60 * 60
+
+def question_weights(attempts, correct):
+    """
+    Sampling weight per question: the smoothed miss rate (misses + 1) / (attempts + 2).
+    Unseen questions weigh 0.5, questions usually missed approach 1.
+    """
+    attempts = np.asarray(attempts, dtype=np.float64)
+    misses = attempts - np.asarray(correct, dtype=np.float64)
+    return np.maximum((misses + 1) / (attempts + 2), ADAPTIVE_MIN_WEIGHT)
+
+class WeightIndex:
+    """
+    Fenwick (binary indexed) tree over non-negative weights.
+    Building is O(n); updating one weight and drawing one index by weight are O(log n).
+    """
+
+    def __init__(self, weights):
+        self.weights = np.array(weights, dtype=np.float64)
+        n = len(self.weights)
+        prefix = np.concatenate(([0.0], np.cumsum(self.weights)))
+        i = np.arange(1, n + 1)
+        # tree[i] holds the sum of weights (i - lowbit(i), i], 1-based.
+        self._tree = np.concatenate(([0.0], prefix[i] - prefix[i - (i & -i)]))
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    @property
+    def nbytes(self):
+        """Memory held by the weights and the tree."""
+        return self.weights.nbytes + self._tree.nbytes
+
+    def total(self):
+        """Sum of all weights, in O(log n)."""
+        total = 0.0
+        i = len(self.weights)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def set(self, position, weight):
+        """Changes the weight of one position."""
+        delta = weight - self.weights[position]
+        self.weights[position] = weight
+        i = position + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, target):
+        """Returns the position whose cumulative weight range contains target."""
+        position = 0
+        step = self._top
+        while step:
+            nxt = position + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                position = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(position, len(self.weights) - 1)
+
+class AdaptiveSampler:
+    """
+    Per-bank adaptive sampler. Statistics are loaded once from the store into a WeightIndex
+    and then kept current as exams are graded, so drawing k questions costs O(k log n)
+    no matter how large the bank is.
+    """
+
+    def __init__(self, attempts, correct, last_seen):
+        self.attempts = np.asarray(attempts, dtype=np.int64).copy()
+        self.correct = np.asarray(correct, dtype=np.int64).copy()
+        self.last_seen = np.asarray(last_seen, dtype=np.float64).copy()
+        self.index = WeightIndex(question_weights(self.attempts, self.correct))
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory held by the statistics arrays and the weight index."""
+        return self.attempts.nbytes + self.correct.nbytes + self.last_seen.nbytes + self.index.nbytes
+
+    def sample(self, k, now=None, duplicates=None, exclude=()):
+        """
+        Draws k distinct positions without replacement, favouring frequently missed questions.
+        A question seen within ADAPTIVE_COOLDOWN_SECONDS is set aside the first time it is drawn;
+        at most k questions are set aside, which keeps the draw O(k log n). Given the bank's
+        DuplicateGroups, the near-duplicates of each pick and every group labelled in exclude
+        are taken out of the draw as well.
+        """
+        now = time.time() if now is None else now
+        k = min(k, len(self.index))
+        picked, set_aside, removed = [], [], {}
+
+        def take_out(positions):
+            for position in positions:
+                if position not in removed:
+                    removed[position] = self.index.weights[position]
+                    self.index.set(position, 0.0)
+
+        with self._lock:
+            try:
+                if duplicates is not None and exclude:
+                    take_out(duplicates.positions(exclude).tolist())
+                while len(picked) < k and len(removed) < len(self.index):
+                    total = self.index.total()
+                    position = self.index.find(random.random() * total)
+                    if self.index.weights[position] <= 0:
+                        continue
+                    take_out([position])
+                    if len(set_aside) < k and now - self.last_seen[position] < ADAPTIVE_COOLDOWN_SECONDS:
+                        set_aside.append(position)
+                        continue
+                    picked.append(position)
+                    if duplicates is not None:
+                        take_out(duplicates.members(position).tolist())
+                # Fill up from the set-aside questions if the bank ran out.
+                groups = {duplicates.labels[position] for position in picked} if duplicates is not None else None
+                for position in set_aside:
+                    if len(picked) >= k:
+                        break
+                    if groups is not None:
+                        if duplicates.labels[position] in groups:
+                            continue
+                        groups.add(duplicates.labels[position])
+                    picked.append(position)
+            finally:
+                for position, weight in removed.items():
+                    self.index.set(position, weight)
+        return np.array(picked, dtype=np.int64)
+
+    def record(self, positions, correct_mask, seen_at):
+        """Folds one graded exam into the statistics, updating only the affected weights."""
+        positions = np.asarray(positions, dtype=np.int64)
+        correct_mask = np.asarray(correct_mask, dtype=bool)
+        with self._lock:
+            np.add.at(self.attempts, positions, 1)
+            np.add.at(self.correct, positions, correct_mask.astype(np.int64))
+            self.last_seen[positions] = seen_at
+            weights = question_weights(self.attempts[positions], self.correct[positions])
+            for position, weight in zip(positions.tolist(), weights.tolist()):
+                self.index.set(position, weight)
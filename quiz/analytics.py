@@ -0,0 +1,79 @@
+"""
+Aggregate analytics across all recorded attempts.
+
+Everything here works from compact aggregates: one journal row per submitted attempt
+and the per-question counters the store keeps up to date at grading time. The raw
+answer log is never scanned, so the dashboard stays fast with millions of answers.
+"""
+
+import numpy as np
+import pandas as pd
+
+from quiz.answers import OPTION_LETTERS
+
+# Score bands used for the per-mission score distribution.
+SCORE_BINS = [0, 20, 40, 60, 80, 100]
+SCORE_LABELS = ["0-20%", "20-40%", "40-60%", "60-80%", "80-100%"]
+# Number of questions listed in the hardest-questions table.
+HARDEST_QUESTIONS = 20
+
+def score_frame(rows):
+    """Builds a DataFrame of submitted attempts from AttemptJournal.scores() rows."""
+    scores = pd.DataFrame(rows, columns=["Mission", "submitted_at", "correct", "total"])
+    scores["Submitted"] = pd.to_datetime(scores["submitted_at"], unit="s")
+    total = scores["total"].where(scores["total"] > 0)
+    scores["Score %"] = (scores["correct"] / total * 100).fillna(0)
+    return scores
+
+def mission_summary(scores):
+    """Attempts, mean, median and best score per mission."""
+    summary = scores.groupby("Mission")["Score %"].agg(["count", "mean", "median", "max"])
+    summary.columns = ["Attempts", "Mean %", "Median %", "Best %"]
+    return summary.sort_values("Attempts", ascending=False)
+
+def score_distribution(scores):
+    """
+    Number of attempts per score band and mission, in long form (Band, Mission, Attempts).
+    Mission names stay values rather than column names, since charts read a ':' in a column
+    name as a type ("Mock: …").
+    """
+    bands = pd.cut(scores["Score %"], bins=SCORE_BINS, labels=SCORE_LABELS, include_lowest=True)
+    counts = pd.crosstab(bands, scores["Mission"]).reindex(index=SCORE_LABELS, fill_value=0)
+    counts.index.name, counts.columns.name = "Band", "Mission"
+    return counts.stack().rename("Attempts").reset_index()
+
+def score_trend(scores, freq="D"):
+    """Mean score and number of attempts per period (daily by default), across all missions."""
+    trend = scores.set_index("Submitted").resample(freq)["Score %"].agg(["mean", "count"])
+    trend.columns = ["Mean %", "Attempts"]
+    return trend[trend["Attempts"] > 0]
+
+def difficulty_histogram(attempts, correct, bins=10):
+    """Number of answered questions per correct-rate band, from a bank's stat arrays."""
+    answered = attempts > 0
+    rates = correct[answered] / attempts[answered] * 100
+    counts, edges = np.histogram(rates, bins=bins, range=(0, 100))
+    labels = [f"{edges[i]:.0f}-{edges[i + 1]:.0f}%" for i in range(len(counts))]
+    return pd.Series(counts, index=pd.Index(labels, name="Correct rate"), name="Questions")
+
+def hardest_questions_frame(rows):
+    """Tabulates QuestionStore.hardest_questions() rows with pick shares per option and the top distractor."""
+    table = pd.DataFrame({
+        "Q#": [row["position"] + 1 for row in rows],
+        "Question": [row["question"] for row in rows],
+        "Answer": [OPTION_LETTERS[row["answer_key"]] for row in rows],
+        "Attempts": [row["attempts"] for row in rows],
+        "Correct %": [row["correct"] / row["attempts"] * 100 for row in rows],
+    })
+    picks = np.array([row["picks"] for row in rows], dtype=np.float64).reshape(len(rows), len(OPTION_LETTERS))
+    attempts = table["Attempts"].to_numpy(dtype=np.float64)
+    for i, letter in enumerate(OPTION_LETTERS):
+        table[f"{letter} %"] = picks[:, i] / attempts * 100
+    # The most picked wrong option; blank when nobody picked a wrong one.
+    wrong = picks.copy()
+    wrong[np.arange(len(rows)), [row["answer_key"] for row in rows]] = -1
+    top = wrong.argmax(axis=1) if len(rows) else []
+    table["Top distractor"] = [
+        OPTION_LETTERS[choice] if wrong[i, choice] > 0 else "" for i, choice in enumerate(top)
+    ]
+    return table
@@ -0,0 +1,48 @@
+"""Answer keys: mapping correct answers to option letters and grading."""
+
+import numpy as np
+
+from quiz.metrics import instrument
+
+OPTION_LETTERS = ['A', 'B', 'C', 'D']
+# Answer-key code for questions whose correct answer can't be mapped to an option.
+NO_ANSWER = -1
+
+@instrument("answers.build_answer_key")
+def build_answer_key(df):
+    """
+    Maps each row's correct answer, given as an option letter or as the full text of an
+    option, to that option, vectorized over a whole test. Returns an int8 array holding the
+    correct option index (0-3) per row, or NO_ANSWER.
+    """
+    key = np.full(len(df), NO_ANSWER, dtype=np.int8)
+    if 'Correct Answer (English)' not in df.columns:
+        return key
+    answers = df['Correct Answer (English)'].astype('string').str.strip()
+
+    # Full-text matches; walk the options backwards so the first matching option wins.
+    for pos in reversed(range(len(OPTION_LETTERS))):
+        col = f'Option {OPTION_LETTERS[pos]} (English)'
+        if col in df.columns:
+            matches = df[col].astype('string').str.strip() == answers
+            key[matches.fillna(False).to_numpy(dtype=bool)] = pos
+
+    # An explicit letter always takes precedence over a text match.
+    for pos, letter in enumerate(OPTION_LETTERS):
+        key[(answers == letter).fillna(False).to_numpy(dtype=bool)] = pos
+    return key
+
+@instrument("answers.grade_answers")
+def grade_answers(answers, answer_key):
+    """Returns a boolean array marking which answers match the key, in a single vectorized compare."""
+    return (answers == answer_key) & (answer_key != NO_ANSWER)
+
+def answer_letter(code):
+    """Returns the option letter for an answer code, or None when unanswered."""
+    return OPTION_LETTERS[code] if code != NO_ANSWER else None
+
+def correct_answer_label(row, key_code):
+    """Returns the option letter for an answer-key code, falling back to the raw answer text."""
+    if key_code != NO_ANSWER:
+        return OPTION_LETTERS[key_code]
+    return row.get('Correct Answer (English)')
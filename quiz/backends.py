@@ -0,0 +1,386 @@
+"""
+Pluggable backends for the state app workers share: the mission catalog, and exam attempts
+with their answers.
+
+LocalBackend keeps both in this machine's SQLite files, which is all a single server needs.
+NetworkBackend keeps them on a state server (quiz/stateserver.py). Several replicas can then
+run behind a load balancer without sticky sessions. Each worker's question store becomes a
+local copy of the server's missions, which a watcher thread keeps current. Attempts and
+per-question statistics are kept on the server, so any worker can resume or grade an exam
+and Adaptive mode learns from every worker's results. The app picks the network backend
+when QUIZ_STATE_URL holds the state server's URL.
+"""
+
+import atexit
+import http.client
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from array import array
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+from quiz.ingest import MAX_UPLOAD_BYTES, ingest_bulk, ingest_csv, parse_csv, too_large_report, upload_size
+from quiz.journal import AttemptJournal, FlushRequest, next_batch
+from quiz.store import hardest_rows, stats_from_rows
+
+logger = logging.getLogger(__name__)
+
+# Longest a request to the state server may take; above SYNC_WAIT_SECONDS so long polls complete.
+STATE_TIMEOUT_SECONDS = 30
+# A worker's watcher holds each request for mission changes open this long when there are none.
+SYNC_WAIT_SECONDS = 20
+# Pause before retrying when the state server can't be reached.
+SYNC_RETRY_SECONDS = 5
+
+class LocalBackend:
+    """
+    State kept in this machine's SQLite files: missions and per-question statistics in the
+    question store, attempts in the AttemptJournal. Processes sharing the files see each
+    other's missions through the store's signature checks, so there is nothing to sync.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.stats = store
+        self.journal = AttemptJournal()
+
+    def import_mission(self, source, test_name):
+        """Imports one CSV (path or file-like) as a mission, streaming it. Returns the IngestReport."""
+        return ingest_csv(source, test_name, self.store)
+
+    def import_missions(self, sources, executor=None):
+        """Imports (mission name, CSV bytes) pairs together, as ingest_bulk. Returns one IngestReport per source."""
+        return ingest_bulk(sources, self.store, executor)
+
+    def delete_mission(self, test_name):
+        """Deletes a mission. Returns False if it didn't exist."""
+        return self.store.delete_bank(test_name)
+
+    def sync(self):
+        """Brings the local store up to date with missions changed elsewhere. Returns True if it changed."""
+        return False
+
+class StateServerError(OSError):
+    """The state server answered with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(f"State server error {status}: {message}")
+        self.status = status
+
+class StateClient:
+    """
+    JSON-over-HTTP client for the state server. Each thread keeps its own keep-alive
+    connection, so answer batches and long polls don't reconnect for every request.
+    """
+
+    def __init__(self, url, timeout=STATE_TIMEOUT_SECONDS):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, body=None):
+        """Sends one request and returns (response bytes, headers). Raises OSError if it fails."""
+        target = f"{path}?{urlencode(params)}" if params else path
+        for retry in (True, False):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                retry = False
+            try:
+                conn.request(method, target, body=body)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                # A kept-alive connection may have been closed by the server while idle; reconnect once.
+                if not retry:
+                    raise
+        if response.status >= 400:
+            raise StateServerError(response.status, data.decode("utf-8", "replace"))
+        return data, response.headers
+
+    def get(self, path, **params):
+        """GETs a JSON document."""
+        return json.loads(self.request("GET", path, params)[0])
+
+    def post(self, path, value=None, data=None, **params):
+        """POSTs a JSON value (or raw bytes as data) and returns the JSON response."""
+        body = data if data is not None else json.dumps(value).encode("utf-8")
+        return json.loads(self.request("POST", path, params, body)[0])
+
+class RemoteJournal:
+    """
+    The AttemptJournal interface, on the state server. Answer clicks only enqueue a record;
+    one thread sends everything queued within JOURNAL_FLUSH_INTERVAL in a single request.
+    Records the server didn't acknowledge are kept and resent. Submissions are synchronous,
+    so exactly one grader wins across all workers.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="attempt-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def start_attempt(self, test_name, question_ids, timer_minutes, started_at, attempt_id=None):
+        """Queues a new attempt and returns its id."""
+        attempt_id = attempt_id or uuid.uuid4().hex
+        question_ids = np.asarray(question_ids, dtype=np.int64).tolist()
+        self._queue.put(["start", attempt_id, test_name, question_ids, timer_minutes, started_at])
+        return attempt_id
+
+    def record_answer(self, attempt_id, position, answer, answered_at=None):
+        """Queues one answer change. Later records for the same position win on replay."""
+        self._queue.put(["answer", attempt_id, int(position), int(answer), answered_at or time.time()])
+
+    def record_position(self, attempt_id, position):
+        """Queues the question an attempt is on, so a resumed attempt reopens there."""
+        self._queue.put(["position", attempt_id, int(position)])
+
+    def finish_attempt(self, attempt_id, correct, total):
+        """Records the final score of an attempt. Returns True if this call submitted it."""
+        self.flush()
+        return self.client.post("/attempts/finish", {"attempt_id": attempt_id, "correct": correct, "total": total})["submitted"]
+
+    def pending_deadlines(self):
+        """Returns (attempt id, deadline) for every timed attempt that hasn't been submitted."""
+        return [tuple(row) for row in self.client.get("/attempts/pending")["deadlines"]]
+
+    def flush(self, timeout=5):
+        """Blocks until every record queued so far is acknowledged by the server."""
+        done = FlushRequest()
+        self._queue.put(done)
+        return done.wait(timeout) and done.ok
+
+    def load_attempt(self, attempt_id):
+        """Replays an attempt from the server's journal. Returns None if it doesn't exist."""
+        self.flush()
+        try:
+            attempt = self.client.get("/attempts", id=attempt_id)
+        except StateServerError as e:
+            if e.status == 404:
+                return None
+            raise
+        attempt["question_ids"] = np.array(attempt["question_ids"], dtype=np.int64)
+        attempt["answers"] = array('b', attempt["answers"])
+        return attempt
+
+    def scores(self):
+        """Returns (test_name, submitted_at, correct, total) for every submitted attempt."""
+        return [tuple(row) for row in self.client.get("/scores")["scores"]]
+
+    def _write_loop(self):
+        unsent, waiters = [], []
+        while True:
+            batch = next_batch(self._queue, SYNC_RETRY_SECONDS if unsent else None)
+            waiters += [item for item in batch if isinstance(item, FlushRequest)]
+            unsent += [item for item in batch if not isinstance(item, FlushRequest)]
+            if unsent:
+                try:
+                    self.client.post("/journal", {"records": unsent})
+                except StateServerError as e:
+                    if e.status >= 500:
+                        logger.warning("The state server could not commit %d journal records; resending them", len(unsent))
+                        continue
+                    # Resending a batch the server rejected can't succeed.
+                    logger.error("The state server rejected %d journal records; dropped them: %s", len(unsent), e)
+                    for waiter in waiters:
+                        waiter.ok = False
+                except OSError:
+                    logger.warning("Could not reach the state server; resending %d journal records", len(unsent))
+                    continue
+                unsent = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+class RemoteStats:
+    """
+    The per-question statistics of QuestionStore (record_results, bank_stats and
+    hardest_questions), on the state server, so Adaptive mode and the analytics screen see
+    every worker's exams. Question text still comes from the local store.
+    """
+
+    def __init__(self, client, store):
+        self.client = client
+        self.store = store
+
+    def record_results(self, question_ids, answers, correct_mask, seen_at):
+        """Adds one graded exam to the server's statistics."""
+        self.client.post("/stats", {
+            "question_ids": np.asarray(question_ids, dtype=np.int64).tolist(),
+            "answers": np.asarray(answers, dtype=np.int8).tolist(),
+            "correct": np.asarray(correct_mask, dtype=bool).tolist(),
+            "seen_at": seen_at,
+        })
+
+    def bank_stats(self, bank):
+        """Returns (attempts, correct, last_seen) arrays for a mission, ordered by position."""
+        first_id, count = bank["first_question_id"], bank["question_count"]
+        rows = self.client.get("/stats", first=first_id, count=count)["stats"]
+        return stats_from_rows([tuple(row) for row in rows], first_id, count)
+
+    def hardest_questions(self, bank, limit, min_attempts=1):
+        """Returns up to limit questions of a mission with the lowest correct rate, as QuestionStore does."""
+        hardest = self.client.get(
+            "/stats/hardest", first=bank["first_question_id"], count=bank["question_count"],
+            limit=limit, min_attempts=min_attempts,
+        )["hardest"]
+        return hardest_rows(self.store, bank, hardest)
+
+class NetworkBackend:
+    """
+    State kept on a state server shared by every worker. The server reserves a block of
+    question ids for each uploaded mission, and the local store writes the mission under those
+    ids, so an exam's question ids mean the same on every worker. A watcher thread long-polls
+    the server. It applies missions uploaded or deleted by other workers to the local store,
+    so their home screens and bank caches update within moments.
+    """
+
+    def __init__(self, url, store):
+        self.store = store
+        self.client = StateClient(url)
+        self.journal = RemoteJournal(self.client)
+        self.stats = RemoteStats(self.client, store)
+        self._version = 0
+        self._sync_lock = threading.Lock()
+        self._join()
+        self._watcher = threading.Thread(target=self._watch, name="mission-sync", daemon=True)
+        self._watcher.start()
+
+    def import_mission(self, source, test_name):
+        """Imports one CSV (path or file-like) as a mission. Returns the IngestReport."""
+        if upload_size(source) > MAX_UPLOAD_BYTES:
+            return too_large_report(test_name)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+        return self.import_missions([(test_name, data)])[0]
+
+    def import_missions(self, sources, executor=None):
+        """
+        Imports (mission name, CSV bytes) pairs together, as ingest_bulk. The valid missions are
+        written to the local store under ids the server reserves, then published to the server
+        in one transaction, and only then made visible locally. If anything fails before the
+        publish, nothing is saved anywhere: a batch reaches every worker or none.
+        """
+        data = dict(sources)
+        counts, published, locked = {}, {}, []
+
+        def reserve(mission_counts):
+            counts.update(mission_counts)
+            # Above every local id, so the new blocks can't collide with missions this worker already has.
+            return self.client.post("/missions/reserve", {"counts": mission_counts, "above": self.store.last_question_id()})["first_ids"]
+
+        def publish(first_ids):
+            # Held until the local swap is done, so the watcher doesn't import this batch a second time.
+            self._sync_lock.acquire()
+            locked.append(True)
+            self.client.post("/missions", {"missions": [
+                {"name": test_name, "first_question_id": first_ids[test_name], "question_count": count,
+                 "data": data[test_name].decode("utf-8")}
+                for test_name, count in counts.items()
+            ]})
+            published.update(counts)
+
+        try:
+            reports = ingest_bulk(sources, self.store, executor, allocate_ids=reserve, publish=publish)
+        finally:
+            if locked:
+                self._sync_lock.release()
+        # Once published the batch is saved, even if the local swap then failed: the watcher imports it from the server.
+        for report in reports:
+            if report.test_name in published and report.rows_written == 0:
+                report.fatal, report.rows_written = None, published.pop(report.test_name)
+        return reports
+
+    def delete_mission(self, test_name):
+        """Deletes a mission on the server and locally. Returns False if it didn't exist."""
+        deleted = self.client.post("/missions/delete", name=test_name)["deleted"]
+        return self.store.delete_bank(test_name) or deleted
+
+    def sync(self, wait=0):
+        """
+        Applies the mission changes published since the last sync, waiting up to wait seconds
+        for one. Returns True if the local store changed.
+        """
+        response = self.client.get("/missions", since=self._version, wait=wait)
+        changed = False
+        with self._sync_lock:
+            for entry in response["missions"]:
+                changed |= self._apply(entry)
+            self._version = max(self._version, response["version"])
+        return changed
+
+    def _apply(self, entry):
+        """Makes the local copy of one mission match a server entry. Returns True if it changed."""
+        test_name = entry["name"]
+        if entry["first_question_id"] is None:
+            return self.store.delete_bank(test_name)
+        local = self.store.get_bank(test_name)
+        if local is not None and local["first_question_id"] == entry["first_question_id"] \
+                and local["question_count"] == entry["question_count"]:
+            return False  # already current, e.g. this worker's own upload
+        try:
+            data, headers = self.client.request("GET", "/missions/data", {"name": test_name})
+        except StateServerError as e:
+            if e.status == 404:
+                return False  # deleted since; a later entry says so
+            raise
+        current = json.loads(headers["X-Mission"])
+        report, chunks = parse_csv(test_name, data)
+        if report.fatal is not None or sum(len(frame) for frame, _, _ in chunks) != current["question_count"]:
+            logger.error("Mission '%s' from the state server doesn't import as published; skipped", test_name)
+            return False
+        self.store.replace_bank(test_name, chunks, current["first_question_id"])
+        return True
+
+    def _join(self):
+        """
+        First sync of a worker. Local copies of missions the server deleted or numbered
+        differently are dropped. Missions only this worker has, e.g. from before it used the
+        server, are published; each local copy is replaced only once the server holds it.
+        The local store then holds exactly the server's missions. Raises OSError, keeping the
+        local missions, if one can't be published.
+        """
+        response = self.client.get("/missions", since=0)
+        remote = {entry["name"]: entry for entry in response["missions"]}
+        local_only = []
+        for test_name, first_id, count in self.store.bank_blocks():
+            entry = remote.get(test_name)
+            if entry is None:
+                local_only.append(test_name)
+            elif (entry["first_question_id"], entry["question_count"]) != (first_id, count):
+                self.store.delete_bank(test_name)
+        if local_only:
+            sources = [
+                (test_name, self.store.export_frame(self.store.get_bank(test_name)).to_csv(index=False).encode("utf-8"))
+                for test_name in local_only
+            ]
+            failed = [report for report in self.import_missions(sources) if not report.ok]
+            if failed:
+                raise OSError(f"Could not publish local mission '{failed[0].test_name}' to the state server: {failed[0].fatal}")
+        with self._sync_lock:
+            for entry in response["missions"]:
+                self._apply(entry)
+            self._version = response["version"]
+
+    def _watch(self):
+        while True:
+            try:
+                self.sync(SYNC_WAIT_SECONDS)
+            except Exception:
+                logger.exception("Could not sync missions from the state server")
+                time.sleep(SYNC_RETRY_SECONDS)
@@ -0,0 +1,229 @@
+"""Process-wide cache of QuestionBank handles over the question store."""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from quiz.adaptive import AdaptiveSampler
+from quiz.dedup import DuplicateGroups
+
+# The adaptive sampler reloads its statistics this often, to pick up exams graded by other workers.
+ADAPTIVE_REFRESH_SECONDS = 60
+
+class QuestionBank:
+    """
+    Handle on one mission in the question store. Question text is fetched from SQLite
+    only for the rows a screen renders; the answer key is kept in memory as an int8
+    array (one option index per question) for vectorized grading. Per-question statistics
+    are kept by stats (the store itself unless given, see LocalBackend and NetworkBackend).
+    on_resize(bank), when given, is called whenever a lazily loaded structure changes nbytes.
+    """
+
+    def __init__(self, store, record, stats=None, on_resize=None):
+        self.store = store
+        self.stats = stats or store
+        self.record = record
+        self.name = record["name"]
+        self.bank_id = record["id"]
+        self.first_question_id = record["first_question_id"]
+        self.modified_at = record["modified_at"]
+        self.answer_key = store.bank_answer_key(record)
+        self.on_resize = on_resize
+        self._sampler = None
+        self._sampler_loaded = 0.0
+        self._duplicates = None
+        self._sampler_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.answer_key)
+
+    @property
+    def nbytes(self):
+        """Memory held by the answer key and, once loaded, the adaptive sampler and duplicate groups."""
+        return sum(part.nbytes for part in (self.answer_key, self._sampler, self._duplicates) if part is not None)
+
+    def _resized(self):
+        if self.on_resize is not None:
+            self.on_resize(self)
+
+    def positions(self, question_ids):
+        """Converts global question ids into positions within this bank."""
+        return np.asarray(question_ids, dtype=np.int64) - self.first_question_id
+
+    def key_for(self, question_ids):
+        """Returns the answer key of each question id."""
+        return self.answer_key[self.positions(question_ids)]
+
+    def contains(self, question_ids):
+        """Returns True if every id belongs to this version of the bank."""
+        positions = self.positions(question_ids)
+        return bool(((positions >= 0) & (positions < len(self))).all())
+
+    def sample(self, k, distinct=False, exclude=(), rng=random):
+        """
+        Draws k distinct question ids uniformly at random in O(k), without touching the bank.
+        With distinct, no two are near-duplicates and none is in a group labelled in exclude
+        (see duplicate_labels); fewer than k are returned if the bank runs out of groups.
+        Pass a seeded random.Random as rng to make the draw reproducible.
+        """
+        if distinct or exclude:
+            return self.first_question_id + self.duplicate_groups().sample(k, exclude, rng)
+        positions = rng.sample(range(len(self)), k)
+        return self.first_question_id + np.array(positions, dtype=np.int64)
+
+    def duplicate_groups(self):
+        """Returns the bank's DuplicateGroups, loading the group labels from the store on first use."""
+        if self._duplicates is None:
+            with self._sampler_lock:
+                loaded = self._duplicates is None
+                if loaded:
+                    self._duplicates = DuplicateGroups(self.store.bank_duplicate_groups(self.record))
+            if loaded:
+                self._resized()
+        return self._duplicates
+
+    def duplicate_labels(self, question_ids):
+        """
+        Returns the near-duplicate group label of each question id. Labels are shared across
+        missions, so exams drawing from several banks pass them as exclude to later draws.
+        """
+        return self.duplicate_groups().labels[self.positions(question_ids)]
+
+    def adaptive_sampler(self):
+        """
+        Returns the bank's AdaptiveSampler, loading its statistics on first use and again
+        every ADAPTIVE_REFRESH_SECONDS.
+        """
+        if self._sampler_stale():
+            with self._sampler_lock:
+                loaded = self._sampler_stale()
+                if loaded:
+                    self._sampler = AdaptiveSampler(*self.stats.bank_stats(self.record))
+                    self._sampler_loaded = time.monotonic()
+            if loaded:
+                self._resized()
+        return self._sampler
+
+    def _sampler_stale(self):
+        return self._sampler is None or time.monotonic() - self._sampler_loaded > ADAPTIVE_REFRESH_SECONDS
+
+    def sample_adaptive(self, k, distinct=False, exclude=()):
+        """
+        Draws k distinct question ids weighted towards frequently missed questions, in O(k log n).
+        distinct and exclude skip near-duplicates as in sample().
+        """
+        duplicates = self.duplicate_groups() if distinct or exclude else None
+        return self.first_question_id + self.adaptive_sampler().sample(k, duplicates=duplicates, exclude=exclude)
+
+    def record_results(self, question_ids, answers, correct_mask):
+        """Adds a graded exam to the per-question statistics, kept by stats, and to the live sampler."""
+        seen_at = time.time()
+        self.stats.record_results(question_ids, answers, correct_mask, seen_at)
+        if self._sampler is not None:
+            self._sampler.record(self.positions(question_ids), correct_mask, seen_at)
+
+    def row(self, question_id):
+        """Returns one question as a {column: value} dict."""
+        return self.rows([question_id])[0]
+
+    def rows(self, question_ids):
+        """Returns the questions with the given ids, in order."""
+        return self.store.fetch_questions(question_ids)
+
+    def page(self, start, stop):
+        """Returns the questions in positions [start, stop)."""
+        return self.store.fetch_range(self.first_question_id + start, self.first_question_id + stop - 1)
+
+# Upper bound on the memory held by cached banks (answer keys, adaptive samplers and duplicate groups) across all sessions.
+BANK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+class QuestionBankCache:
+    """
+    Process-wide, thread-safe LRU cache of QuestionBank handles.
+    Entries are keyed by test name and validated against the mission's bank id, which
+    changes whenever the mission is re-imported, so an answer key is loaded once and
+    shared by every session until the mission changes. An entry is charged its bank's
+    nbytes again whenever the bank loads its sampler or duplicate groups.
+    """
+
+    def __init__(self, store, question_stats=None, max_bytes=BANK_CACHE_MAX_BYTES):
+        self.store = store
+        self.question_stats = question_stats
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # test_name -> (signature, bank, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, test_name):
+        """Returns the QuestionBank for a test. Raises KeyError if the mission doesn't exist."""
+        record = self.store.get_bank(test_name)
+        if record is None:
+            self.invalidate(test_name)
+            raise KeyError(f"Mission '{test_name}' not found")
+        signature = record["id"]
+
+        with self._lock:
+            entry = self._entries.get(test_name)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(test_name)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Load outside the lock so one slow bank doesn't block every other session.
+        bank = QuestionBank(self.store, record, self.question_stats, on_resize=lambda bank: self._resize(test_name, bank))
+
+        with self._lock:
+            self._discard(test_name)
+            self._admit(test_name, signature, bank)
+        return bank
+
+    def invalidate(self, test_name=None):
+        """Drops one test (or every test when no name is given) from the cache."""
+        with self._lock:
+            if test_name is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._discard(test_name)
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _resize(self, test_name, bank):
+        """Charges a cached bank's current size, evicting entries to stay within max_bytes."""
+        with self._lock:
+            entry = self._entries.get(test_name)
+            if entry is None or entry[1] is not bank:
+                return  # evicted or replaced since
+            self._discard(test_name)
+            self._admit(test_name, entry[0], bank)
+
+    def _admit(self, test_name, signature, bank):
+        """Adds a bank as the most recently used entry, unless it alone exceeds max_bytes. Holds self._lock."""
+        nbytes = bank.nbytes
+        if nbytes > self.max_bytes:
+            return
+        self._entries[test_name] = (signature, bank, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+            self._bytes -= evicted_bytes
+
+    def _discard(self, test_name):
+        entry = self._entries.pop(test_name, None)
+        if entry is not None:
+            self._bytes -= entry[2]
@@ -0,0 +1,81 @@
+"""Process-wide, incrementally maintained catalog of missions for the home screen."""
+
+import threading
+
+# Sort orders offered on the home screen, as (entry field, descending).
+CATALOG_SORTS = {
+    "Name": ("name", False),
+    "Newest": ("modified_at", True),
+    "Most questions": ("question_count", True),
+    "Largest": ("size_bytes", True),
+}
+CATALOG_FIELDS = ("name", "question_count", "size_bytes", "modified_at")
+
+class MissionCatalog:
+    """
+    In-memory index of mission metadata: name, question count, size and last-modified time.
+    Imports and deletions made through the store update single entries as they commit. A
+    full reload only happens when the store was changed elsewhere (another process, another
+    store object), which one cheap signature query per read detects. Sorted orders are kept
+    until the next change, so rendering the home screen doesn't re-sort the catalog.
+    """
+
+    def __init__(self, store, pinned=None):
+        self.store = store
+        self.pinned = pinned  # mission listed first in name order (the default mission)
+        self._entries = {}
+        self._orders = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        store.add_listener(self._on_change)
+
+    def _on_change(self, test_names, before, after):
+        """Store listener: applies a committed change in place if the catalog was current before it."""
+        records = {test_name: self.store.get_bank(test_name) for test_name in test_names}
+        with self._lock:
+            if self._signature != before:
+                self._signature = None  # missed an earlier change; reload on the next read
+                return
+            for test_name, record in records.items():
+                if record is None:
+                    self._entries.pop(test_name, None)
+                else:
+                    self._entries[test_name] = {field: record[field] for field in CATALOG_FIELDS}
+            self._orders = {}
+            self._signature = after
+
+    def _sync(self):
+        """Reloads every entry if the store changed without the catalog being told."""
+        if self.store.banks_signature() == self._signature:
+            return
+        signature, banks = self.store.banks_snapshot()
+        with self._lock:
+            self._entries = {bank["name"]: bank for bank in banks}
+            self._orders = {}
+            self._signature = signature
+
+    def names(self):
+        """Returns every mission name, pinned mission first, the rest sorted by name."""
+        return [entry["name"] for entry in self.entries()]
+
+    def entries(self, sort="Name"):
+        """Returns all entries in the given CATALOG_SORTS order. The list must not be mutated."""
+        self._sync()
+        with self._lock:
+            order = self._orders.get(sort)
+            if order is None:
+                field, descending = CATALOG_SORTS[sort]
+                order = sorted(self._entries.values(), key=lambda entry: entry[field], reverse=descending)
+                if sort == "Name" and self.pinned in self._entries:
+                    order.remove(self._entries[self.pinned])
+                    order.insert(0, self._entries[self.pinned])
+                self._orders[sort] = order
+            return order
+
+    def search(self, query="", sort="Name"):
+        """Returns the entries whose name contains query (case-insensitive), in sort order."""
+        order = self.entries(sort)
+        query = query.strip().lower()
+        if not query:
+            return order
+        return [entry for entry in order if query in entry["name"].lower()]
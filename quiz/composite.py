@@ -0,0 +1,150 @@
+"""Composite exams: one exam drawn from several missions, with proportional or custom quotas."""
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from quiz.metrics import instrument
+from quiz.runtime import get_bank_cache
+
+# Largest exam that can be built from several missions.
+MAX_COMPOSITE_QUESTIONS = 500
+# Missions named in a composite exam's title before the rest are summarized as "+N".
+COMPOSITE_NAMED_MISSIONS = 2
+
+def composite_name(test_names):
+    """Returns the title of an exam drawn from the given missions, e.g. 'Mock: A + B +3'."""
+    named = " + ".join(test_names[:COMPOSITE_NAMED_MISSIONS])
+    rest = len(test_names) - COMPOSITE_NAMED_MISSIONS
+    return f"Mock: {named} +{rest}" if rest > 0 else f"Mock: {named}"
+
+def stratified_quotas(sizes, total):
+    """
+    Splits total questions across missions in proportion to their sizes ({name: questions}),
+    rounding by largest remainder so the quotas add up exactly. No mission is asked for more
+    questions than it has; total is capped at the questions available.
+    """
+    available = sum(sizes.values())
+    total = min(total, available)
+    if total <= 0:
+        return {name: 0 for name in sizes}
+    exact = {name: total * size / available for name, size in sizes.items()}
+    quotas = {name: int(share) for name, share in exact.items()}
+    by_remainder = sorted(sizes, key=lambda name: exact[name] - quotas[name], reverse=True)
+    for name in by_remainder[:total - sum(quotas.values())]:
+        quotas[name] += 1
+    return quotas
+
+@instrument("composite.compose_exam")
+def compose_exam(quotas, adaptive=False, distinct=False, rng=random):
+    """
+    Draws quotas[name] questions from each mission through the shared bank cache and returns
+    their ids in random order. Only answer keys and id arrays are touched, never question text.
+    With distinct, near-duplicates are skipped within and across missions, so a mission may
+    contribute fewer questions than its quota. A seeded random.Random as rng makes uniform
+    draws reproducible; adaptive draws depend on the live statistics and never are.
+    """
+    cache = get_bank_cache()
+    draws, labels = [], set()
+    for test_name, quota in quotas.items():
+        if quota <= 0:
+            continue
+        bank = cache.get(test_name)
+        quota = min(quota, len(bank))
+        if adaptive:
+            draw = bank.sample_adaptive(quota, distinct=distinct, exclude=labels)
+        else:
+            draw = bank.sample(quota, distinct=distinct, exclude=labels, rng=rng)
+        if distinct:
+            labels.update(bank.duplicate_labels(draw).tolist())
+        draws.append(draw)
+    if not draws:
+        return np.array([], dtype=np.int64)
+    question_ids = np.concatenate(draws)
+    return question_ids[rng.sample(range(len(question_ids)), len(question_ids))]
+
+class CompositeBank:
+    """
+    Read-only view over the QuestionBanks an exam was drawn from, offering the grading,
+    lookup and statistics methods of a single QuestionBank. Each bank owns a contiguous block
+    of question ids, so the bank of a question is found by binary search over first ids.
+    """
+
+    def __init__(self, name, banks):
+        self.name = name
+        self.banks = sorted(banks, key=lambda bank: bank.first_question_id)
+        self.store = self.banks[0].store
+        self._firsts = np.array([bank.first_question_id for bank in self.banks], dtype=np.int64)
+        self._sizes = np.array([len(bank) for bank in self.banks], dtype=np.int64)
+
+    def __len__(self):
+        return int(self._sizes.sum())
+
+    def _locate(self, question_ids):
+        """Returns the index into self.banks of each question id (-1 if it is before the first bank)."""
+        return np.searchsorted(self._firsts, np.asarray(question_ids, dtype=np.int64), side="right") - 1
+
+    def contains(self, question_ids):
+        """Returns True if every id belongs to the current version of one of the banks."""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        owners = self._locate(question_ids)
+        if (owners < 0).any():
+            return False
+        return bool((question_ids - self._firsts[owners] < self._sizes[owners]).all())
+
+    def key_for(self, question_ids):
+        """Returns the answer key of each question id, gathered from the banks that own them."""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        owners = self._locate(question_ids)
+        answer_key = np.empty(len(question_ids), dtype=np.int8)
+        for i in np.unique(owners):
+            mask = owners == i
+            answer_key[mask] = self.banks[i].key_for(question_ids[mask])
+        return answer_key
+
+    def missions(self, question_ids):
+        """Returns the mission name of each question id."""
+        names = np.array([bank.name for bank in self.banks], dtype=object)
+        return names[self._locate(question_ids)]
+
+    def record_results(self, question_ids, answers, correct_mask):
+        """Adds a graded exam to the statistics of each bank it drew from."""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        answers = np.asarray(answers, dtype=np.int8)
+        correct_mask = np.asarray(correct_mask, dtype=bool)
+        owners = self._locate(question_ids)
+        for i in np.unique(owners):
+            mask = owners == i
+            self.banks[i].record_results(question_ids[mask], answers[mask], correct_mask[mask])
+
+    def breakdown(self, question_ids, correct_mask):
+        """Questions, correct answers and score per mission, in mission order."""
+        scores = pd.DataFrame({"Mission": self.missions(question_ids), "Correct": np.asarray(correct_mask, dtype=int)})
+        summary = scores.groupby("Mission", sort=True)["Correct"].agg(["count", "sum"])
+        summary.columns = ["Logs", "Correct"]
+        summary["Score %"] = summary["Correct"] / summary["Logs"] * 100
+        return summary
+
+    def row(self, question_id):
+        """Returns one question as a {column: value} dict."""
+        return self.rows([question_id])[0]
+
+    def rows(self, question_ids):
+        """Returns the questions with the given ids, in order."""
+        return self.store.fetch_questions(question_ids)
+
+def load_composite(test_name, question_ids, store):
+    """
+    Rebuilds the CompositeBank behind a composite exam from its question ids.
+    Returns None if any question's mission was deleted or re-imported since.
+    """
+    test_names = store.bank_names_for(question_ids)
+    if test_names is None:
+        return None
+    cache = get_bank_cache()
+    try:
+        bank = CompositeBank(test_name, [cache.get(name) for name in test_names])
+    except KeyError:
+        return None
+    return bank if bank.contains(question_ids) else None
@@ -0,0 +1,70 @@
+"""Server-side exam deadlines: one background thread per process auto-submits expired attempts."""
+
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class DeadlineScheduler:
+    """
+    Min-heap of (deadline, attempt id) served by a single thread, which sleeps until the
+    earliest deadline and then calls expire(attempt_id). Sessions never poll: an attempt is
+    graded at its deadline whether or not its tab is still open. Scheduling is O(log n) and
+    cancelling O(1): the current deadline of each scheduled attempt is kept in a dict, and
+    heap entries that no longer match it are skipped when they reach the top.
+    """
+
+    def __init__(self, expire):
+        self.expire = expire
+        self._heap = []
+        self._scheduled = {}  # attempt id -> its current deadline
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="attempt-deadlines", daemon=True)
+        self._thread.start()
+
+    def schedule(self, attempt_id, deadline):
+        """Arranges for attempt_id to be expired at the given epoch time."""
+        with self._condition:
+            self._scheduled[attempt_id] = deadline
+            heapq.heappush(self._heap, (deadline, attempt_id))
+            # Wake the thread only if this deadline is now the earliest one.
+            if self._heap[0] == (deadline, attempt_id):
+                self._condition.notify()
+
+    def cancel(self, attempt_id):
+        """
+        Forgets an attempt that was submitted before its deadline. Does nothing for attempts
+        that aren't scheduled, e.g. untimed ones or those already being expired.
+        """
+        with self._condition:
+            self._scheduled.pop(attempt_id, None)
+
+    def pending(self):
+        """Returns the number of attempts still waiting for their deadline."""
+        with self._condition:
+            return len(self._scheduled)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    deadline, attempt_id = self._heap[0]
+                    delay = deadline - time.time()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    # Cancelled, or rescheduled to another deadline.
+                    if self._scheduled.get(attempt_id) != deadline:
+                        continue
+                    del self._scheduled[attempt_id]
+                    break
+            try:
+                self.expire(attempt_id)
+            except Exception:
+                logger.exception("Could not auto-submit attempt %s", attempt_id)
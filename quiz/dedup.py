@@ -0,0 +1,127 @@
+"""
+Near-duplicate detection across missions with MinHash signatures and locality-sensitive hashing.
+
+Each question gets a MinHash signature of the set of words in its English question and options.
+Similar questions agree on most signature values, so banding the signature (LSH) puts them in
+a shared bucket with high probability. Candidate duplicates are found with indexed bucket
+lookups instead of comparing every pair, and the store labels each question with the group
+of near-duplicates it belongs to.
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from quiz.answers import OPTION_LETTERS
+
+# Columns compared when looking for near-duplicates.
+DEDUP_COLUMNS = ['Question (English)'] + [f'Option {letter} (English)' for letter in OPTION_LETTERS]
+# Signature length, split into LSH_BANDS bands of MINHASH_PERMUTATIONS // LSH_BANDS values.
+# With 16 bands of 4, pairs at 70% similarity become candidates 99% of the time, pairs at 30% under 13%.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+# Candidates whose signatures agree on at least this share of values are near-duplicates.
+DUPLICATE_SIMILARITY = 0.7
+# Rows hashed per step, which keeps the (words x permutations) matrix to a few MB.
+MINHASH_BATCH_ROWS = 256
+
+_rng = np.random.default_rng(20240917)  # fixed, so signatures match across processes and restarts
+_MULTIPLIERS = _rng.integers(1, 2**63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # odd constant combining a band's values into one bucket
+
+def question_text(frame):
+    """Returns the normalized English question and options of each row: lowercase words separated by spaces."""
+    text = frame[DEDUP_COLUMNS[0]].astype('string').fillna("")
+    for col in DEDUP_COLUMNS[1:]:
+        column = frame[col].astype('string').fillna("") if col in frame.columns else ""
+        text = text + " " + column
+    return text.str.lower().str.replace(r"[\W_]+", " ", regex=True).str.strip()
+
+def minhash_signatures(frame):
+    """Returns the (rows, MINHASH_PERMUTATIONS) uint32 MinHash signatures of a DataFrame in the CSV layout."""
+    if frame.empty:
+        return np.empty((0, MINHASH_PERMUTATIONS), dtype=np.uint32)
+    # Rows with no words explode into a single empty token, so every row has at least one.
+    tokens = question_text(frame).reset_index(drop=True).str.split().explode()
+    shingles = pd.util.hash_pandas_object(tokens.fillna(""), index=False).to_numpy()
+    rows = tokens.index.to_numpy()
+    starts = np.flatnonzero(np.append(True, rows[1:] != rows[:-1]))
+
+    signatures = np.empty((len(starts), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    bounds = np.append(starts, len(shingles))
+    for first in range(0, len(starts), MINHASH_BATCH_ROWS):
+        last = min(first + MINHASH_BATCH_ROWS, len(starts))
+        # Multiply-shift hashing: one independent hash function per permutation, computed in place.
+        hashed = shingles[bounds[first]:bounds[last], None] * _MULTIPLIERS
+        hashed += _OFFSETS
+        hashed >>= np.uint64(32)
+        signatures[first:last] = np.minimum.reduceat(hashed, starts[first:last] - bounds[first], axis=0)
+    return signatures
+
+def lsh_buckets(signatures):
+    """Returns the (rows, LSH_BANDS) int64 bucket of every band of each signature."""
+    bands = signatures.astype(np.uint64).reshape(len(signatures), LSH_BANDS, -1)
+    buckets = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for i in range(bands.shape[2]):
+        buckets = buckets * _MIX + bands[:, :, i]
+    return buckets.view(np.int64)
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two questions: the share of signature values they agree on."""
+    return float(np.mean(signature == other))
+
+class DuplicateGroups:
+    """
+    Near-duplicate groups of one bank, from the group label of each position. Drawing distinct
+    questions picks k groups uniformly and one random member of each, in O(k).
+    """
+
+    def __init__(self, labels):
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.keys, self._group, self.sizes = np.unique(self.labels, return_inverse=True, return_counts=True)
+        self._order = np.argsort(self._group, kind="stable")
+        self._starts = np.concatenate(([0], np.cumsum(self.sizes)[:-1])).astype(np.int64)
+
+    def __len__(self):
+        """Number of groups, i.e. the most questions an exam without near-duplicates can have."""
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        """Memory held by the label and group arrays."""
+        arrays = (self.labels, self.keys, self._group, self.sizes, self._order, self._starts)
+        return sum(array.nbytes for array in arrays)
+
+    @property
+    def duplicates(self):
+        """Number of questions that are a near-duplicate of an earlier question in the bank."""
+        return len(self.labels) - len(self.keys)
+
+    def members(self, position):
+        """Returns the positions in the same group as position, itself included."""
+        group = self._group[position]
+        return self._order[self._starts[group]:self._starts[group] + self.sizes[group]]
+
+    def positions(self, labels):
+        """Returns the positions of every question whose group label is in labels."""
+        labels = np.asarray(sorted(set(labels)), dtype=np.int64)
+        groups = np.searchsorted(self.keys, labels)
+        groups = groups[(groups < len(self.keys)) & (self.keys[np.minimum(groups, len(self.keys) - 1)] == labels)]
+        if not len(groups):
+            return np.array([], dtype=np.int64)
+        return np.concatenate([self._order[self._starts[g]:self._starts[g] + self.sizes[g]] for g in groups])
+
+    def sample(self, k, exclude=(), rng=random):
+        """
+        Draws up to k positions with no two in the same group, skipping groups labelled in exclude.
+        rng is a random.Random (the module by default); a seeded one makes the draw reproducible.
+        """
+        exclude = set(exclude)
+        draws = rng.sample(range(len(self.keys)), min(len(self.keys), k + len(exclude)))
+        groups = [group for group in draws if int(self.keys[group]) not in exclude][:k]
+        return np.array(
+            [self._order[self._starts[group] + rng.randrange(self.sizes[group])] for group in groups],
+            dtype=np.int64,
+        )
@@ -0,0 +1,99 @@
+"""Exam lifecycle shared by the UI and the deadline scheduler: start, grade, submit and expire."""
+
+import time
+
+import numpy as np
+
+from quiz.answers import grade_answers
+from quiz.composite import load_composite
+from quiz.deadlines import DeadlineScheduler
+from quiz.runtime import get_backend, get_bank_cache, get_journal, get_store, once
+
+# Answers that reach the server this long after the deadline still count (network latency).
+DEADLINE_GRACE_SECONDS = 2
+
+def attempt_deadline(started_at, timer_minutes):
+    """Returns the epoch time an attempt expires at, or None if it is untimed."""
+    return started_at + timer_minutes * 60 if timer_minutes > 0 else None
+
+def start_exam(test_name, question_ids, timer_minutes, started_at):
+    """Journals a new attempt, schedules its deadline and returns the attempt id."""
+    attempt_id = get_journal().start_attempt(test_name, question_ids, timer_minutes, started_at)
+    deadline = attempt_deadline(started_at, timer_minutes)
+    if deadline is not None:
+        get_scheduler().schedule(attempt_id, deadline + DEADLINE_GRACE_SECONDS)
+    return attempt_id
+
+def load_exam_bank(test_name, question_ids):
+    """
+    Resolves the bank an exam was drawn from: its mission's QuestionBank, or a CompositeBank
+    for exams drawn from several missions. Returns None if the mission was deleted or
+    re-imported after the exam started. A worker that hasn't seen the exam's missions yet
+    (started on another worker moments ago) syncs with the state backend and looks again.
+    """
+    bank = find_exam_bank(test_name, question_ids)
+    if bank is None and get_backend().sync():
+        bank = find_exam_bank(test_name, question_ids)
+    return bank
+
+def find_exam_bank(test_name, question_ids):
+    """Looks up the bank of an exam in the local store only; see load_exam_bank."""
+    try:
+        bank = get_bank_cache().get(test_name)
+    except KeyError:
+        bank = None
+    if bank is not None and bank.contains(question_ids):
+        return bank
+    return load_composite(test_name, question_ids, get_store())
+
+def grade_exam(bank, question_ids, answers):
+    """Grades packed answers against a bank. Returns (answers, answer key, correct mask) as arrays."""
+    answers = np.frombuffer(answers, dtype=np.int8) if not isinstance(answers, np.ndarray) else answers
+    answer_key = bank.key_for(question_ids)
+    return answers, answer_key, grade_answers(answers, answer_key)
+
+def submit_exam(attempt_id, bank, question_ids, answers):
+    """
+    Grades and submits an attempt. Only the first submission of an attempt (from its tab,
+    another tab or the deadline scheduler) is recorded and feeds the question statistics.
+    Returns (answer key, correct mask, first submission).
+    """
+    answers, answer_key, correct_mask = grade_exam(bank, question_ids, answers)
+    first_submission = True
+    if attempt_id:
+        first_submission = get_journal().finish_attempt(attempt_id, int(correct_mask.sum()), len(answer_key))
+        get_scheduler().cancel(attempt_id)
+    if first_submission:
+        bank.record_results(question_ids, answers, correct_mask)
+    return answer_key, correct_mask, first_submission
+
+def expire_attempt(attempt_id):
+    """
+    Auto-submits an attempt whose time ran out, grading the answers recorded in the journal.
+    An attempt whose mission was deleted or re-imported is closed without a score.
+    """
+    attempt = get_journal().load_attempt(attempt_id)
+    if attempt is None or attempt["submitted"]:
+        return
+    bank = load_exam_bank(attempt["test_name"], attempt["question_ids"])
+    if bank is None:
+        get_journal().finish_attempt(attempt_id, None, None)
+        return
+    submit_exam(attempt_id, bank, attempt["question_ids"], attempt["answers"])
+
+def is_expired(started_at, timer_minutes, now=None):
+    """Returns True once a timed attempt is past its deadline (grace period included)."""
+    deadline = attempt_deadline(started_at, timer_minutes)
+    now = time.time() if now is None else now
+    return deadline is not None and now > deadline + DEADLINE_GRACE_SECONDS
+
+@once
+def get_scheduler():
+    """
+    Returns the process's DeadlineScheduler, started on first use with every timed attempt
+    still open in the journal, so attempts left running across a restart expire too.
+    """
+    scheduler = DeadlineScheduler(expire_attempt)
+    for attempt_id, deadline in get_journal().pending_deadlines():
+        scheduler.schedule(attempt_id, deadline + DEADLINE_GRACE_SECONDS)
+    return scheduler
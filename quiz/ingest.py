@@ -0,0 +1,263 @@
+"""Validating import of CSV uploads into the question store."""
+
+import io
+import os
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import BrokenExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from quiz.answers import NO_ANSWER, OPTION_LETTERS, build_answer_key
+from quiz.dedup import minhash_signatures
+from quiz.metrics import instrument, timed_iter
+from quiz.store import BANK_COLUMNS, REQUIRED_COLUMNS, validate_columns
+
+# Uploads are parsed and written in chunks of this many rows, which bounds peak memory.
+INGEST_CHUNK_ROWS = 5000
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Bulk uploads (several files or a ZIP archive) are capped at this many uncompressed bytes in total.
+MAX_BULK_BYTES = 500 * 1024 * 1024
+# Only the first few row errors are kept for display; the rest are just counted.
+MAX_REPORTED_ERRORS = 50
+
+# Errors that reject a whole file rather than single rows.
+INGEST_ERRORS = (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError)
+
+@dataclass
+class IngestReport:
+    """Outcome of importing one CSV: counts, per-row errors and throughput."""
+    test_name: str
+    rows_read: int = 0
+    rows_written: int = 0
+    duplicates: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)  # (row number, message), capped at MAX_REPORTED_ERRORS
+    warnings: list = field(default_factory=list)
+    fatal: str = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return self.fatal is None and self.rows_written > 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds > 0 else 0.0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+def upload_size(source):
+    """Returns the size in bytes of a path, an UploadedFile or a seekable file object."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if getattr(source, "size", None) is not None:
+        return source.size
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+@instrument("ingest.csv")
+def ingest_csv(source, test_name, store):
+    """
+    Imports a CSV (path or file-like) into the question store, parsing and validating it chunk
+    by chunk. The validated rows are held in memory until they are written, which
+    MAX_UPLOAD_BYTES keeps bounded.
+    """
+    if upload_size(source) > MAX_UPLOAD_BYTES:
+        return too_large_report(test_name)
+    return ingest_frames(pd.read_csv(source, dtype=str, chunksize=INGEST_CHUNK_ROWS), test_name, store)
+
+def ingest_frames(frames, test_name, store):
+    """
+    Imports an iterable of DataFrame chunks as a mission. Each chunk is validated, its answers
+    are normalized to option letters and rows already seen are dropped. The whole file is
+    validated before the store's write lock is taken, so a slow parse never blocks other
+    writers. The chunks are then written in one transaction, which replaces any existing
+    mission only if at least one row was imported.
+    """
+    report = IngestReport(test_name)
+    started = time.perf_counter()
+    try:
+        chunks = list(validated_chunks(frames, report))
+        if chunks:
+            report.rows_written = store.replace_bank(test_name, chunks)
+    except INGEST_ERRORS as e:
+        report.fatal = str(e).strip() or type(e).__name__
+    finally:
+        report.seconds = time.perf_counter() - started
+
+    if report.fatal is None and report.rows_written == 0:
+        report.fatal = "No valid questions found."
+    return report
+
+def validated_chunks(frames, report):
+    """Validates DataFrame chunks one at a time, yielding the (rows, answer key, signatures) of each chunk to keep."""
+    seen_hashes = set()
+    # Pulling a chunk is where pd.read_csv does its parsing, so it is timed separately.
+    for chunk in timed_iter(frames, "ingest.read_chunk"):
+        if report.rows_read == 0:
+            validate_columns(chunk.columns)
+            missing_hindi = [col for col in BANK_COLUMNS if col not in chunk.columns]
+            if missing_hindi:
+                report.warnings.append(f"Columns not found, left empty: {', '.join(missing_hindi)}")
+        # Row numbers as shown in a spreadsheet: the header is row 1.
+        row_numbers = np.arange(report.rows_read, report.rows_read + len(chunk)) + 2
+        report.rows_read += len(chunk)
+        kept = ingest_chunk(chunk, row_numbers, seen_hashes, report)
+        if kept is not None:
+            yield kept
+
+@instrument("ingest.chunk")
+def ingest_chunk(chunk, row_numbers, seen_hashes, report):
+    """
+    Validates and deduplicates one chunk, returning the (rows, answer key, MinHash signatures)
+    to keep, or None. Signatures are computed here so bulk imports build them in the workers.
+    """
+    answer_key = build_answer_key(chunk)
+    questions = chunk['Question (English)'].astype('string').str.strip()
+    valid = (questions.notna() & (questions != "")).to_numpy(dtype=bool)
+    for row_number in row_numbers[~valid]:
+        report.add_error(int(row_number), "Question (English) is empty.")
+    unmapped = valid & (answer_key == NO_ANSWER)
+    for row_number, answer in zip(row_numbers[unmapped], chunk['Correct Answer (English)'][unmapped]):
+        report.add_error(int(row_number), f"Correct answer '{answer}' does not match any option.")
+    valid &= ~unmapped
+
+    # Duplicates are identified by the English question and options, within and across chunks.
+    dedupe_columns = [col for col in REQUIRED_COLUMNS if col != 'Correct Answer (English)']
+    normalized = chunk[dedupe_columns].apply(lambda col: col.astype('string').str.strip().str.lower())
+    row_hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+    for i in np.flatnonzero(valid):
+        if row_hashes[i] in seen_hashes:
+            valid[i] = False
+            report.duplicates += 1
+        else:
+            seen_hashes.add(row_hashes[i])
+
+    if not valid.any():
+        return None
+    kept = chunk[valid].copy()
+    kept_key = answer_key[valid]
+    kept['Correct Answer (English)'] = np.array(OPTION_LETTERS)[kept_key]
+    return kept, kept_key, minhash_signatures(kept)
+
+# --- Bulk import ---
+
+def expand_uploads(uploads):
+    """
+    Turns uploaded CSV and ZIP files into (mission name, CSV bytes) pairs, named after each CSV file.
+    Returns (sources, reports) where reports describe files that were rejected outright.
+    """
+    sources, reports = [], []
+    total_bytes = 0
+    for upload in uploads:
+        name, ext = os.path.splitext(os.path.basename(upload.name))
+        if ext.lower() == ".zip":
+            try:
+                with zipfile.ZipFile(upload) as archive:
+                    for member in archive.infolist():
+                        member_name, member_ext = os.path.splitext(os.path.basename(member.filename))
+                        if member.is_dir() or member_ext.lower() != ".csv" or member_name.startswith(".") \
+                                or member.filename.startswith("__MACOSX/"):
+                            continue
+                        if member.file_size > MAX_UPLOAD_BYTES:
+                            reports.append(too_large_report(member_name))
+                            continue
+                        total_bytes += member.file_size
+                        if total_bytes > MAX_BULK_BYTES:
+                            reports.append(too_large_report(member_name, MAX_BULK_BYTES))
+                            continue
+                        sources.append((member_name, archive.read(member)))
+            except zipfile.BadZipFile:
+                report = IngestReport(name)
+                report.fatal = "Not a valid ZIP archive."
+                reports.append(report)
+        elif upload_size(upload) > MAX_UPLOAD_BYTES:
+            reports.append(too_large_report(name))
+        elif total_bytes + upload_size(upload) > MAX_BULK_BYTES:
+            reports.append(too_large_report(name, MAX_BULK_BYTES))
+        else:
+            total_bytes += upload_size(upload)
+            sources.append((name, upload.getvalue()))
+    return sources, reports
+
+def too_large_report(test_name, limit=MAX_UPLOAD_BYTES):
+    """Returns the report for a file rejected for its size."""
+    report = IngestReport(test_name)
+    report.fatal = f"File is larger than {limit // (1024 * 1024)} MB."
+    return report
+
+def parse_csv(test_name, data):
+    """
+    Parses and validates one CSV without touching the store, so it can run in a worker
+    process. Returns (report, chunks) where chunks are the (rows, answer key, signatures) to write.
+    """
+    report = IngestReport(test_name)
+    started = time.perf_counter()
+    chunks = []
+    try:
+        frames = pd.read_csv(io.BytesIO(data), dtype=str, chunksize=INGEST_CHUNK_ROWS)
+        chunks = list(validated_chunks(frames, report))
+    except INGEST_ERRORS as e:
+        report.fatal = str(e).strip() or type(e).__name__
+        chunks = []
+    finally:
+        report.seconds = time.perf_counter() - started
+    if report.fatal is None and not chunks:
+        report.fatal = "No valid questions found."
+    return report, chunks
+
+@instrument("ingest.bulk")
+def ingest_bulk(sources, store, executor=None, allocate_ids=None, publish=None):
+    """
+    Imports many (mission name, CSV bytes) pairs at once. Files are parsed and validated in
+    parallel on executor (in this process when None), then every valid mission is written
+    in a single transaction, so the store never shows half of a batch.
+    allocate_ids({name: question count}) -> {name: first question id}, when given, is called
+    just before the write to number the questions. publish(first_ids), when given, is called
+    once the missions are written but before they become visible; if it raises, none is
+    saved (see NetworkBackend).
+    Returns one IngestReport per source, in order.
+    """
+    parsed = None
+    if executor is not None and len(sources) > 1:
+        try:
+            parsed = list(executor.map(parse_csv, *zip(*sources)))
+        except BrokenExecutor:
+            # A worker died (e.g. out of memory); parse here instead of failing the upload.
+            parsed = None
+    if parsed is None:
+        parsed = [parse_csv(name, data) for name, data in sources]
+
+    reports = [report for report, _ in parsed]
+    seen = set()
+    for report in reports:
+        if report.test_name in seen and report.fatal is None:
+            report.fatal = "Another file in this upload has the same mission name."
+        seen.add(report.test_name)
+
+    missions = [(report.test_name, chunks) for report, chunks in parsed if report.fatal is None]
+    try:
+        first_ids = None
+        if allocate_ids is not None and missions:
+            first_ids = allocate_ids({
+                test_name: sum(len(frame) for frame, _, _ in chunks) for test_name, chunks in missions
+            })
+        before_swap = (lambda: publish(first_ids)) if publish is not None else None
+        counts = store.replace_banks(missions, first_ids, before_swap)
+    except (sqlite3.Error, OSError) as e:
+        for report in reports:
+            if report.fatal is None:
+                report.fatal = f"Could not save the batch: {e}"
+        return reports
+    for report in reports:
+        report.rows_written = counts.get(report.test_name, 0) if report.fatal is None else 0
+    return reports
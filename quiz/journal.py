@@ -0,0 +1,255 @@
+"""Durable, group-committed journal of exam attempts and answers."""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from contextlib import closing
+
+import numpy as np
+
+from quiz.answers import NO_ANSWER
+from quiz.store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Attempts are journaled to their own database so answer writes never wait behind a mission import.
+JOURNAL_PATH = os.path.join(DATA_DIR, "attempts.db")
+# The writer thread commits everything queued within this window in one fsync'd transaction.
+JOURNAL_FLUSH_INTERVAL = 0.05
+# Pause before retrying records whose commit failed, e.g. while the disk is full or the database locked.
+JOURNAL_RETRY_SECONDS = 1
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id TEXT PRIMARY KEY,
+    test_name TEXT NOT NULL,
+    question_ids BLOB NOT NULL,
+    timer_minutes INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    submitted_at REAL,
+    correct INTEGER,
+    total INTEGER
+);
+CREATE TABLE IF NOT EXISTS answers (
+    attempt_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    answer INTEGER NOT NULL,
+    answered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_attempt ON answers(attempt_id);
+CREATE TABLE IF NOT EXISTS positions (
+    attempt_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_attempts ON attempts(started_at) WHERE submitted_at IS NULL;
+"""
+
+class FlushRequest(threading.Event):
+    """
+    A flush() waiting in a journal's queue. It is set once every record queued before it is
+    settled; ok is cleared if one of those records was dropped instead of written.
+    """
+
+    ok = True
+
+def next_batch(records, timeout=None):
+    """
+    Waits for a record on a queue, then collects everything else queued within
+    JOURNAL_FLUSH_INTERVAL. Returns the batch, or [] if nothing arrived within timeout.
+    """
+    try:
+        batch = [records.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + JOURNAL_FLUSH_INTERVAL
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            batch.append(records.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+class AttemptJournal:
+    """
+    Append-only, durable log of exam attempts.
+    Writes are queued and committed by a single background thread with group commit:
+    a click only enqueues a record, and one fsync covers every record that arrived
+    within JOURNAL_FLUSH_INTERVAL. Replaying an attempt's answers restores it after a reconnect.
+    Submissions are the exception: they are written synchronously, so exactly one grader wins.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(JOURNAL_SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="attempt-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def start_attempt(self, test_name, question_ids, timer_minutes, started_at, attempt_id=None):
+        """
+        Queues a new attempt and returns its id (a new one unless attempt_id is given). Starting
+        an attempt id that exists does nothing, so a resent batch can't fail on it.
+        """
+        attempt_id = attempt_id or uuid.uuid4().hex
+        self._queue.put((
+            "INSERT OR IGNORE INTO attempts (id, test_name, question_ids, timer_minutes, started_at) VALUES (?, ?, ?, ?, ?)",
+            (attempt_id, test_name, np.asarray(question_ids, dtype=np.int64).tobytes(), timer_minutes, started_at),
+        ))
+        return attempt_id
+
+    def record_answer(self, attempt_id, position, answer, answered_at=None):
+        """Queues one answer change. Later records for the same position win on replay."""
+        self._queue.put((
+            "INSERT INTO answers (attempt_id, position, answer, answered_at) VALUES (?, ?, ?, ?)",
+            (attempt_id, position, answer, answered_at or time.time()),
+        ))
+
+    def record_position(self, attempt_id, position):
+        """Queues the question an attempt is on, so a resumed attempt reopens there."""
+        self._queue.put((
+            "INSERT OR REPLACE INTO positions (attempt_id, position) VALUES (?, ?)", (attempt_id, position),
+        ))
+
+    def finish_attempt(self, attempt_id, correct, total):
+        """
+        Records the final score of an attempt, synchronously. Only the first submission counts:
+        returns True if this call submitted the attempt, False if it was already submitted
+        (by another tab, or by the deadline scheduler).
+        """
+        self.flush()
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "UPDATE attempts SET submitted_at = ?, correct = ?, total = ? WHERE id = ? AND submitted_at IS NULL",
+                (time.time(), correct, total, attempt_id),
+            ).rowcount > 0
+
+    def pending_deadlines(self):
+        """Returns (attempt id, deadline) for every timed attempt that hasn't been submitted."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT id, started_at + timer_minutes * 60 FROM attempts "
+                "WHERE submitted_at IS NULL AND timer_minutes > 0"
+            ).fetchall()
+
+    def flush(self, timeout=5):
+        """
+        Blocks until every record queued so far is committed. Returns False if that took longer
+        than timeout (e.g. commits keep failing) or a record had to be dropped.
+        """
+        done = FlushRequest()
+        self._queue.put(done)
+        return done.wait(timeout) and done.ok
+
+    def load_attempt(self, attempt_id):
+        """Replays an attempt from the journal in O(answers). Returns None if it doesn't exist."""
+        self.flush()
+        with closing(self._connect()) as conn:
+            attempt = conn.execute(
+                "SELECT test_name, question_ids, timer_minutes, started_at, submitted_at FROM attempts WHERE id = ?",
+                (attempt_id,),
+            ).fetchone()
+            if attempt is None:
+                return None
+            answer_rows = conn.execute(
+                "SELECT position, answer FROM answers WHERE attempt_id = ? ORDER BY rowid", (attempt_id,)
+            ).fetchall()
+            position_row = conn.execute("SELECT position FROM positions WHERE attempt_id = ?", (attempt_id,)).fetchone()
+
+        test_name, question_ids_blob, timer_minutes, started_at, submitted_at = attempt
+        question_ids = np.frombuffer(question_ids_blob, dtype=np.int64)
+        answers = array('b', [NO_ANSWER]) * len(question_ids)
+        last_position = 0
+        for position, answer in answer_rows:
+            answers[position] = answer
+            last_position = position
+        # The question last navigated to; attempts journaled before navigation was recorded fall back to the last answer.
+        if position_row is not None:
+            last_position = position_row[0]
+        return {
+            "test_name": test_name,
+            "question_ids": question_ids,
+            "answers": answers,
+            "timer_minutes": timer_minutes,
+            "started_at": started_at,
+            "submitted": submitted_at is not None,
+            "last_position": last_position,
+        }
+
+    def scores(self):
+        """
+        Returns (test_name, submitted_at, correct, total) for every submitted attempt.
+        Reads one row per attempt, so its cost doesn't grow with the number of recorded answers.
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT test_name, submitted_at, correct, total FROM attempts "
+                "WHERE submitted_at IS NOT NULL AND total IS NOT NULL"
+            ).fetchall()
+
+    def _commit(self, conn, records):
+        """Writes records in one transaction, or rolls it back and raises sqlite3.Error."""
+        try:
+            conn.execute("BEGIN")
+            for sql, params in records:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _commit_each(self, conn, records):
+        """
+        Writes records one transaction at a time, after a group commit failed. Records that can
+        never be written (e.g. a duplicate attempt id) are dropped. Returns (records still
+        unwritten after a transient error, in order; number dropped).
+        """
+        dropped = 0
+        for pos, record in enumerate(records):
+            try:
+                self._commit(conn, [record])
+            except sqlite3.IntegrityError:
+                logger.exception("Dropped a journal record of attempt %s that can't be written", record[1][0])
+                dropped += 1
+            except sqlite3.Error:
+                return records[pos:], dropped
+        return [], dropped
+
+    def _write_loop(self):
+        conn = self._connect()
+        unsent, waiters = [], []
+        while True:
+            batch = next_batch(self._queue, JOURNAL_RETRY_SECONDS if unsent else None)
+            waiters += [item for item in batch if isinstance(item, FlushRequest)]
+            unsent += [item for item in batch if not isinstance(item, FlushRequest)]
+            if unsent:
+                try:
+                    self._commit(conn, unsent)
+                    unsent = []
+                except sqlite3.Error:
+                    logger.exception("Could not commit %d journal records; writing them one at a time", len(unsent))
+                    unsent, dropped = self._commit_each(conn, unsent)
+                    if dropped:
+                        for waiter in waiters:
+                            waiter.ok = False
+                    if unsent:
+                        logger.warning("Retrying %d journal records in %s s", len(unsent), JOURNAL_RETRY_SECONDS)
+                        continue
+            # Flushes are released only once everything queued before them is committed (or dropped).
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
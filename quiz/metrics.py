@@ -0,0 +1,184 @@
+"""
+Opt-in instrumentation: per-rerun timings, element counts and session-state size.
+
+Enabled by setting QUIZ_METRICS=1 before the app starts. When disabled, the
+decorators return the original functions unchanged, so there is no overhead.
+Samples are aggregated across all sessions of the process and exposed as
+percentiles, both in the app's debug panel and as a Prometheus text file.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from quiz import DATA_DIR
+
+ENABLED = os.environ.get("QUIZ_METRICS") == "1"
+# Prometheus textfile written after reruns; point a node_exporter textfile collector at it.
+METRICS_FILE = os.environ.get("QUIZ_METRICS_FILE", os.path.join(DATA_DIR, "metrics.prom"))
+METRICS_FILE_INTERVAL = 10
+# Each metric keeps a sliding window of its most recent samples for percentile estimates.
+WINDOW_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+class MetricsRegistry:
+    """Thread-safe, process-wide store of timing and size samples."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._samples = {}  # name -> deque of recent values
+        self._totals = {}   # name -> [count, sum] over the process lifetime
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def observe(self, name, value):
+        """Records one sample."""
+        with self._lock:
+            window = self._samples.get(name)
+            if window is None:
+                window = self._samples[name] = deque(maxlen=self.window_size)
+                self._totals[name] = [0, 0.0]
+            window.append(value)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += value
+
+    @contextmanager
+    def timer(self, name):
+        """Times the enclosed block, recording seconds under name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        """Returns {name: {"count", "sum", "p50", "p95", "p99"}} over the current windows."""
+        with self._lock:
+            windows = {name: np.fromiter(values, dtype=float) for name, values in self._samples.items()}
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+        snapshot = {}
+        for name, values in sorted(windows.items()):
+            percentiles = np.quantile(values, QUANTILES) if len(values) else [0.0] * len(QUANTILES)
+            snapshot[name] = {
+                "count": totals[name][0],
+                "sum": totals[name][1],
+                **{f"p{round(q * 100)}": float(p) for q, p in zip(QUANTILES, percentiles)},
+            }
+        return snapshot
+
+    def render_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format, as summaries."""
+        lines = []
+        for name, stats in self.snapshot().items():
+            metric = "quiz_" + "".join(c if c.isalnum() else "_" for c in name)
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {stats[f"p{round(q * 100)}"]:.9g}')
+            lines.append(f"{metric}_sum {stats['sum']:.9g}")
+            lines.append(f"{metric}_count {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None, min_interval=METRICS_FILE_INTERVAL):
+        """Atomically rewrites the Prometheus text file, at most once per min_interval seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < min_interval:
+                return False
+            self._last_export = now
+        path = path or METRICS_FILE
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+        return True
+
+registry = MetricsRegistry()
+
+def instrument(name):
+    """Decorator that times every call under name. A no-op unless metrics are enabled."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with registry.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def timed_iter(iterable, name):
+    """Times each step of an iterator (e.g. a chunked pd.read_csv) under name."""
+    if not ENABLED:
+        return iterable
+    return _timed_iter(iter(iterable), name)
+
+def _timed_iter(iterator, name):
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        registry.observe(name, time.perf_counter() - started)
+        yield item
+
+# --- Per-rerun element counting ---
+
+_rerun = threading.local()
+
+def install_element_counter():
+    """
+    Counts elements and widgets sent to the browser by wrapping Streamlit's internal
+    enqueue hook. Each script run executes on its own thread, so counts are per rerun.
+    """
+    from streamlit.delta_generator import DeltaGenerator
+
+    original = getattr(DeltaGenerator, "_enqueue", None)
+    if original is None or getattr(original, "_quiz_counting", False):
+        return
+
+    @functools.wraps(original)
+    def counting_enqueue(self, delta_type, *args, **kwargs):
+        _rerun.elements = getattr(_rerun, "elements", 0) + 1
+        return original(self, delta_type, *args, **kwargs)
+
+    counting_enqueue._quiz_counting = True
+    DeltaGenerator._enqueue = counting_enqueue
+
+def start_rerun():
+    """Resets the element counter at the start of a script run."""
+    _rerun.elements = 0
+
+def rerun_elements():
+    """Returns the number of elements emitted so far in this script run."""
+    return getattr(_rerun, "elements", 0)
+
+def finish_rerun(screen, session_state):
+    """Records the element count and session-state size of a finished script run."""
+    registry.observe("rerun.elements", rerun_elements())
+    registry.observe(f"rerun.elements.{screen}", rerun_elements())
+    registry.observe("session.state_bytes", sum(estimate_size(value) for value in session_state.values()))
+    try:
+        registry.export()
+    except OSError:
+        pass
+
+def estimate_size(value):
+    """Rough size in bytes of a session-state value, counting array buffers at their real size."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "buffer_info"):
+        return value.buffer_info()[1] * value.itemsize
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
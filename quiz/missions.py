@@ -0,0 +1,125 @@
+"""Mission catalog operations used by the UI: listing, loading, uploading and deleting missions."""
+
+import io
+import os
+
+import pandas as pd
+
+from quiz.exams import get_scheduler
+from quiz.ingest import expand_uploads
+from quiz.metrics import instrument
+from quiz.runtime import get_backend, get_bank_cache, get_catalog, get_ingest_pool, get_store, once
+from quiz.store import DATA_DIR, DEFAULT_TEST
+
+DEFAULT_TEST_SOURCE = "questions.csv"
+
+@instrument("missions.load_test")
+def load_test(test_name):
+    """Loads a test's QuestionBank through the shared cache. The result must not be mutated."""
+    return get_bank_cache().get(test_name)
+
+@instrument("missions.load_available_tests")
+def load_available_tests():
+    """Returns the names of all missions in the question store, default mission first."""
+    return get_catalog().names()
+
+@instrument("missions.search_missions")
+def search_missions(query="", sort="Name"):
+    """Returns catalog entries (name, question_count, size_bytes, modified_at) matching query, in sort order."""
+    return get_catalog().search(query, sort)
+
+def search_questions(query, page=0, page_size=20):
+    """
+    Searches the question and option text of every mission. Returns (total matches, results)
+    for one page of the bm25-ranked matches; see QuestionStore.search_questions.
+    """
+    return get_store().search_questions(query, page_size, page * page_size)
+
+@instrument("missions.save_uploaded_file")
+def save_uploaded_file(uploaded_file, custom_name):
+    """Imports an uploaded CSV file as a mission and returns the IngestReport."""
+    report = get_backend().import_mission(uploaded_file, custom_name)
+    if report.ok:
+        get_bank_cache().invalidate(custom_name)
+    return report
+
+@instrument("missions.save_uploaded_files")
+def save_uploaded_files(uploaded_files):
+    """
+    Imports several uploaded CSV and ZIP files as missions named after each CSV, parsing them
+    in parallel and saving them together. Returns one IngestReport per file found.
+    """
+    sources, rejected = expand_uploads(uploaded_files)
+    pool = get_ingest_pool() if len(sources) > 1 else None
+    reports = get_backend().import_missions(sources, pool)
+    for report in reports:
+        if report.ok:
+            get_bank_cache().invalidate(report.test_name)
+    return reports + rejected
+
+def delete_test(test_name):
+    """Deletes a mission, preventing deletion of the default test."""
+    if test_name != DEFAULT_TEST and get_backend().delete_mission(test_name):
+        get_bank_cache().invalidate(test_name)
+        return True
+    return False
+
+@instrument("missions.export_test_csv")
+def export_test_csv(test_name):
+    """Returns a mission as UTF-8 CSV bytes in the upload format."""
+    store = get_store()
+    return store.export_frame(store.get_bank(test_name)).to_csv(index=False).encode("utf-8")
+
+def migrate_legacy_tests(backend):
+    """Imports missions saved as CSV or Arrow files by earlier versions of the app through the state backend."""
+    for file_name in os.listdir(DATA_DIR):
+        test_name, ext = os.path.splitext(file_name)
+        path = os.path.join(DATA_DIR, file_name)
+        if ext not in ('.csv', '.arrow'):
+            continue
+        try:
+            if backend.store.get_bank(test_name) is None:
+                if ext == '.csv':
+                    report = backend.import_mission(path, test_name)
+                else:
+                    report = backend.import_mission(io.BytesIO(pd.read_feather(path).to_csv(index=False).encode("utf-8")), test_name)
+                if not report.ok:
+                    continue
+            os.remove(path)
+        except OSError:
+            continue
+
+def seed_default_mission(backend):
+    """Imports the default mission from questions.csv, or a one-question placeholder if it is missing."""
+    if backend.store.get_bank(DEFAULT_TEST) is not None:
+        return
+    if os.path.exists(DEFAULT_TEST_SOURCE):
+        backend.import_mission(DEFAULT_TEST_SOURCE, DEFAULT_TEST)
+    else:
+        placeholder = pd.DataFrame({
+            'Question (English)': ["What is the closest planet to the Sun?"], 
+            'Question (Hindi)': ["सूर्य के सबसे निकट का ग्रह कौन सा है?"],
+            'Option A (English)': ["Venus"], 'Option A (Hindi)': ["शुक्र"],
+            'Option B (English)': ["Mars"], 'Option B (Hindi)': ["मंगल"],
+            'Option C (English)': ["Mercury"], 'Option C (Hindi)': ["बुध"],
+            'Option D (English)': ["Earth"], 'Option D (Hindi)': ["पृथ्वी"],
+            'Correct Answer (English)': ["Mercury"]
+        })
+        backend.import_mission(io.BytesIO(placeholder.to_csv(index=False).encode("utf-8")), DEFAULT_TEST)
+
+@once
+def bootstrap():
+    """
+    One-time process setup: opens the stores and the state backend, migrates file-based
+    missions, seeds the default mission, starts the deadline scheduler and warms the bank
+    cache with the default mission. Later calls return immediately.
+    """
+    get_catalog()
+    backend = get_backend()
+    migrate_legacy_tests(backend)
+    seed_default_mission(backend)
+    get_scheduler()
+    try:
+        load_test(DEFAULT_TEST)
+    except KeyError:
+        pass
@@ -0,0 +1,175 @@
+"""
+Printed exam papers: seeded paper variants and offline grading of their answer sheets.
+
+Each variant is drawn with a random.Random seeded from the batch seed and the variant
+number, so the same missions and seed always give the same papers. Each variant's answer
+key is saved in a manifest next to the papers. Answer sheets are graded against the
+manifest alone, so they can be graded after the missions are re-imported, or on another machine.
+"""
+
+import io
+import itertools
+import json
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+from quiz.answers import NO_ANSWER, OPTION_LETTERS, answer_letter, grade_answers
+from quiz.composite import CompositeBank, compose_exam, stratified_quotas
+from quiz.metrics import instrument
+from quiz.runtime import get_bank_cache
+from quiz.store import BANK_COLUMNS
+
+# Printed papers carry the questions and options, never the answer.
+PAPER_COLUMNS = [col for col in BANK_COLUMNS if col != 'Correct Answer (English)']
+MANIFEST_FILE = "manifest.json"
+# Answer sheets hold one row per candidate: these two columns, then Q1, Q2, ... with the option letters marked.
+SHEET_CANDIDATE_COLUMN = "Candidate"
+SHEET_VARIANT_COLUMN = "Variant"
+# Answer sheets graded per chunk; each chunk is one task when grading in a process pool.
+GRADE_CHUNK_ROWS = 20000
+
+def paper_file(variant):
+    """Returns the file name of a variant's paper, e.g. 'variant_007.csv'."""
+    return f"variant_{variant:03d}.csv"
+
+def variant_rng(seed, variant):
+    """Returns the random.Random that draws one variant; the same seed and variant always give the same paper."""
+    return random.Random(f"{seed}:{variant}")
+
+@instrument("papers.generate_variants")
+def generate_variants(test_names, questions, variants, seed, distinct=False):
+    """
+    Draws variants papers of up to questions questions each from the given missions, split in
+    proportion to their size when there are several. Returns (bank, list of question id arrays),
+    where bank is the CompositeBank used to fetch and key the papers.
+    Raises KeyError if a mission doesn't exist.
+    """
+    cache = get_bank_cache()
+    banks = [cache.get(name) for name in test_names]
+    quotas = stratified_quotas({bank.name: len(bank) for bank in banks}, questions)
+    papers = [compose_exam(quotas, distinct=distinct, rng=variant_rng(seed, variant)) for variant in range(1, variants + 1)]
+    return CompositeBank(" + ".join(test_names), banks), papers
+
+def paper_frame(bank, question_ids):
+    """Returns one paper as a DataFrame: its numbered questions and options, without answers."""
+    paper = pd.DataFrame(bank.rows(question_ids), columns=PAPER_COLUMNS)
+    paper.insert(0, "Question Number", np.arange(1, len(paper) + 1))
+    return paper
+
+@instrument("papers.write_papers")
+def write_papers(directory, bank, papers, seed, distinct=False):
+    """
+    Writes one CSV per paper and the manifest holding every variant's question ids and answer
+    key (option letters, '-' where the bank has no valid answer). Returns the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    variants = []
+    for variant, question_ids in enumerate(papers, start=1):
+        paper_frame(bank, question_ids).to_csv(os.path.join(directory, paper_file(variant)), index=False)
+        answer_key = bank.key_for(question_ids)
+        variants.append({
+            "variant": variant,
+            "question_ids": [int(question_id) for question_id in question_ids],
+            "answer_key": "".join(answer_letter(code) or "-" for code in answer_key),
+        })
+    manifest = {
+        "missions": [{"name": member.name, "bank_id": member.bank_id} for member in bank.banks],
+        "seed": seed,
+        "distinct": distinct,
+        "variants": variants,
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+def sheet_answers(sheets, questions):
+    """
+    Returns the int8 answer codes of the first questions answers on each sheet. Letters are
+    case-insensitive; blanks, missing columns and anything else count as unanswered.
+    """
+    marks = sheets.reindex(columns=[f"Q{i + 1}" for i in range(questions)]).to_numpy(dtype=object)
+    # Sheets only hold a handful of distinct marks, so each is decoded once and looked up by code.
+    codes, uniques = pd.factorize(marks.ravel())
+    letters = {letter: pos for pos, letter in enumerate(OPTION_LETTERS)}
+    decoded = np.array([letters.get(str(mark).strip().upper(), NO_ANSWER) for mark in uniques] + [NO_ANSWER], dtype=np.int8)
+    return decoded[codes].reshape(marks.shape)
+
+class PaperKeys:
+    """
+    Answer keys of every variant in a manifest, as one int8 row per variant padded with
+    NO_ANSWER to the longest paper, so a whole chunk of answer sheets is graded in one compare.
+    Small and picklable, so it is sent to each worker when grading in a process pool.
+    """
+
+    def __init__(self, manifest):
+        letters = [variant["answer_key"] for variant in manifest["variants"]]
+        self.variants = np.array([variant["variant"] for variant in manifest["variants"]], dtype=np.int64)
+        self.lengths = np.array([len(key) for key in letters], dtype=np.int64)
+        self.answer_keys = np.full((len(letters), max(self.lengths, default=0)), NO_ANSWER, dtype=np.int8)
+        for row, key in enumerate(letters):
+            codes = np.frombuffer(key.encode("ascii"), dtype=np.uint8)
+            for pos, letter in enumerate(OPTION_LETTERS):
+                self.answer_keys[row, :len(key)][codes == ord(letter)] = pos
+
+    def rows(self, numbers):
+        """Returns the key row of each variant number, or -1 for numbers not in the manifest."""
+        numbers = pd.to_numeric(numbers, errors="coerce").to_numpy(dtype=float)
+        if not len(self.variants):
+            return np.full(len(numbers), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.variants, numbers), len(self.variants) - 1)
+        return np.where(self.variants[rows] == numbers, rows, -1)
+
+    @instrument("papers.grade_sheets")
+    def grade(self, sheets):
+        """
+        Grades a DataFrame of answer sheets. Returns Candidate, Variant, Correct, Total and
+        Score % per sheet; sheets naming a variant that isn't in the manifest get no score.
+        """
+        rows = self.rows(sheets[SHEET_VARIANT_COLUMN])
+        known = rows >= 0
+        correct_mask = grade_answers(sheet_answers(sheets, self.answer_keys.shape[1]), self.answer_keys[rows])
+        results = pd.DataFrame({
+            SHEET_CANDIDATE_COLUMN: sheets[SHEET_CANDIDATE_COLUMN].to_numpy(),
+            SHEET_VARIANT_COLUMN: sheets[SHEET_VARIANT_COLUMN].to_numpy(),
+            "Correct": pd.array(np.where(known, correct_mask.sum(axis=1), 0), dtype="Int64"),
+            "Total": pd.array(self.lengths[rows], dtype="Int64"),
+        })
+        results.loc[~known, ["Correct", "Total"]] = pd.NA
+        results["Score %"] = results["Correct"] / results["Total"] * 100
+        return results
+
+def read_sheet_chunks(path, chunk_rows=GRADE_CHUNK_ROWS):
+    """
+    Yields the answer sheet CSV at path as raw chunks of chunk_rows rows, each starting with
+    the header, so workers parse their own chunk. Sheets must not contain multi-line fields.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            yield header + b"".join(lines)
+
+def grade_sheet_chunk(data, keys):
+    """Parses and grades one raw chunk of answer sheets against PaperKeys; runs in a worker process."""
+    return keys.grade(pd.read_csv(io.BytesIO(data), dtype=str))
+
+@instrument("papers.grade_sheet_file")
+def grade_sheet_file(path, manifest, executor=None):
+    """
+    Grades the answer sheet CSV at path against a manifest, chunk by chunk on executor
+    (in this process when None). Returns the results of every sheet, in file order.
+    """
+    keys = PaperKeys(manifest)
+    chunks = read_sheet_chunks(path)
+    if executor is None:
+        results = [grade_sheet_chunk(data, keys) for data in chunks]
+    else:
+        results = list(executor.map(grade_sheet_chunk, chunks, itertools.repeat(keys)))
+    if not results:
+        return pd.DataFrame(columns=[SHEET_CANDIDATE_COLUMN, SHEET_VARIANT_COLUMN, "Correct", "Total", "Score %"])
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,81 @@
+"""
+Process-wide singletons.
+
+Modules are imported once per process, so these objects are shared by every
+Streamlit session (and by scripts that import the package) without needing a
+Streamlit context or st.cache_resource.
+"""
+
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from quiz.backends import LocalBackend, NetworkBackend
+from quiz.bank import QuestionBankCache
+from quiz.catalog import MissionCatalog
+from quiz.store import DATA_DIR, DEFAULT_TEST, QuestionStore
+
+_UNSET = object()
+# Worker processes used to parse bulk uploads in parallel.
+INGEST_WORKERS = os.cpu_count() or 1
+# State server shared by several app workers (see quiz/stateserver.py); unset for a single server.
+STATE_URL = os.environ.get("QUIZ_STATE_URL")
+
+def once(factory):
+    """Decorator: calls factory at most once per process, thread-safely, and returns its result."""
+    result = _UNSET
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get():
+        nonlocal result
+        if result is _UNSET:
+            with lock:
+                if result is _UNSET:
+                    result = factory()
+        return result
+    return get
+
+@once
+def get_store():
+    """Returns the QuestionStore shared by all sessions."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return QuestionStore()
+
+@once
+def get_bank_cache():
+    """Returns the QuestionBankCache shared by all sessions, recording results through the backend."""
+    return QuestionBankCache(get_store(), get_backend().stats)
+
+@once
+def get_catalog():
+    """Returns the MissionCatalog shared by all sessions, kept current by the store's change events."""
+    return MissionCatalog(get_store(), pinned=DEFAULT_TEST)
+
+@once
+def get_backend():
+    """
+    Returns the state backend shared by all sessions: a NetworkBackend on the state server at
+    QUIZ_STATE_URL, or a LocalBackend over this machine's files.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if STATE_URL:
+        return NetworkBackend(STATE_URL, get_store())
+    return LocalBackend(get_store())
+
+def get_journal():
+    """Returns the attempt journal (and its writer thread) shared by all sessions."""
+    return get_backend().journal
+
+@once
+def get_ingest_pool():
+    """
+    Returns the process pool used to parse bulk uploads, started on first use, or None on a
+    single core where a pool only adds overhead. Workers are spawned rather than forked,
+    since the app process runs background threads.
+    """
+    if INGEST_WORKERS < 2:
+        return None
+    return ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
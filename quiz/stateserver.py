@@ -0,0 +1,398 @@
+"""
+State server shared by app workers on several machines: the mission catalog, and exam
+attempts with their answers, behind a small JSON-over-HTTP protocol (see NetworkBackend).
+
+Missions are kept as their uploaded CSV with the block of question ids reserved for them,
+so every worker imports them with identical ids. A version number grows with every upload
+and deletion; workers long-poll for newer versions to keep their local copies current.
+Attempts are journaled with the same AttemptJournal the local backend uses, and per-question
+statistics with the same tables as the question store. A 200 answer means the change is
+committed; malformed requests get 400 and failed commits 500.
+
+    python -m quiz.stateserver --host 0.0.0.0 --port 8765 --data state
+    QUIZ_STATE_URL=http://state-host:8765 streamlit run test.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from quiz.journal import AttemptJournal
+from quiz.store import hardest_stats, record_stats, stats_rows
+
+logger = logging.getLogger(__name__)
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS missions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    first_question_id INTEGER,
+    question_count INTEGER,
+    data BLOB  -- NULL once the mission is deleted, so workers learn about the deletion
+);
+CREATE INDEX IF NOT EXISTS missions_by_version ON missions(version);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_choices (
+    question_id INTEGER NOT NULL,
+    choice INTEGER NOT NULL,
+    picks INTEGER NOT NULL,
+    PRIMARY KEY (question_id, choice)
+) WITHOUT ROWID;
+"""
+# Longest a worker's request for mission changes is held open when there are none.
+MAX_WAIT_SECONDS = 30
+
+class StateServer:
+    """
+    Shared state behind the HTTP handler. Mission changes are serialized by one lock and
+    committed to SQLite before they are acknowledged; waiting workers are woken as they commit.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "state.db")
+        self.journal = AttemptJournal(os.path.join(directory, "attempts.db"))
+        self._changed = threading.Condition()
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(STATE_SCHEMA)
+            self._version = self._counter(conn, "version")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _counter(self, conn, name, increment=0):
+        """Adds increment to a counter inside the caller's transaction and returns its new value."""
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, increment, increment),
+        )
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def _write(self, apply):
+        """Runs apply(conn) in one committed transaction and returns its result."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = apply(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _change(self, apply):
+        """Runs apply(conn, version) in a transaction under the next version, then wakes waiting workers."""
+        with self._changed, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._counter(conn, "version", 1)
+                result = apply(conn, version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._version = version
+            self._changed.notify_all()
+        return result, version
+
+    def reserve(self, counts, above=0):
+        """
+        Reserves a block of question ids for each mission in {name: question count}, all above
+        id above (the worker's own highest id). Returns {name: first id}. Blocks that are never
+        published are simply skipped.
+        """
+        counts = {_text(test_name): int(count) for test_name, count in counts.items()}
+        if any(count < 1 for count in counts.values()):
+            raise ValueError("every mission needs at least one question")
+
+        def apply(conn):
+            self._counter(conn, "next_question_id")
+            conn.execute("UPDATE counters SET value = MAX(value, ?) WHERE name = 'next_question_id'", (int(above),))
+            return {
+                test_name: self._counter(conn, "next_question_id", count) - count + 1
+                for test_name, count in counts.items()
+            }
+        return self._write(apply)
+
+    def publish(self, missions):
+        """
+        Stores a batch of missions, given as dicts with their name, first question id, question
+        count and CSV text, under one version: workers see all of them or none. Returns the version.
+        """
+        rows = [
+            (_text(mission["name"]), int(mission["first_question_id"]), int(mission["question_count"]),
+             mission["data"].encode("utf-8"))
+            for mission in missions
+        ]
+
+        def apply(conn, version):
+            for test_name, first_id, count, data in rows:
+                self._forget_stats(conn, test_name)
+                conn.execute(
+                    "INSERT OR REPLACE INTO missions (name, version, first_question_id, question_count, data) "
+                    "VALUES (?, ?, ?, ?, ?)", (test_name, version, first_id, count, data),
+                )
+        return self._change(apply)[1]
+
+    def delete(self, test_name):
+        """Marks a mission deleted. Returns (True if it existed, version)."""
+        def apply(conn, version):
+            self._forget_stats(conn, test_name)
+            return conn.execute(
+                "UPDATE missions SET version = ?, first_question_id = NULL, question_count = NULL, data = NULL "
+                "WHERE name = ? AND data IS NOT NULL", (version, test_name),
+            ).rowcount > 0
+        return self._change(apply)
+
+    def _forget_stats(self, conn, test_name):
+        """Drops the statistics of a mission's current question ids, as deleting its questions does in a store."""
+        row = conn.execute(
+            "SELECT first_question_id, question_count FROM missions WHERE name = ? AND data IS NOT NULL", (test_name,)
+        ).fetchone()
+        if row is not None:
+            first_id, count = row
+            for table in ("question_stats", "question_choices"):
+                conn.execute(f"DELETE FROM {table} WHERE question_id BETWEEN ? AND ?", (first_id, first_id + count - 1))
+
+    def changes(self, since, wait=0):
+        """
+        Returns (version, entries) for the missions changed after version since, waiting up to
+        wait seconds for a change if there is none yet. Deleted missions have no first id.
+        """
+        deadline = time.monotonic() + min(wait, MAX_WAIT_SECONDS)
+        with self._changed:
+            while self._version <= since and (remaining := deadline - time.monotonic()) > 0:
+                self._changed.wait(remaining)
+            version = self._version
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT name, version, first_question_id, question_count FROM missions "
+                "WHERE version > ? AND version <= ? ORDER BY version", (since, version),
+            ).fetchall()
+        fields = ("name", "version", "first_question_id", "question_count")
+        return version, [dict(zip(fields, row)) for row in rows]
+
+    def mission(self, test_name):
+        """Returns (entry, CSV bytes) of a current mission, or None if it doesn't exist."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT version, first_question_id, question_count, data FROM missions WHERE name = ? AND data IS NOT NULL",
+                (test_name,),
+            ).fetchone()
+        if row is None:
+            return None
+        version, first_id, count, data = row
+        return {"name": test_name, "version": version, "first_question_id": first_id, "question_count": count}, data
+
+    def record(self, records):
+        """
+        Journals a batch of ("start", ...), ("answer", ...) and ("position", ...) records. Returns
+        True once all of them are committed, False if the journal couldn't commit them in time.
+        A malformed record raises ValueError (or KeyError, TypeError) before any is queued.
+        """
+        calls = [self._journal_call(record) for record in records]
+        for call, args in calls:
+            call(*args)
+        return self.journal.flush()
+
+    def _journal_call(self, record):
+        """Returns (journal method, checked arguments) for one record."""
+        op, *args = record
+        if op == "start":
+            attempt_id, test_name, question_ids, timer_minutes, started_at = args
+            return self.journal.start_attempt, (
+                _text(test_name), [int(i) for i in question_ids], int(timer_minutes), float(started_at), _text(attempt_id),
+            )
+        if op == "answer":
+            attempt_id, position, answer, answered_at = args
+            return self.journal.record_answer, (_text(attempt_id), int(position), int(answer), float(answered_at))
+        if op == "position":
+            attempt_id, position = args
+            return self.journal.record_position, (_text(attempt_id), int(position))
+        raise ValueError(f"unknown journal record {op!r}")
+
+    def record_results(self, question_ids, answers, correct, seen_at):
+        """Adds one graded exam to the per-question statistics (see QuestionStore.record_results)."""
+        question_ids = [int(i) for i in question_ids]
+        answers = [int(answer) for answer in answers]
+        correct = [bool(value) for value in correct]
+        if not len(question_ids) == len(answers) == len(correct):
+            raise ValueError("question_ids, answers and correct differ in length")
+        self._write(lambda conn: record_stats(conn, question_ids, answers, correct, float(seen_at)))
+
+    def stats(self, first_id, count):
+        """Returns (question id, attempts, correct, last_seen) of the answered questions in a block of ids."""
+        with closing(self._connect()) as conn:
+            return stats_rows(conn, first_id, count)
+
+    def hardest(self, first_id, count, limit, min_attempts):
+        """Returns (question id, attempts, correct, picks) of a block's hardest questions (see hardest_stats)."""
+        with closing(self._connect()) as conn:
+            return hardest_stats(conn, first_id, count, limit, min_attempts)
+
+    def load_attempt(self, attempt_id):
+        """Returns a journaled attempt as JSON-ready values, or None."""
+        attempt = self.journal.load_attempt(attempt_id)
+        if attempt is not None:
+            attempt["question_ids"] = attempt["question_ids"].tolist()
+            attempt["answers"] = attempt["answers"].tolist()
+        return attempt
+
+def _text(value):
+    """Returns value if it is a string; raises TypeError otherwise."""
+    if not isinstance(value, str):
+        raise TypeError(f"expected a string, got {value!r}")
+    return value
+
+def _count(value):
+    """Returns value as an int, keeping None; raises ValueError or TypeError otherwise."""
+    return None if value is None else int(value)
+
+class StateRequestHandler(BaseHTTPRequestHandler):
+    """Routes the JSON protocol to the StateServer in self.server.state."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # one line per answer click would drown the server's output
+
+    def _reply(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        # The body is read first, so the connection stays usable whatever the reply.
+        body = self._body()
+        self._handle(lambda path, query, state: self._post(path, query, state, body))
+
+    def _handle(self, route):
+        """
+        Answers a request with route(path, query, state) -> (status, JSON value or CSV bytes[, headers]).
+        Malformed requests get 400 and failed commits 500, so workers know whether to resend.
+        """
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            status, value, *headers = route(url.path, query, self.server.state)
+        except (KeyError, ValueError, TypeError) as e:
+            status, value, headers = 400, {"error": f"Bad request: {type(e).__name__}: {e}"}, []
+        except (sqlite3.Error, OSError) as e:
+            logger.exception("Could not serve %s %s", self.command, url.path)
+            status, value, headers = 500, {"error": f"Could not commit: {e}"}, []
+        if isinstance(value, bytes):
+            self._reply(status, value, "text/csv", *headers)
+        else:
+            self._reply(status, json.dumps(value).encode("utf-8"))
+
+    def _get(self, path, query, state):
+        if path == "/missions":
+            version, entries = state.changes(int(query.get("since", 0)), float(query.get("wait", 0)))
+            return 200, {"version": version, "missions": entries}
+        if path == "/missions/data":
+            found = state.mission(query["name"])
+            if found is None:
+                return 404, {"error": "mission not found"}
+            entry, data = found
+            return 200, data, {"X-Mission": json.dumps(entry)}
+        if path == "/attempts":
+            attempt = state.load_attempt(query["id"])
+            if attempt is None:
+                return 404, {"error": "attempt not found"}
+            return 200, attempt
+        if path == "/attempts/pending":
+            return 200, {"deadlines": state.journal.pending_deadlines()}
+        if path == "/scores":
+            return 200, {"scores": state.journal.scores()}
+        if path == "/stats":
+            return 200, {"stats": state.stats(int(query["first"]), int(query["count"]))}
+        if path == "/stats/hardest":
+            hardest = state.hardest(
+                int(query["first"]), int(query["count"]), int(query["limit"]), int(query.get("min_attempts", 1)),
+            )
+            return 200, {"hardest": hardest}
+        return 404, {"error": "not found"}
+
+    def _post(self, path, query, state, body):
+        if path == "/missions/reserve":
+            request = json.loads(body)
+            return 200, {"first_ids": state.reserve(request["counts"], request.get("above", 0))}
+        if path == "/missions":
+            return 200, {"version": state.publish(json.loads(body)["missions"])}
+        if path == "/missions/delete":
+            deleted, version = state.delete(query["name"])
+            return 200, {"deleted": deleted, "version": version}
+        if path == "/journal":
+            if not state.record(json.loads(body)["records"]):
+                return 500, {"error": "Could not commit the journal records"}
+            return 200, {}
+        if path == "/attempts/finish":
+            request = json.loads(body)
+            # Scores are null for an attempt closed without grading (see expire_attempt).
+            correct, total = (_count(request[key]) for key in ("correct", "total"))
+            submitted = state.journal.finish_attempt(_text(request["attempt_id"]), correct, total)
+            return 200, {"submitted": submitted}
+        if path == "/stats":
+            request = json.loads(body)
+            state.record_results(request["question_ids"], request["answers"], request["correct"], request["seen_at"])
+            return 200, {}
+        return 404, {"error": "not found"}
+
+def make_server(directory, host="127.0.0.1", port=0):
+    """Returns an HTTP server for a StateServer over directory; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), StateRequestHandler)
+    server.daemon_threads = True
+    server.state = StateServer(directory)
+    return server
+
+def start_server(directory, host="127.0.0.1", port=0):
+    """
+    Serves a StateServer from a background thread and returns the HTTP server, e.g. as a local
+    stand-in for tests and load tests. Its URL is f"http://{host}:{server.server_port}".
+    """
+    server = make_server(directory, host, port)
+    threading.Thread(target=server.serve_forever, name="state-server", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for every interface)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--data", default="state", help="directory for the state databases")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.data, args.host, args.port)
+    print(f"Serving quiz state from {args.data} on http://{args.host}:{server.server_port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
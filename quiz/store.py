@@ -0,0 +1,745 @@
+"""SQLite-backed question store holding every mission and its questions."""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from quiz import DATA_DIR
+from quiz.answers import NO_ANSWER, OPTION_LETTERS
+from quiz.dedup import DEDUP_COLUMNS, DUPLICATE_SIMILARITY, lsh_buckets, minhash_signatures, similarity
+from quiz.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+# Every mission lives in one SQLite database; CSV is only an import/export format.
+STORE_PATH = os.path.join(DATA_DIR, "missions.db")
+# The built-in mission: listed first and never deleted.
+DEFAULT_TEST = "Mission Alpha (Default)"
+BANK_COLUMNS = [
+    'Question (English)', 'Question (Hindi)',
+    'Option A (English)', 'Option A (Hindi)',
+    'Option B (English)', 'Option B (Hindi)',
+    'Option C (English)', 'Option C (Hindi)',
+    'Option D (English)', 'Option D (Hindi)',
+    'Correct Answer (English)',
+]
+REQUIRED_COLUMNS = [col for col in BANK_COLUMNS if col.endswith('(English)')]
+ANSWER_KEY_COLUMN = 'Answer Key'
+
+# SQL column backing each CSV column.
+QUESTION_FIELDS = {'Question (English)': 'question_en', 'Question (Hindi)': 'question_hi'}
+for _letter in OPTION_LETTERS:
+    QUESTION_FIELDS[f'Option {_letter} (English)'] = f'option_{_letter.lower()}_en'
+    QUESTION_FIELDS[f'Option {_letter} (Hindi)'] = f'option_{_letter.lower()}_hi'
+QUESTION_FIELDS['Correct Answer (English)'] = 'correct_answer'
+
+# Text columns covered by full-text search, and their bm25 weights: a match in the question
+# ranks above a match in an option.
+SEARCH_FIELDS = [field_name for field_name in QUESTION_FIELDS.values() if field_name != 'correct_answer']
+SEARCH_WEIGHTS = [3.0 if field_name.startswith('question') else 1.0 for field_name in SEARCH_FIELDS]
+# Words kept from a search query; longer queries are cut off.
+MAX_SEARCH_TERMS = 16
+# The last word of a query also matches longer words once it has this many characters;
+# shorter prefixes expand to too many words to merge quickly.
+MIN_PREFIX_CHARS = 3
+# Ranking scores every match, so broader queries are listed newest first instead and their
+# count stops at SEARCH_RANK_LIMIT + 1. This keeps even one-letter prefixes at a few ms.
+SEARCH_RANK_LIMIT = 5000
+
+# Missions are removed this many questions per transaction, so other writers never wait for a whole mission.
+PURGE_CHUNK_ROWS = 5000
+# Pause between the transactions of a long write. Writers waiting on SQLite's busy handler poll
+# about every 100 ms, so without it the import would take the lock again before they get it.
+WRITE_PAUSE_SECONDS = 0.1
+# Staged banks left behind this long, by a process that died mid-import, are removed at startup.
+STAGED_BANK_TIMEOUT_SECONDS = 3600
+
+# Question ids are allocated as one contiguous block per bank, so a question's position in
+# its bank is simply id - first_question_id and sampling never has to scan the bank.
+# Banks with staged_at set are hidden: missions still being written, or replaced and being removed.
+STORE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS banks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    first_question_id INTEGER NOT NULL,
+    question_count INTEGER NOT NULL,
+    modified_at REAL NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    staged_at REAL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bank_id INTEGER NOT NULL REFERENCES banks(id) ON DELETE CASCADE,
+    {", ".join(f"{field_name} TEXT" for field_name in QUESTION_FIELDS.values())},
+    answer_key INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_by_bank ON questions(bank_id);
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_id INTEGER PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_choices (
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    choice INTEGER NOT NULL,
+    picks INTEGER NOT NULL,
+    PRIMARY KEY (question_id, choice)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS question_signatures (
+    question_id INTEGER PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    signature BLOB NOT NULL,
+    duplicate_group INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS question_buckets_by_question ON question_buckets(question_id);
+-- Search index over the question text, maintained by _write_chunk and _purge_bank.
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    {", ".join(SEARCH_FIELDS)},
+    content='questions', content_rowid='id',
+    tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+);
+"""
+# Stored size of a mission: the UTF-8 bytes of all its question text.
+BANK_SIZE_SQL = "SELECT COALESCE(SUM({}), 0) FROM questions WHERE id BETWEEN ? AND ?".format(
+    " + ".join(f"COALESCE(length(CAST({field_name} AS BLOB)), 0)" for field_name in QUESTION_FIELDS.values())
+)
+# Page cache (KB) used while a mission is written or deleted. The near-duplicate bucket index takes
+# 16 random inserts per question, which thrash SQLite's 2 MB default on large imports.
+WRITE_CACHE_KB = 64 * 1024
+# One page of search matches, ordered by SEARCH_RANKING or newest first (see search_questions).
+SEARCH_SQL = """
+SELECT q.id, b.name AS mission, q.id - b.first_question_id AS position, q.question_en, q.question_hi,
+       q.answer_key, snippet(questions_fts, -1, '**', '**', '…', 16) AS snippet
+FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid JOIN banks b ON b.id = q.bank_id
+WHERE questions_fts MATCH ? AND b.staged_at IS NULL
+ORDER BY {order}
+LIMIT ? OFFSET ?
+"""
+SEARCH_RANKING = f"bm25(questions_fts, {', '.join(map(str, SEARCH_WEIGHTS))})"
+QUESTION_SELECT = "SELECT id, " + ", ".join(
+    f'{field_name} AS "{col}"' for col, field_name in QUESTION_FIELDS.items()
+) + f', answer_key AS "{ANSWER_KEY_COLUMN}" FROM questions'
+
+def search_expression(query):
+    """
+    Turns free text into an FTS5 query matching questions that contain every word, the last
+    one as a prefix so results appear while typing. Returns None if the query has no words.
+    """
+    terms = [term for term in re.split(r'[\s"]+', query) if term][:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    expression = " ".join(f'"{term}"' for term in terms)
+    return expression + "*" if len(terms[-1]) >= MIN_PREFIX_CHARS else expression
+
+def validate_columns(columns):
+    """Raises ValueError if any of the required English columns is missing."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+class QuestionStore:
+    """
+    SQLite-backed store for missions and their questions.
+    Connections are pooled so concurrent sessions each read on their own connection;
+    the database runs in WAL mode so readers never wait for an import.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._idle = []
+        self._lock = threading.Lock()
+        self._listeners = []
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(STORE_SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        """Adds columns introduced after a database was created, backfilling their values."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(banks)")}
+        if "size_bytes" not in columns:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ALTER TABLE banks ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0")
+            for bank in conn.execute("SELECT id, first_question_id, question_count FROM banks").fetchall():
+                self._update_size(conn, bank["id"], bank["first_question_id"], bank["question_count"])
+            conn.execute("COMMIT")
+        if "staged_at" not in columns:
+            conn.execute("ALTER TABLE banks ADD COLUMN staged_at REAL")
+        for bank in conn.execute(
+            "SELECT id FROM banks WHERE staged_at < ?", (time.time() - STAGED_BANK_TIMEOUT_SECONDS,)
+        ).fetchall():
+            self._purge_bank(conn, bank["id"])
+        # The search index is rebuilt from the questions if it was created after them (or is out of step).
+        indexed, stored = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM questions_fts_docsize), (SELECT COUNT(*) FROM questions)"
+        ).fetchone()
+        if indexed != stored:
+            conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+        # Missions imported before near-duplicate detection have no signatures yet.
+        for bank in conn.execute(
+            "SELECT first_question_id, question_count FROM banks b WHERE staged_at IS NULL AND NOT EXISTS "
+            "(SELECT 1 FROM question_signatures WHERE question_id = b.first_question_id)"
+        ).fetchall():
+            first_id, count = bank
+            fields = [QUESTION_FIELDS[col] for col in DEDUP_COLUMNS]
+            rows = conn.execute(
+                f"SELECT {', '.join(fields)} FROM questions WHERE id BETWEEN ? AND ? ORDER BY id",
+                (first_id, first_id + count - 1),
+            ).fetchall()
+            conn.execute("BEGIN IMMEDIATE")
+            self._index_duplicates(conn, first_id, minhash_signatures(pd.DataFrame(rows, columns=DEDUP_COLUMNS)))
+            conn.execute("COMMIT")
+
+    def _update_size(self, conn, bank_id, first_id, count):
+        conn.execute(
+            f"UPDATE banks SET size_bytes = ({BANK_SIZE_SQL}) WHERE id = ?", (first_id, first_id + count - 1, bank_id)
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _write_cache(self, conn):
+        """Raises a connection's page cache to WRITE_CACHE_KB for the duration of the block."""
+        previous = conn.execute("PRAGMA cache_size").fetchone()[0]
+        conn.execute(f"PRAGMA cache_size = -{WRITE_CACHE_KB}")
+        try:
+            yield
+        finally:
+            conn.execute(f"PRAGMA cache_size = {previous}")
+
+    @contextmanager
+    def _transaction(self, conn):
+        """Runs the block in one write transaction, rolled back if it raises."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection from the pool for the duration of the block."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._idle.append(conn)
+
+    @instrument("store.list_banks")
+    def list_banks(self):
+        """Returns name, question count, size and modification time of every mission, sorted by name."""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT name, question_count, size_bytes, modified_at FROM banks WHERE staged_at IS NULL ORDER BY name"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def banks_signature(self):
+        """Returns a value that changes whenever a mission is added, replaced or deleted."""
+        with self.connection() as conn:
+            return self._signature(conn)
+
+    def banks_snapshot(self):
+        """Returns (signature, list_banks()) read from one consistent snapshot."""
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                signature = self._signature(conn)
+                rows = conn.execute(
+                    "SELECT name, question_count, size_bytes, modified_at FROM banks WHERE staged_at IS NULL ORDER BY name"
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        return signature, [dict(row) for row in rows]
+
+    def _signature(self, conn):
+        # Bank ids are never reused, so the count, highest and summed ids identify the set of missions.
+        return tuple(conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(id), 0) FROM banks WHERE staged_at IS NULL"
+        ).fetchone())
+
+    def add_listener(self, listener):
+        """
+        Registers listener(test_names, signature_before, signature_after), called after every
+        committed change to missions made through this store.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, test_names, before, after):
+        for listener in self._listeners:
+            listener(test_names, before, after)
+
+    def get_bank(self, test_name):
+        """Returns the banks row for a mission, or None if it doesn't exist."""
+        with self.connection() as conn:
+            row = conn.execute("SELECT * FROM banks WHERE name = ? AND staged_at IS NULL", (test_name,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def bank_blocks(self):
+        """Returns (name, first question id, question count) of every mission, by first question id."""
+        with self.connection() as conn:
+            return [tuple(row) for row in conn.execute(
+                "SELECT name, first_question_id, question_count FROM banks WHERE staged_at IS NULL ORDER BY first_question_id"
+            )]
+
+    def last_question_id(self):
+        """Returns the highest question id used or reserved so far, or 0."""
+        with self.connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'questions'").fetchone()[0]
+
+    def bank_names_for(self, question_ids):
+        """
+        Returns the sorted names of the missions holding the given question ids,
+        or None if any id belongs to no current mission.
+        """
+        rows = self.bank_blocks()
+        if not rows:
+            return None
+        names = np.array([row[0] for row in rows], dtype=object)
+        firsts = np.array([row[1] for row in rows], dtype=np.int64)
+        counts = np.array([row[2] for row in rows], dtype=np.int64)
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        owners = np.searchsorted(firsts, question_ids, side="right") - 1
+        if (owners < 0).any() or (question_ids - firsts[owners] >= counts[owners]).any():
+            return None
+        return sorted(set(names[owners].tolist()))
+
+    def replace_bank(self, test_name, chunks, first_question_id=None):
+        """
+        Stores a mission from a list of (DataFrame, answer key, MinHash signatures) chunks,
+        replacing any mission with the same name. Returns the number of questions written;
+        nothing is changed if the chunks are empty or writing them fails. Questions are numbered
+        from first_question_id when given (a block reserved by a shared backend), else after the last id used.
+        """
+        if not any(len(df) for df, _, _ in chunks):
+            return 0
+        first_ids = {test_name: first_question_id} if first_question_id is not None else None
+        return self.replace_banks([(test_name, chunks)], first_ids)[test_name]
+
+    def replace_banks(self, missions, first_ids=None, before_swap=None):
+        """
+        Stores several missions, given as (name, chunks) pairs: either all of them are replaced
+        or none is. first_ids optionally maps names to the first question id to number them from,
+        as in replace_bank. before_swap(), when given, is called once every mission is staged;
+        if it raises, nothing is changed. Returns {name: questions written}.
+        Each mission is first written as a hidden staged bank, one transaction per chunk, then all
+        are swapped in by one short transaction. Other writers, such as grading or another import,
+        wait for a chunk at most, never for a whole import.
+        """
+        first_ids = first_ids or {}
+        staged, retired = {}, []
+        with self.connection() as conn, self._write_cache(conn):
+            try:
+                for test_name, chunks in missions:
+                    if not any(len(df) for df, _, _ in chunks):
+                        raise ValueError(f"Mission '{test_name}' has no questions")
+                    staged[test_name] = self._stage_bank(conn, test_name, chunks, first_ids.get(test_name))
+                if before_swap is not None:
+                    before_swap()
+                before, after, retired = self._swap_in(conn, staged)
+            except BaseException:
+                self._discard_banks(conn, staged.values())
+                raise
+        if staged:
+            self._notify(list(staged), before, after)
+        with self.connection() as conn, self._write_cache(conn):
+            self._discard_banks(conn, retired)
+        return {test_name: sum(len(df) for df, _, _ in chunks) for test_name, chunks in missions}
+
+    def _stage_bank(self, conn, test_name, chunks, first_id=None):
+        """
+        Writes a mission as a hidden staged bank, one transaction per chunk, under a block of
+        question ids reserved up front. Returns the staged bank's id.
+        """
+        count = sum(len(df) for df, _, _ in chunks)
+        now = time.time()
+        with self._transaction(conn):
+            if first_id is None:
+                first_id = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'questions'"
+                ).fetchone()[0]
+            # Imports staged at the same time number their questions after this block.
+            if conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'questions'", (first_id + count - 1,)
+            ).rowcount == 0:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('questions', ?)", (first_id + count - 1,))
+            current = conn.execute(
+                "SELECT first_question_id, question_count FROM banks WHERE name = ? AND staged_at IS NULL", (test_name,)
+            ).fetchone()
+            replaced = (current[0], current[0] + current[1] - 1) if current is not None else (0, -1)
+            bank_id = conn.execute(
+                "INSERT INTO banks (name, first_question_id, question_count, modified_at, staged_at) VALUES (?, ?, ?, ?, ?)",
+                (f"{test_name} (staged {uuid.uuid4().hex})", first_id, count, now, now),
+            ).lastrowid
+        try:
+            written = 0
+            for df, answer_key, signatures in chunks:
+                if written:
+                    time.sleep(WRITE_PAUSE_SECONDS)
+                with self._transaction(conn):
+                    self._write_chunk(conn, bank_id, first_id + written, df, answer_key, signatures, replaced)
+                written += len(df)
+            with self._transaction(conn):
+                self._update_size(conn, bank_id, first_id, count)
+        except BaseException:
+            self._discard_banks(conn, [bank_id])
+            raise
+        return bank_id
+
+    def _swap_in(self, conn, staged):
+        """
+        Makes staged banks, given as {name: bank id}, the current missions in one transaction,
+        hiding the missions they replace. Returns (signature before, signature after, ids of the
+        replaced banks, which are left to be removed).
+        """
+        now = time.time()
+        retired = []
+        with self._transaction(conn):
+            before = self._signature(conn)
+            for test_name, bank_id in staged.items():
+                retired += self._hide_bank(conn, test_name, now)
+                conn.execute(
+                    "UPDATE banks SET name = ?, staged_at = NULL, modified_at = ? WHERE id = ?", (test_name, now, bank_id)
+                )
+            after = self._signature(conn)
+        return before, after, retired
+
+    def _hide_bank(self, conn, test_name, now):
+        """Hides a current mission inside the caller's transaction. Returns [its bank id], or [] if it didn't exist."""
+        row = conn.execute("SELECT id FROM banks WHERE name = ? AND staged_at IS NULL", (test_name,)).fetchone()
+        if row is None:
+            return []
+        conn.execute(
+            "UPDATE banks SET name = ?, staged_at = ? WHERE id = ?", (f"{test_name} (removed {uuid.uuid4().hex})", now, row["id"])
+        )
+        return [row["id"]]
+
+    def _write_chunk(self, conn, bank_id, first_id, df, answer_key, signatures, replaced):
+        """
+        Writes consecutive questions of a bank from first_id on, inside the caller's transaction.
+        replaced is the id range of the mission they replace, as in _index_duplicates.
+        """
+        columns = list(QUESTION_FIELDS)
+        insert_sql = (
+            f"INSERT INTO questions (id, bank_id, {', '.join(QUESTION_FIELDS.values())}, answer_key) "
+            f"VALUES ({', '.join('?' * (len(columns) + 3))})"
+        )
+        ids = range(first_id, first_id + len(df))
+        values = [
+            df[col].astype(object).where(df[col].notna(), None).tolist()
+            if col in df.columns else [None] * len(df)
+            for col in columns
+        ]
+        conn.executemany(insert_sql, zip(ids, repeat(bank_id), *values, answer_key.tolist()))
+        conn.execute(
+            f"INSERT INTO questions_fts (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM questions WHERE id BETWEEN ? AND ?", (ids[0], ids[-1])
+        )
+        self._index_duplicates(conn, first_id, signatures, replaced)
+
+    def _purge_bank(self, conn, bank_id):
+        """Removes a hidden bank, its questions and their search entries, PURGE_CHUNK_ROWS questions per transaction."""
+        row = conn.execute("SELECT first_question_id, question_count FROM banks WHERE id = ?", (bank_id,)).fetchone()
+        if row is None:
+            return
+        first_id, count = row
+        for start in range(first_id, first_id + count, PURGE_CHUNK_ROWS):
+            end = min(start + PURGE_CHUNK_ROWS, first_id + count) - 1
+            if start != first_id:
+                time.sleep(WRITE_PAUSE_SECONDS)
+            with self._transaction(conn):
+                conn.execute(
+                    f"INSERT INTO questions_fts (questions_fts, rowid, {', '.join(SEARCH_FIELDS)}) "
+                    f"SELECT 'delete', id, {', '.join(SEARCH_FIELDS)} FROM questions "
+                    "WHERE id BETWEEN ? AND ? AND bank_id = ?", (start, end, bank_id),
+                )
+                conn.execute("DELETE FROM questions WHERE id BETWEEN ? AND ? AND bank_id = ?", (start, end, bank_id))
+        with self._transaction(conn):
+            conn.execute("DELETE FROM banks WHERE id = ?", (bank_id,))
+
+    def _discard_banks(self, conn, bank_ids):
+        """Purges hidden banks. Failures are logged; such banks stay hidden and are removed at a later startup."""
+        for bank_id in bank_ids:
+            try:
+                self._purge_bank(conn, bank_id)
+            except sqlite3.Error:
+                logger.exception("Could not remove hidden bank %s; it is removed at a later startup", bank_id)
+
+    def _index_duplicates(self, conn, first_id, signatures, replaced=(0, -1)):
+        """
+        Adds consecutive questions starting at first_id to the near-duplicate index, inside the
+        caller's transaction. Candidates are the questions sharing an LSH bucket, looked up by
+        index; each new question joins the group of its closest-numbered verified duplicate,
+        or starts a group of its own. Questions with ids in the range replaced (those of the
+        mission being replaced) are never candidates.
+        """
+        ids = np.arange(first_id, first_id + len(signatures))
+        last_id = first_id + len(signatures) - 1
+        buckets = lsh_buckets(signatures)
+        conn.executemany(
+            "INSERT INTO question_buckets (band, bucket, question_id) VALUES (?, ?, ?)",
+            ((band, bucket, question_id) for question_id, row in zip(ids.tolist(), buckets.tolist())
+             for band, bucket in enumerate(row)),
+        )
+        pairs = conn.execute(
+            "SELECT DISTINCT b.question_id, c.question_id FROM question_buckets b JOIN question_buckets c "
+            "ON c.band = b.band AND c.bucket = b.bucket AND c.question_id < b.question_id "
+            "AND c.question_id NOT BETWEEN ? AND ? "
+            "WHERE b.question_id BETWEEN ? AND ? ORDER BY b.question_id, c.question_id DESC", (*replaced, first_id, last_id)
+        ).fetchall()
+        earlier = {candidate for _, candidate in pairs if candidate < first_id}
+        known = {
+            row[0]: (np.frombuffer(row[1], dtype=np.uint32), row[2])
+            for row in conn.execute(
+                "SELECT question_id, signature, duplicate_group FROM question_signatures "
+                "WHERE question_id IN (SELECT value FROM json_each(?))", (json.dumps(sorted(earlier)),)
+            )
+        }
+        groups = ids.copy()
+        for question_id, candidate in pairs:
+            position = question_id - first_id
+            if groups[position] != question_id:
+                continue  # already matched a closer candidate
+            if candidate >= first_id:
+                known_signature, group = signatures[candidate - first_id], groups[candidate - first_id]
+            elif candidate in known:
+                known_signature, group = known[candidate]
+            else:
+                continue
+            if similarity(signatures[position], known_signature) >= DUPLICATE_SIMILARITY:
+                groups[position] = group
+        conn.executemany(
+            "INSERT INTO question_signatures (question_id, signature, duplicate_group) VALUES (?, ?, ?)",
+            zip(ids.tolist(), (signature.tobytes() for signature in signatures), groups.tolist()),
+        )
+
+    def delete_bank(self, test_name):
+        """
+        Deletes a mission and its questions. Returns False if it didn't exist. The mission is
+        hidden by one short transaction, then its questions are removed chunk by chunk.
+        """
+        with self.connection() as conn, self._write_cache(conn):
+            with self._transaction(conn):
+                before = self._signature(conn)
+                hidden = self._hide_bank(conn, test_name, time.time())
+                after = self._signature(conn)
+        if hidden:
+            self._notify([test_name], before, after)
+            with self.connection() as conn, self._write_cache(conn):
+                self._discard_banks(conn, hidden)
+        return bool(hidden)
+
+    def bank_answer_key(self, bank):
+        """Returns the int8 answer key of a mission, ordered by position."""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT answer_key FROM questions WHERE bank_id = ? ORDER BY id", (bank["id"],)
+            ).fetchall()
+        return np.fromiter((row[0] for row in rows), dtype=np.int8, count=len(rows))
+
+    def bank_duplicate_groups(self, bank):
+        """Returns the near-duplicate group label of each question of a mission, ordered by position."""
+        first_id = bank["first_question_id"]
+        labels = np.arange(first_id, first_id + bank["question_count"], dtype=np.int64)
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT question_id, duplicate_group FROM question_signatures WHERE question_id BETWEEN ? AND ?",
+                (first_id, first_id + bank["question_count"] - 1),
+            ).fetchall()
+        if rows:
+            groups = np.array([tuple(row) for row in rows], dtype=np.int64)
+            labels[groups[:, 0] - first_id] = groups[:, 1]
+        return labels
+
+    def record_results(self, question_ids, answers, correct_mask, seen_at):
+        """
+        Adds one graded exam to the per-question statistics and option pick counts,
+        in one transaction. Unanswered questions count as attempts but pick nothing.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                record_stats(conn, question_ids, answers, correct_mask, seen_at)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def bank_stats(self, bank):
+        """
+        Returns (attempts, correct, last_seen) arrays for a mission, ordered by position.
+        Questions that were never answered have zero attempts and last_seen 0.
+        """
+        with self.connection() as conn:
+            return stats_arrays(conn, bank["first_question_id"], bank["question_count"])
+
+    def hardest_questions(self, bank, limit, min_attempts=1):
+        """
+        Returns up to limit questions of a mission with the lowest correct rate, as dicts with the
+        English question, answer key, attempts, correct count and picks per option (a list of 4).
+        Only the mission's answered questions are scanned; their text is fetched for the result rows only.
+        """
+        with self.connection() as conn:
+            hardest = hardest_stats(conn, bank["first_question_id"], bank["question_count"], limit, min_attempts)
+        return hardest_rows(self, bank, hardest)
+
+    @instrument("store.search_questions")
+    def search_questions(self, query, limit, offset=0):
+        """
+        Full-text search over the English and Hindi question and option text of every mission.
+        Returns (total matches, rows) where rows are the limit best matches from offset on, ranked
+        by bm25, as dicts with the question id, mission, position, question text, answer key and
+        a snippet with the matched words in bold. A total above SEARCH_RANK_LIMIT means the query
+        matched more questions than that; those are listed newest first rather than ranked.
+        """
+        expression = search_expression(query)
+        if expression is None:
+            return 0, []
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid "
+                    "JOIN banks b ON b.id = q.bank_id WHERE questions_fts MATCH ? AND b.staged_at IS NULL LIMIT ?)",
+                    (expression, SEARCH_RANK_LIMIT + 1),
+                ).fetchone()[0]
+                order = SEARCH_RANKING if total <= SEARCH_RANK_LIMIT else "questions_fts.rowid DESC"
+                rows = conn.execute(SEARCH_SQL.format(order=order), (expression, limit, offset)).fetchall() if total else []
+            finally:
+                conn.execute("COMMIT")
+        return total, [dict(row) for row in rows]
+
+    @instrument("store.fetch_questions")
+    def fetch_questions(self, question_ids):
+        """Returns the questions with the given ids as dicts, in the same order (None if missing)."""
+        question_ids = [int(question_id) for question_id in question_ids]
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"{QUESTION_SELECT} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(question_ids),)
+            ).fetchall()
+        by_id = {row["id"]: dict(row) for row in rows}
+        return [by_id.get(question_id) for question_id in question_ids]
+
+    @instrument("store.fetch_range")
+    def fetch_range(self, first_id, last_id):
+        """Returns the questions with ids in [first_id, last_id], in id order."""
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"{QUESTION_SELECT} WHERE id BETWEEN ? AND ? ORDER BY id", (int(first_id), int(last_id))
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def export_frame(self, bank):
+        """Returns a mission as a DataFrame in the upload CSV layout."""
+        first_id = bank["first_question_id"]
+        rows = self.fetch_range(first_id, first_id + bank["question_count"] - 1)
+        return pd.DataFrame(rows, columns=BANK_COLUMNS)
+
+# --- Per-question statistics, shared with the state server (quiz/stateserver.py) ---
+
+def record_stats(conn, question_ids, answers, correct_mask, seen_at):
+    """
+    Adds one graded exam to the question_stats and question_choices tables, inside the caller's
+    transaction. Unanswered questions count as attempts but pick nothing.
+    """
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    answers = np.asarray(answers, dtype=np.int8)
+    answered = answers != NO_ANSWER
+    conn.executemany(
+        "INSERT INTO question_stats (question_id, attempts, correct, last_seen) VALUES (?, 1, ?, ?) "
+        "ON CONFLICT(question_id) DO UPDATE SET attempts = attempts + 1, "
+        "correct = correct + excluded.correct, last_seen = excluded.last_seen",
+        zip(question_ids.tolist(), np.asarray(correct_mask, dtype=int).tolist(), repeat(seen_at)),
+    )
+    conn.executemany(
+        "INSERT INTO question_choices (question_id, choice, picks) VALUES (?, ?, 1) "
+        "ON CONFLICT(question_id, choice) DO UPDATE SET picks = picks + 1",
+        zip(question_ids[answered].tolist(), answers[answered].tolist()),
+    )
+
+def stats_rows(conn, first_id, count):
+    """Returns (question id, attempts, correct, last_seen) of the answered questions in a block of ids."""
+    return [tuple(row) for row in conn.execute(
+        "SELECT question_id, attempts, correct, last_seen FROM question_stats "
+        "WHERE question_id BETWEEN ? AND ?", (first_id, first_id + count - 1)
+    )]
+
+def stats_arrays(conn, first_id, count):
+    """Returns the (attempts, correct, last_seen) arrays of a block of ids, by position (see QuestionStore.bank_stats)."""
+    return stats_from_rows(stats_rows(conn, first_id, count), first_id, count)
+
+def stats_from_rows(rows, first_id, count):
+    """Expands stats_rows() into (attempts, correct, last_seen) arrays by position."""
+    attempts = np.zeros(count, dtype=np.int64)
+    correct = np.zeros(count, dtype=np.int64)
+    last_seen = np.zeros(count, dtype=np.float64)
+    if rows:
+        stats = np.array(rows, dtype=np.float64)
+        positions = stats[:, 0].astype(np.int64) - first_id
+        attempts[positions] = stats[:, 1]
+        correct[positions] = stats[:, 2]
+        last_seen[positions] = stats[:, 3]
+    return attempts, correct, last_seen
+
+def hardest_stats(conn, first_id, count, limit, min_attempts=1):
+    """
+    Returns up to limit (question id, attempts, correct, picks per option) of a block of ids,
+    lowest correct rate first, scanning only the answered questions.
+    """
+    rows = conn.execute(
+        "SELECT question_id, attempts, correct FROM question_stats WHERE question_id BETWEEN ? AND ? AND attempts >= ? "
+        "ORDER BY CAST(correct AS REAL) / attempts, attempts DESC LIMIT ?",
+        (first_id, first_id + count - 1, min_attempts, limit),
+    ).fetchall()
+    question_ids = [row[0] for row in rows]
+    choices = {question_id: [0] * len(OPTION_LETTERS) for question_id in question_ids}
+    for question_id, choice, picks in conn.execute(
+        "SELECT question_id, choice, picks FROM question_choices "
+        "WHERE question_id IN (SELECT value FROM json_each(?))", (json.dumps(question_ids),)
+    ):
+        choices[question_id][choice] = picks
+    return [(question_id, attempts, correct, choices[question_id]) for question_id, attempts, correct in rows]
+
+def hardest_rows(store, bank, hardest):
+    """Joins hardest_stats() results with their question text from store, as QuestionStore.hardest_questions returns them."""
+    first_id = bank["first_question_id"]
+    questions = store.fetch_questions([question_id for question_id, _, _, _ in hardest])
+    return [
+        {
+            "position": question_id - first_id,
+            "question": question["Question (English)"],
+            "answer_key": question[ANSWER_KEY_COLUMN],
+            "attempts": attempts,
+            "correct": correct,
+            "picks": picks,
+        }
+        for (question_id, attempts, correct, picks), question in zip(hardest, questions)
+        if question is not None
+    ]
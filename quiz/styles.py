@@ -0,0 +1,187 @@
+"""The 'AirPort Quest' stylesheet and HTML snippets, built once per process."""
+
+from string import Template
+
+APP_CSS = """
+    <style>
+        @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700&family=Exo+2:wght@400;600&display=swap');
+
+        :root {
+            --font-main: 'Exo 2', sans-serif;
+            --font-title: 'Orbitron', sans-serif;
+            --glow-primary: #00BFFF; /* DeepSkyBlue */
+            --glow-secondary: #FF1493; /* DeepPink */
+            --glow-success: #39FF14; /* Neon Green */
+            --glow-error: #FF4500; /* OrangeRed */
+            --bg-color: #000015;
+            --text-color: #E0E0E0;
+            --border-radius: 15px;
+            --transition-speed: 0.4s;
+        }
+
+        @keyframes cosmic-background {
+            0% { background-position: 0% 50%; }
+            25% { background-position: 50% 100%; }
+            50% { background-position: 100% 50%; }
+            75% { background-position: 50% 0%; }
+            100% { background-position: 0% 50%; }
+        }
+
+        .stApp {
+            background: var(--bg-color);
+            background-image: linear-gradient(135deg, #000015 0%, #020024 25%, #0b094e 50%, #FF1493 75%, #00BFFF 100%);
+            background-size: 400% 400%;
+            animation: cosmic-background 20s ease infinite;
+            color: var(--text-color);
+            font-family: var(--font-main);
+        }
+
+        h1, h2, h3, h4, h5, h6 {
+            font-family: var(--font-title) !important;
+            color: #FFFFFF !important;
+            text-shadow: 0 0 5px var(--glow-primary);
+        }
+
+        /* Increase base font size for better readability */
+        .stMarkdown, .stRadio > label, p, div, span {
+            font-size: 1.1rem !important;
+            /* Add text shadow for readability against bright backgrounds */
+            text-shadow: 0 0 5px rgba(0,0,0,0.7);
+        }
+        
+        .st-emotion-cache-1g6gooi { /* Metric value */
+             font-size: 2rem !important;
+        }
+        
+        #MainMenu, footer, .stDeployButton { visibility: hidden; }
+
+        /* Glassmorphism Card Style */
+        .glass-card {
+            background: rgba(22, 27, 34, 0.6);
+            backdrop-filter: blur(10px);
+            -webkit-backdrop-filter: blur(10px);
+            border: 1px solid rgba(255, 255, 255, 0.1);
+            border-radius: var(--border-radius);
+            padding: 25px;
+            margin-bottom: 20px;
+            transition: all var(--transition-speed);
+        }
+        .glass-card:hover {
+            border: 1px solid rgba(0, 191, 255, 0.5);
+            transform: scale(1.02);
+        }
+        .glass-card h3 {
+            color: var(--glow-primary) !important;
+            text-shadow: 0 0 8px var(--glow-primary);
+        }
+
+        /* Custom Button Styles with Glow */
+        .stButton > button {
+            width: 100%;
+            border-radius: 10px !important;
+            font-weight: 600 !important;
+            font-family: var(--font-title);
+            border: 1px solid var(--glow-primary) !important;
+            background-color: rgba(0, 191, 255, 0.1) !important;
+            color: var(--glow-primary) !important;
+            transition: all var(--transition-speed) ease !important;
+            box-shadow: 0 0 5px var(--glow-primary), inset 0 0 5px rgba(0, 191, 255, 0.5);
+        }
+        .stButton > button:hover {
+            color: #FFFFFF !important;
+            background-color: rgba(0, 191, 255, 0.3) !important;
+            box-shadow: 0 0 15px var(--glow-primary), inset 0 0 10px rgba(0, 191, 255, 0.5);
+            transform: scale(1.05);
+        }
+        
+        /* Study Notes Button Style */
+        .stButton > button.study-btn {
+            border-color: var(--glow-success) !important;
+            color: var(--glow-success) !important;
+            background-color: rgba(57, 255, 20, 0.1) !important;
+            box-shadow: 0 0 5px var(--glow-success), inset 0 0 5px rgba(57, 255, 20, 0.5);
+        }
+        .stButton > button.study-btn:hover {
+            color: #000015 !important;
+            background-color: var(--glow-success) !important;
+            box-shadow: 0 0 15px var(--glow-success), inset 0 0 10px rgba(57, 255, 20, 0.5);
+        }
+        
+        /* Styling for st.radio to look like our buttons */
+        div[role="radiogroup"] {
+            display: flex;
+            flex-direction: column;
+            gap: 15px;
+        }
+        div[role="radiogroup"] > label {
+            background-color: rgba(255, 255, 255, 0.05) !important;
+            border: 1px solid rgba(255, 255, 255, 0.2) !important;
+            color: var(--text-color) !important;
+            padding: 15px 20px !important;
+            border-radius: 10px !important;
+            transition: all var(--transition-speed) ease !important;
+            cursor: pointer;
+            font-family: var(--font-main);
+        }
+        div[role="radiogroup"] > label:hover {
+            border-color: var(--glow-primary) !important;
+            background-color: rgba(0, 191, 255, 0.2) !important;
+            color: #FFFFFF !important;
+            box-shadow: 0 0 10px rgba(0, 191, 255, 0.5);
+            transform: scale(1.02); /* Added scaling effect on hover */
+        }
+        /* Style for the selected radio button's label */
+        div[data-baseweb="radio"] > div:first-child {
+            display: none; /* Hide the default radio dot */
+        }
+        .st-emotion-cache-1f4bdo8:has(input:checked) {
+            border-color: var(--glow-primary) !important;
+            background-color: var(--glow-primary) !important;
+            color: #000015 !important;
+            font-weight: bold;
+            box-shadow: 0 0 15px var(--glow-primary);
+        }
+        .st-emotion-cache-1f4bdo8:has(input:checked) span {
+             text-shadow: none !important; /* Remove shadow from selected option for clarity */
+        }
+
+        /* Progress Bar */
+        .stProgress > div > div > div {
+            background-image: linear-gradient(90deg, var(--glow-secondary), var(--glow-primary));
+        }
+        
+        /* Sidebar styling */
+        .st-emotion-cache-16txtl3 {
+            background: rgba(14, 17, 23, 0.8);
+            backdrop-filter: blur(5px);
+            border-right: 1px solid rgba(255, 255, 255, 0.1);
+        }
+    </style>
+    """
+
+# Exam countdown, ticked by the browser so the server never reruns a session just to show the time.
+# When it reaches zero the page reloads and resumes the attempt, which the server has submitted by then.
+COUNTDOWN_HTML = Template("""
+    <div id="countdown" style="font-family: 'Exo 2', sans-serif; color: rgba(224, 224, 224, 0.7); font-size: 0.9rem;"></div>
+    <div style="height: 8px; margin-top: 6px; border-radius: 4px; background: rgba(255, 255, 255, 0.15);">
+        <div id="bar" style="height: 100%; border-radius: 4px; background-image: linear-gradient(90deg, #FF1493, #00BFFF);"></div>
+    </div>
+    <script>
+        const totalMs = $total_ms;
+        const endsAt = Date.now() + $remaining_ms;
+        function tick() {
+            const left = Math.max(0, endsAt - Date.now());
+            const secs = Math.ceil(left / 1000);
+            const mm = String(Math.floor(secs / 60)).padStart(2, "0");
+            const ss = String(secs % 60).padStart(2, "0");
+            document.getElementById("countdown").textContent = "⏳ Time Warp Stabilizer: " + mm + ":" + ss;
+            document.getElementById("bar").style.width = (100 * left / totalMs) + "%";
+            if (left > 0) {
+                setTimeout(tick, 250);
+            } else {
+                setTimeout(() => window.parent.location.reload(), $reload_delay_ms);
+            }
+        }
+        tick();
+    </script>
+""")
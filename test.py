@@ -1,21 +1,49 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import os
+import numpy as np
 import time
+from array import array
 from datetime import datetime, timedelta
+from functools import partial
+
+from quiz.answers import NO_ANSWER, OPTION_LETTERS, answer_letter, correct_answer_label
+from quiz import analytics, metrics
+from quiz.catalog import CATALOG_SORTS
+from quiz.composite import MAX_COMPOSITE_QUESTIONS, CompositeBank, compose_exam, composite_name, stratified_quotas
+from quiz.exams import (
+    DEADLINE_GRACE_SECONDS, expire_attempt, is_expired, load_exam_bank as resolve_exam_bank, start_exam, submit_exam,
+)
+from quiz.metrics import instrument
+from quiz.missions import (
+    DEFAULT_TEST, bootstrap, delete_test, export_test_csv, load_available_tests, load_test, save_uploaded_file,
+    save_uploaded_files, search_missions, search_questions,
+)
+from quiz.runtime import get_bank_cache, get_journal
+from quiz.store import SEARCH_RANK_LIMIT
+from quiz.styles import APP_CSS, COUNTDOWN_HTML
 
 # --- INITIAL SETUP & CONFIGURATION ---
 
-# Create a folder for uploaded test files if it doesn't exist
-os.makedirs("uploaded_tests", exist_ok=True)
-
-# Set the page configuration for the Streamlit app. This should be the first Streamlit command.
-st.set_page_config(
-    page_title="AirPort Quest Prep",
-    page_icon="🚀",
-    layout="centered",
-    initial_sidebar_state="auto"
-)
+# Page sizes offered in Study Notes mode; only one page of questions is rendered per rerun.
+NOTES_PAGE_SIZES = [10, 25, 50, 100]
+# Number of questions shown per page of the Detailed Log Review.
+REVIEW_PAGE_SIZE = 10
+# Number of mission cards shown per page on the home screen.
+CATALOG_PAGE_SIZE = 10
+# Number of matches shown per page of question search.
+SEARCH_PAGE_SIZE = 20
+# Question selection modes offered on the setup screen.
+SELECTION_MODES = {"🎲 Random": "random", "🎯 Adaptive": "adaptive"}
+
+def configure_page():
+    """Sets the page configuration for the Streamlit app. This must be the first Streamlit command."""
+    st.set_page_config(
+        page_title="AirPort Quest Prep",
+        page_icon="🚀",
+        layout="centered",
+        initial_sidebar_state="auto"
+    )
 
 # --- SESSION STATE INITIALIZATION ---
 
@@ -30,19 +58,32 @@ def init_session_state():
     if "dark_mode" not in st.session_state:
         st.session_state.dark_mode = True
 
+    if "home_page" not in st.session_state:
+        st.session_state.home_page = 0
+
     # Test-related state
     if "selected_test" not in st.session_state:
         st.session_state.selected_test = None
-    if "test_data" not in st.session_state:
-        st.session_state.test_data = None
-    if "user_answers" not in st.session_state:
-        st.session_state.user_answers = {}
+    # An exam is an index array into the shared bank plus one packed answer code per question.
+    if "question_ids" not in st.session_state:
+        st.session_state.question_ids = None
+    if "answers" not in st.session_state:
+        st.session_state.answers = None
     if "test_started" not in st.session_state:
         st.session_state.test_started = False
     if "test_submitted" not in st.session_state:
         st.session_state.test_submitted = False
+    if "results_summary" not in st.session_state:
+        st.session_state.results_summary = None
+    if "review_page" not in st.session_state:
+        st.session_state.review_page = 0
     if "current_question" not in st.session_state:
         st.session_state.current_question = 0
+    # Journaled attempt id, mirrored in the URL so a refreshed page can resume it.
+    if "attempt_id" not in st.session_state:
+        st.session_state.attempt_id = None
+        if st.query_params.get("attempt"):
+            resume_attempt(st.query_params["attempt"])
         
     # Timer state
     if "timer_minutes" not in st.session_state:
@@ -53,245 +94,114 @@ def init_session_state():
     # Notes Mode state
     if "revealed_answers" not in st.session_state:
         st.session_state.revealed_answers = {}
+    if "notes_page" not in st.session_state:
+        st.session_state.notes_page = 0
+    if "notes_page_size" not in st.session_state:
+        st.session_state.notes_page_size = NOTES_PAGE_SIZES[1]
+
+    # Question search state
+    if "search_page" not in st.session_state:
+        st.session_state.search_page = 0
+
+def resume_attempt(attempt_id):
+    """Restores an in-flight or finished attempt into a fresh session, e.g. after a refresh."""
+    attempt = get_journal().load_attempt(attempt_id)
+    if attempt is None:
+        st.query_params.pop("attempt", None)
+        return
+    if not attempt["submitted"] and is_expired(attempt["started_at"], attempt["timer_minutes"]):
+        # Normally the deadline scheduler got there first; this covers a reload racing it.
+        expire_attempt(attempt_id)
+        attempt = get_journal().load_attempt(attempt_id)
+    st.session_state.attempt_id = attempt_id
+    st.session_state.selected_test = attempt["test_name"]
+    st.session_state.question_ids = attempt["question_ids"]
+    st.session_state.answers = attempt["answers"]
+    st.session_state.current_question = attempt["last_position"]
+    st.session_state.timer_minutes = attempt["timer_minutes"]
+    st.session_state.start_time = datetime.fromtimestamp(attempt["started_at"])
+    st.session_state.test_started = True
+    st.session_state.test_submitted = attempt["submitted"]
+    st.session_state.current_screen = "results" if attempt["submitted"] else "test"
+
+def load_exam_bank():
+    """
+    Resolves the bank behind the in-progress exam (one mission, or several for a mock exam)
+    from the shared cache. Returns None if a mission was deleted or re-imported after the exam started.
+    """
+    return resolve_exam_bank(st.session_state.selected_test, st.session_state.question_ids)
 
-    # Load the default test on first run
-    if "available_tests" not in st.session_state:
-        st.session_state.available_tests = []
-        try:
-            default_test_path = "questions.csv"
-            target_path = "uploaded_tests/Mission Alpha (Default).csv"
-            if os.path.exists(default_test_path):
-                if not os.path.exists(target_path):
-                    df = pd.read_csv(default_test_path)
-                    df.to_csv(target_path, index=False)
-            elif not os.path.exists(target_path):
-                pd.DataFrame({
-                    'Question (English)': ["What is the closest planet to the Sun?"], 
-                    'Question (Hindi)': ["सूर्य के सबसे निकट का ग्रह कौन सा है?"],
-                    'Option A (English)': ["Venus"], 'Option A (Hindi)': ["शुक्र"],
-                    'Option B (English)': ["Mars"], 'Option B (Hindi)': ["मंगल"],
-                    'Option C (English)': ["Mercury"], 'Option C (Hindi)': ["बुध"],
-                    'Option D (English)': ["Earth"], 'Option D (Hindi)': ["पृथ्वी"],
-                    'Correct Answer (English)': ["Mercury"]
-                }).to_csv(target_path, index=False)
-
-        except Exception as e:
-            st.error(f"Could not load or create default mission file: {e}")
-
-# Call the initialization function at the start of the script
-init_session_state()
-
-
-# --- HELPER & UTILITY FUNCTIONS ---
-
-def load_available_tests():
-    """Scans the 'uploaded_tests' directory and returns a list of available test names."""
-    test_files = [f for f in os.listdir("uploaded_tests") if f.endswith('.csv')]
-    test_names = sorted([f.replace('.csv', '') for f in test_files])
-    default_test = "Mission Alpha (Default)"
-    if default_test in test_names:
-        test_names.remove(default_test)
-        test_names.insert(0, default_test)
-    return test_names
-
-def save_uploaded_file(uploaded_file, custom_name):
-    """Saves an uploaded CSV file to the 'uploaded_tests' directory."""
-    if uploaded_file and custom_name:
-        try:
-            file_path = os.path.join("uploaded_tests", f"{custom_name}.csv")
-            df = pd.read_csv(uploaded_file)
-            df.to_csv(file_path, index=False)
-            return True
-        except Exception:
-            return False
-    return False
-
-def delete_test(test_name):
-    """Deletes a test file, preventing deletion of the default test."""
-    if test_name != "Mission Alpha (Default)":
-        try:
-            os.remove(f"uploaded_tests/{test_name}.csv")
-            return True
-        except OSError:
-            return False
-    return False
-
-def map_answer_to_option(row, answer):
-    """Maps a full answer text to its corresponding option letter (A, B, C, D)."""
-    if pd.isna(answer) or answer is None: return None
-    answer_str = str(answer).strip()
-    if answer_str in ['A', 'B', 'C', 'D']: return answer_str
-    
-    for option in ['A', 'B', 'C', 'D']:
-        col = f'Option {option} (English)'
-        if col in row and pd.notna(row[col]) and str(row[col]).strip() == answer_str:
-            return option
-    return answer
 
 # --- UI & STYLING ---
 
+@instrument("load_css")
 def load_css():
-    """Injects the custom CSS for the 'AirPort Quest' theme."""
-    st.markdown("""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700&family=Exo+2:wght@400;600&display=swap');
-
-        :root {
-            --font-main: 'Exo 2', sans-serif;
-            --font-title: 'Orbitron', sans-serif;
-            --glow-primary: #00BFFF; /* DeepSkyBlue */
-            --glow-secondary: #FF1493; /* DeepPink */
-            --glow-success: #39FF14; /* Neon Green */
-            --glow-error: #FF4500; /* OrangeRed */
-            --bg-color: #000015;
-            --text-color: #E0E0E0;
-            --border-radius: 15px;
-            --transition-speed: 0.4s;
-        }
-
-        @keyframes cosmic-background {
-            0% { background-position: 0% 50%; }
-            25% { background-position: 50% 100%; }
-            50% { background-position: 100% 50%; }
-            75% { background-position: 50% 0%; }
-            100% { background-position: 0% 50%; }
-        }
-
-        .stApp {
-            background: var(--bg-color);
-            background-image: linear-gradient(135deg, #000015 0%, #020024 25%, #0b094e 50%, #FF1493 75%, #00BFFF 100%);
-            background-size: 400% 400%;
-            animation: cosmic-background 20s ease infinite;
-            color: var(--text-color);
-            font-family: var(--font-main);
-        }
-
-        h1, h2, h3, h4, h5, h6 {
-            font-family: var(--font-title) !important;
-            color: #FFFFFF !important;
-            text-shadow: 0 0 5px var(--glow-primary);
-        }
-
-        /* Increase base font size for better readability */
-        .stMarkdown, .stRadio > label, p, div, span {
-            font-size: 1.1rem !important;
-            /* Add text shadow for readability against bright backgrounds */
-            text-shadow: 0 0 5px rgba(0,0,0,0.7);
-        }
-        
-        .st-emotion-cache-1g6gooi { /* Metric value */
-             font-size: 2rem !important;
-        }
-        
-        #MainMenu, footer, .stDeployButton { visibility: hidden; }
-
-        /* Glassmorphism Card Style */
-        .glass-card {
-            background: rgba(22, 27, 34, 0.6);
-            backdrop-filter: blur(10px);
-            -webkit-backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: var(--border-radius);
-            padding: 25px;
-            margin-bottom: 20px;
-            transition: all var(--transition-speed);
-        }
-        .glass-card:hover {
-            border: 1px solid rgba(0, 191, 255, 0.5);
-            transform: scale(1.02);
-        }
-        .glass-card h3 {
-            color: var(--glow-primary) !important;
-            text-shadow: 0 0 8px var(--glow-primary);
-        }
-
-        /* Custom Button Styles with Glow */
-        .stButton > button {
-            width: 100%;
-            border-radius: 10px !important;
-            font-weight: 600 !important;
-            font-family: var(--font-title);
-            border: 1px solid var(--glow-primary) !important;
-            background-color: rgba(0, 191, 255, 0.1) !important;
-            color: var(--glow-primary) !important;
-            transition: all var(--transition-speed) ease !important;
-            box-shadow: 0 0 5px var(--glow-primary), inset 0 0 5px rgba(0, 191, 255, 0.5);
-        }
-        .stButton > button:hover {
-            color: #FFFFFF !important;
-            background-color: rgba(0, 191, 255, 0.3) !important;
-            box-shadow: 0 0 15px var(--glow-primary), inset 0 0 10px rgba(0, 191, 255, 0.5);
-            transform: scale(1.05);
-        }
-        
-        /* Study Notes Button Style */
-        .stButton > button.study-btn {
-            border-color: var(--glow-success) !important;
-            color: var(--glow-success) !important;
-            background-color: rgba(57, 255, 20, 0.1) !important;
-            box-shadow: 0 0 5px var(--glow-success), inset 0 0 5px rgba(57, 255, 20, 0.5);
-        }
-        .stButton > button.study-btn:hover {
-            color: #000015 !important;
-            background-color: var(--glow-success) !important;
-            box-shadow: 0 0 15px var(--glow-success), inset 0 0 10px rgba(57, 255, 20, 0.5);
-        }
-        
-        /* Styling for st.radio to look like our buttons */
-        div[role="radiogroup"] {
-            display: flex;
-            flex-direction: column;
-            gap: 15px;
-        }
-        div[role="radiogroup"] > label {
-            background-color: rgba(255, 255, 255, 0.05) !important;
-            border: 1px solid rgba(255, 255, 255, 0.2) !important;
-            color: var(--text-color) !important;
-            padding: 15px 20px !important;
-            border-radius: 10px !important;
-            transition: all var(--transition-speed) ease !important;
-            cursor: pointer;
-            font-family: var(--font-main);
-        }
-        div[role="radiogroup"] > label:hover {
-            border-color: var(--glow-primary) !important;
-            background-color: rgba(0, 191, 255, 0.2) !important;
-            color: #FFFFFF !important;
-            box-shadow: 0 0 10px rgba(0, 191, 255, 0.5);
-            transform: scale(1.02); /* Added scaling effect on hover */
-        }
-        /* Style for the selected radio button's label */
-        div[data-baseweb="radio"] > div:first-child {
-            display: none; /* Hide the default radio dot */
-        }
-        .st-emotion-cache-1f4bdo8:has(input:checked) {
-            border-color: var(--glow-primary) !important;
-            background-color: var(--glow-primary) !important;
-            color: #000015 !important;
-            font-weight: bold;
-            box-shadow: 0 0 15px var(--glow-primary);
-        }
-        .st-emotion-cache-1f4bdo8:has(input:checked) span {
-             text-shadow: none !important; /* Remove shadow from selected option for clarity */
-        }
-
-        /* Progress Bar */
-        .stProgress > div > div > div {
-            background-image: linear-gradient(90deg, var(--glow-secondary), var(--glow-primary));
-        }
-        
-        /* Sidebar styling */
-        .st-emotion-cache-16txtl3 {
-            background: rgba(14, 17, 23, 0.8);
-            backdrop-filter: blur(5px);
-            border-right: 1px solid rgba(255, 255, 255, 0.1);
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    """Injects the custom CSS for the 'AirPort Quest' theme. The stylesheet itself is built once per process."""
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+def diagnostics_panel():
+    """Sidebar panel with the process-wide timing percentiles, shown only when QUIZ_METRICS=1."""
+    with st.sidebar.expander("🛠️ Diagnostics"):
+        snapshot = metrics.registry.snapshot()
+        if not snapshot:
+            st.caption("No samples yet.")
+            return
+        # Timings are recorded in seconds; show them in milliseconds.
+        table = pd.DataFrame.from_dict(snapshot, orient="index")
+        is_timing = ~table.index.str.startswith(("rerun.", "session."))
+        table.loc[is_timing, ["sum", "p50", "p95", "p99"]] *= 1000
+        st.caption("Timings in ms; element counts and state sizes in raw units. Percentiles span all sessions.")
+        st.dataframe(table, use_container_width=True)
+        cache = get_bank_cache().stats()
+        st.caption(f"Bank cache: {cache['hits']} hits · {cache['misses']} misses · "
+                   f"{cache['entries']} entries · {cache['bytes'] / 1024:.0f} KB")
+        st.caption(f"Prometheus text file: {metrics.METRICS_FILE}")
 
 
 # --- UI SCREENS ---
 
+def show_ingest_report(report):
+    """Renders the outcome of an upload: summary, warnings and the first row errors."""
+    if report.ok:
+        st.success(f"Mission data received! {report.rows_written} questions imported "
+                   f"({report.rows_per_second:,.0f} rows/s).")
+    else:
+        st.error(f"Transmission error: {report.fatal}")
+    for warning in report.warnings:
+        st.warning(warning)
+    if report.duplicates:
+        st.info(f"{report.duplicates} duplicate questions skipped.")
+    if report.error_count:
+        with st.expander(f"{report.error_count} rows rejected"):
+            st.markdown("\n".join(f"- Row {row}: {message}" for row, message in report.errors))
+            if report.error_count > len(report.errors):
+                st.caption(f"...and {report.error_count - len(report.errors)} more.")
+
+def show_bulk_report(reports, seconds):
+    """Renders one summary for a bulk upload: totals, a row per file and the first errors of failed files."""
+    imported = [report for report in reports if report.ok]
+    failed = [report for report in reports if not report.ok]
+    if imported:
+        st.success(f"{len(imported)} missions imported, {sum(r.rows_written for r in imported)} questions "
+                   f"in {seconds:.1f}s.")
+    if failed:
+        st.error(f"{len(failed)} files could not be imported.")
+    if not reports:
+        st.warning("No CSV files found in the upload.")
+        return
+    with st.expander("Import details", expanded=bool(failed)):
+        st.dataframe(pd.DataFrame({
+            "Mission": [r.test_name for r in reports],
+            "Questions": [r.rows_written for r in reports],
+            "Duplicates": [r.duplicates for r in reports],
+            "Rejected rows": [r.error_count for r in reports],
+            "Status": ["✅" if r.ok else f"❌ {r.fatal}" for r in reports],
+        }), hide_index=True, use_container_width=True)
+        for report in reports:
+            if report.errors:
+                st.caption(f"{report.test_name}: " + "; ".join(f"row {row}: {message}" for row, message in report.errors[:5]))
+
+@instrument("screen.home")
 def home_screen():
     """Displays the main home screen with available missions."""
     st.title("🚀 AirPort Quest Prep")
@@ -299,30 +209,65 @@ def home_screen():
     
     with st.sidebar:
         st.header("🌌 Mission Control")
+        if st.button("📈 Mission Analytics", use_container_width=True):
+            st.session_state.current_screen = "analytics"
+            st.rerun()
+        if st.button("🔎 Search Logs", use_container_width=True):
+            st.session_state.current_screen = "search"
+            st.rerun()
+        if st.button("🧩 Mock Mission Builder", use_container_width=True):
+            st.session_state.current_screen = "compose"
+            st.rerun()
         st.divider()
         st.header("Upload New Mission")
         with st.form("upload_form", border=False):
-            custom_name = st.text_input("Enter Mission Name", "New Mission")
-            uploaded_file = st.file_uploader("Upload Mission CSV File", type="csv")
+            custom_name = st.text_input("Enter Mission Name", "New Mission",
+                                        help="Used for a single CSV. Bulk uploads are named after each CSV file.")
+            uploaded_files = st.file_uploader("Upload Mission CSV or ZIP Files", type=["csv", "zip"],
+                                              accept_multiple_files=True)
             submitted = st.form_submit_button("🛰️ Add Mission", use_container_width=True)
             
-            if submitted and uploaded_file and custom_name:
-                if save_uploaded_file(uploaded_file, custom_name):
-                    st.success("Mission data received!")
-                    time.sleep(1); st.rerun()
+            # The mission list is drawn after the sidebar, so new missions show up without a rerun.
+            if submitted and uploaded_files:
+                if len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith(".csv"):
+                    if custom_name:
+                        show_ingest_report(save_uploaded_file(uploaded_files[0], custom_name))
                 else:
-                    st.error("Transmission error. Check data file.")
+                    with st.spinner("Importing missions..."):
+                        started = time.perf_counter()
+                        reports = save_uploaded_files(uploaded_files)
+                        show_bulk_report(reports, time.perf_counter() - started)
 
     st.header("Available Missions")
-    available_tests = load_available_tests()
+    filter_cols = st.columns([2, 1])
+    with filter_cols[0]:
+        query = st.text_input("Search missions", key="catalog_query", placeholder="🔍 Search missions",
+                              label_visibility="collapsed", on_change=set_home_page, args=(0,))
+    with filter_cols[1]:
+        sort = st.selectbox("Sort by", list(CATALOG_SORTS), key="catalog_sort",
+                            label_visibility="collapsed", on_change=set_home_page, args=(0,))
+    missions = search_missions(query, sort)
     
-    if not available_tests:
-        st.info("No missions available. Upload mission data via Mission Control.")
+    if not missions:
+        if query:
+            st.info(f"No missions match '{query}'.")
+        else:
+            st.info("No missions available. Upload mission data via Mission Control.")
         return
 
-    for test_name in available_tests:
+    # Only one page of cards (and their buttons) is rendered per rerun.
+    page_count = max(1, -(-len(missions) // CATALOG_PAGE_SIZE))
+    home_page = min(st.session_state.home_page, page_count - 1)
+    start = home_page * CATALOG_PAGE_SIZE
+    page_missions = missions[start:start + CATALOG_PAGE_SIZE]
+    st.caption(f"Showing {start + 1}-{start + len(page_missions)} of {len(missions)} missions")
+
+    for mission in page_missions:
+        test_name = mission["name"]
         with st.container():
             st.markdown(f'<div class="glass-card"><h3>{test_name}</h3>', unsafe_allow_html=True)
+            updated = datetime.fromtimestamp(mission["modified_at"]).strftime("%d %b %Y")
+            st.caption(f"{mission['question_count']} questions · {format_size(mission['size_bytes'])} · updated {updated}")
             
             col1, col2 = st.columns(2)
             with col1:
@@ -335,9 +280,10 @@ def home_screen():
                     st.session_state.selected_test = test_name
                     st.session_state.current_screen = "notes"
                     st.session_state.revealed_answers = {} # Reset for new study session
+                    st.session_state.notes_page = 0
                     st.rerun()
             
-            if test_name != "Mission Alpha (Default)":
+            if test_name != DEFAULT_TEST:
                 st.markdown('<div style="margin-top: 10px;"></div>', unsafe_allow_html=True)
                 if st.button("🗑️ Decommission", key=f"del_{test_name}", help="Permanently delete this mission"):
                     if delete_test(test_name):
@@ -345,15 +291,40 @@ def home_screen():
 
             st.markdown('</div>', unsafe_allow_html=True)
 
-
+    if page_count > 1:
+        nav_cols = st.columns([1, 1, 1])
+        with nav_cols[0]:
+            st.button("⬅️ Previous", use_container_width=True, disabled=(home_page == 0),
+                      on_click=set_home_page, args=(home_page - 1,))
+        with nav_cols[1]:
+            st.caption(f"Page {home_page + 1} of {page_count}")
+        with nav_cols[2]:
+            st.button("Next ➡️", use_container_width=True, disabled=(home_page >= page_count - 1),
+                      on_click=set_home_page, args=(home_page + 1,))
+
+def set_home_page(page):
+    """Callback to move the mission list to another page."""
+    st.session_state.home_page = max(0, page)
+
+def format_size(size_bytes):
+    """Formats a byte count for display, e.g. 12.3 KB."""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    for unit in ["KB", "MB", "GB"]:
+        size_bytes /= 1024
+        if size_bytes < 1024 or unit == "GB":
+            return f"{size_bytes:.1f} {unit}"
+
+
+@instrument("screen.setup")
 def setup_screen():
     """Displays the configuration screen for a selected mission."""
     st.title(f"⚙️ Mission Briefing: {st.session_state.selected_test}")
     
     try:
-        test_path = f"uploaded_tests/{st.session_state.selected_test}.csv"
-        df = pd.read_csv(test_path)
-        total_questions = len(df)
+        bank = load_test(st.session_state.selected_test)
+        total_questions = len(bank)
+        near_duplicates = bank.duplicate_groups().duplicates
     except Exception as e:
         st.error(f"Could not load mission data: {e}")
         if st.button("⬅️ Return to Hangar"): st.session_state.current_screen = "home"; st.rerun()
@@ -366,6 +337,15 @@ def setup_screen():
             
             num_questions = st.slider("Number of Questions", min_value=5, max_value=min(100, total_questions), value=min(20, total_questions), step=5)
             
+            selection_mode = st.radio("Question Selection", list(SELECTION_MODES), horizontal=True,
+                                      help="Adaptive mode favours the logs explorers miss most often.")
+
+            skip_duplicates = False
+            if near_duplicates:
+                skip_duplicates = st.checkbox(
+                    "Skip near-duplicate questions", value=True,
+                    help=f"{near_duplicates} questions in this mission are reworded versions of another one.")
+
             enable_timer = st.checkbox("Enable Mission Timer?", value=True)
             timer_minutes = 0
             if enable_timer:
@@ -374,34 +354,160 @@ def setup_screen():
             col1, col2 = st.columns(2)
             with col1:
                 if st.form_submit_button("🚀 Launch Mission!", use_container_width=True):
-                    df_sampled = df.sample(n=num_questions).reset_index(drop=True)
-                    st.session_state.test_data = df_sampled
-                    st.session_state.user_answers = {i: None for i in range(num_questions)}
-                    st.session_state.test_started = True
-                    st.session_state.test_submitted = False
-                    st.session_state.current_screen = "test"
-                    st.session_state.current_question = 0
-                    st.session_state.timer_minutes = timer_minutes if enable_timer else 0
-                    st.session_state.start_time = datetime.now()
-                    st.rerun()
+                    if SELECTION_MODES[selection_mode] == "adaptive":
+                        question_ids = bank.sample_adaptive(num_questions, distinct=skip_duplicates)
+                    else:
+                        question_ids = bank.sample(num_questions, distinct=skip_duplicates)
+                    launch_exam(st.session_state.selected_test, question_ids, timer_minutes if enable_timer else 0)
             
             with col2:
                 if st.form_submit_button("⬅️ Return to Hangar", use_container_width=True):
                     st.session_state.current_screen = "home"; st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
 
+def launch_exam(test_name, question_ids, timer_minutes):
+    """Journals a new exam over the given questions and switches to the test screen."""
+    st.session_state.selected_test = test_name
+    st.session_state.question_ids = question_ids
+    st.session_state.answers = array('b', [NO_ANSWER]) * len(question_ids)
+    st.session_state.test_started = True
+    st.session_state.test_submitted = False
+    st.session_state.current_screen = "test"
+    st.session_state.current_question = 0
+    st.session_state.timer_minutes = timer_minutes
+    st.session_state.start_time = datetime.now()
+    st.session_state.attempt_id = start_exam(
+        test_name, question_ids, timer_minutes, st.session_state.start_time.timestamp())
+    st.query_params["attempt"] = st.session_state.attempt_id
+    st.rerun()
+
+@instrument("screen.compose")
+def compose_screen():
+    """Displays the mock exam builder, which draws one exam from several missions."""
+    st.title("🧩 Mock Mission Builder")
+    if st.button("⬅️ Return to Hangar"):
+        st.session_state.current_screen = "home"
+        st.rerun()
+
+    entries = search_missions()
+    sizes = {entry["name"]: entry["question_count"] for entry in entries}
+    test_names = st.multiselect("Missions", list(sizes), key="compose_missions",
+                                placeholder="Choose the missions to draw from")
+    # A single mission is what its own Take Quiz screen is for.
+    if len(test_names) < 2:
+        st.info("Choose two or more missions to build a mock exam from their logs.")
+        return
+    available = sum(sizes[test_name] for test_name in test_names)
+
+    with st.container(border=False):
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        with st.form("compose_form"):
+            st.subheader("Set Mission Parameters")
+            allocation = st.radio("Logs per mission", ["⚖️ Proportional", "✏️ Custom"], horizontal=True,
+                                  help="Proportional splits the total by mission size; Custom uses the Logs column below.")
+            total = st.number_input("Total logs", min_value=1, max_value=min(MAX_COMPOSITE_QUESTIONS, available),
+                                    value=min(200, available))
+            defaults = stratified_quotas({test_name: sizes[test_name] for test_name in test_names}, min(200, available))
+            quotas_table = st.data_editor(
+                pd.DataFrame({
+                    "Mission": test_names,
+                    "Available": [sizes[test_name] for test_name in test_names],
+                    "Logs": [defaults[test_name] for test_name in test_names],
+                }),
+                disabled=["Mission", "Available"], hide_index=True, use_container_width=True, key="compose_quotas",
+            )
+            selection_mode = st.radio("Question Selection", list(SELECTION_MODES), horizontal=True)
+            skip_duplicates = st.checkbox("Skip near-duplicate questions", value=True,
+                                          help="Reworded versions of the same log are never served together, even across missions.")
+            enable_timer = st.checkbox("Enable Mission Timer?", value=True)
+            timer_minutes = st.number_input("Mission Duration (minutes)", min_value=1, max_value=300, value=120)
+
+            if st.form_submit_button("🚀 Launch Mock Mission!", use_container_width=True):
+                if allocation == "⚖️ Proportional":
+                    quotas = stratified_quotas({test_name: sizes[test_name] for test_name in test_names}, total)
+                else:
+                    quotas = {
+                        row.Mission: min(max(int(row.Logs), 0), row.Available) if pd.notna(row.Logs) else 0
+                        for row in quotas_table.itertuples(index=False)
+                    }
+                    if sum(quotas.values()) > MAX_COMPOSITE_QUESTIONS:
+                        st.error(f"A mock mission can have at most {MAX_COMPOSITE_QUESTIONS} logs.")
+                        quotas = {}
+                try:
+                    question_ids = compose_exam(quotas, adaptive=SELECTION_MODES[selection_mode] == "adaptive",
+                                                distinct=skip_duplicates) if quotas else []
+                except KeyError as e:
+                    st.error(f"Could not load mission data: {e}")
+                    question_ids = []
+                if len(question_ids):
+                    launch_exam(composite_name(test_names), question_ids, timer_minutes if enable_timer else 0)
+                elif quotas:
+                    st.warning("The chosen quotas don't draw any logs.")
+        st.markdown('</div>', unsafe_allow_html=True)
+
 def update_answer():
     """Callback function to update the user's answer in session state."""
     q_index = st.session_state.current_question
     widget_key = f"q_radio_{q_index}"
     selected_option_text = st.session_state.get(widget_key)
+    if time_is_up():
+        return
     if selected_option_text:
         selected_letter = selected_option_text.split(':')[0]
-        st.session_state.user_answers[q_index] = selected_letter
+        st.session_state.answers[q_index] = OPTION_LETTERS.index(selected_letter)
+        if st.session_state.attempt_id:
+            get_journal().record_answer(st.session_state.attempt_id, q_index, st.session_state.answers[q_index])
 
+def submit_test():
+    """
+    Marks the exam as submitted and grades it once, freezing the summary shown on the results screen.
+    The first submission of an attempt is journaled and feeds the statistics behind adaptive selection.
+    """
+    st.session_state.test_submitted = True
+    st.session_state.current_screen = "results"
+    st.session_state.review_page = 0
+    bank = load_exam_bank()
+    if bank is None:
+        st.session_state.results_summary = None
+        return
+
+    answer_key, correct_mask, _ = submit_exam(
+        st.session_state.attempt_id, bank, st.session_state.question_ids, st.session_state.answers)
+    total = len(answer_key)
+    correct_count = int(correct_mask.sum())
+    st.session_state.results_summary = {
+        "total": total,
+        "correct": correct_count,
+        "percentage": (correct_count / total) * 100 if total > 0 else 0,
+        "answer_key": answer_key,
+        "correct_mask": correct_mask,
+        "celebrated": False,
+    }
+
+def time_is_up():
+    """Returns True once the exam timer (plus grace period) has run out."""
+    return (st.session_state.timer_minutes > 0 and st.session_state.start_time is not None
+            and is_expired(st.session_state.start_time.timestamp(), st.session_state.timer_minutes))
+
+def close_expired_test():
+    """
+    Ends an exam whose time ran out. The server submits expired attempts on its own, so the
+    answers are reloaded from the journal to show exactly what was graded.
+    """
+    if st.session_state.attempt_id:
+        expire_attempt(st.session_state.attempt_id)
+        attempt = get_journal().load_attempt(st.session_state.attempt_id)
+        if attempt is not None:
+            st.session_state.answers = attempt["answers"]
+    submit_test()
+
+@instrument("screen.test")
 def test_screen():
     """Displays the active test screen with questions and options."""
-    if not st.session_state.get("test_started", False) or st.session_state.get("test_data") is None:
+    bank = None
+    if st.session_state.get("test_started", False) and st.session_state.get("question_ids") is not None:
+        bank = load_exam_bank()
+    if bank is None:
         st.error("Mission not initialized. Returning to hangar.")
         st.session_state.current_screen = "home"
         st.session_state.test_started = False
@@ -409,22 +515,55 @@ def test_screen():
         st.rerun()
         return
 
-    st.warning("Do not refresh this page, or your mission progress will be lost!", icon="⚠️")
+    if time_is_up():
+        close_expired_test()
+        st.rerun()
 
-    df = st.session_state.test_data
-    current_idx = st.session_state.current_question
-    total_questions = len(df)
-    question_row = df.iloc[current_idx]
+    st.info("Mission progress is logged automatically. Reopen this page to resume if you get disconnected.", icon="🛰️")
 
     if st.session_state.timer_minutes > 0:
-        elapsed = (datetime.now() - st.session_state.start_time).seconds
-        remaining = max(0, st.session_state.timer_minutes * 60 - elapsed)
-        if remaining == 0 and not st.session_state.test_submitted:
-            st.session_state.test_submitted = True; st.rerun()
-        mins, secs = divmod(remaining, 60)
-        st.caption(f"⏳ Time Warp Stabilizer: {mins:02d}:{secs:02d}")
-        st.progress(remaining / (st.session_state.timer_minutes * 60))
-    
+        timer_panel()
+    question_panel(bank)
+
+def timer_panel():
+    """
+    Countdown ticked by the browser, so no reruns are needed while the exam runs.
+    The deadline itself is enforced on the server, which submits the attempt when it passes.
+    """
+    total_seconds = st.session_state.timer_minutes * 60
+    remaining = max(0.0, total_seconds - (datetime.now() - st.session_state.start_time).total_seconds())
+    countdown = COUNTDOWN_HTML.substitute(
+        total_ms=total_seconds * 1000,
+        remaining_ms=int(remaining * 1000),
+        reload_delay_ms=(DEADLINE_GRACE_SECONDS + 1) * 1000,
+    )
+    # st.iframe replaces components.html in newer Streamlit releases.
+    if hasattr(st, "iframe"):
+        st.iframe(countdown, height=40)
+    else:
+        components.html(countdown, height=40)
+
+def move_question(step):
+    """Callback for the navigation buttons. The position is journaled, so a resumed attempt reopens on it."""
+    st.session_state.current_question += step
+    if st.session_state.attempt_id:
+        get_journal().record_position(st.session_state.attempt_id, st.session_state.current_question)
+
+@st.fragment
+@instrument("fragment.question")
+def question_panel(bank):
+    """
+    Question card and navigation. Answering and moving between questions only
+    rerun this fragment; submitting triggers a full rerun to show the results.
+    """
+    if time_is_up():
+        close_expired_test()
+        st.rerun()
+
+    current_idx = st.session_state.current_question
+    total_questions = len(st.session_state.question_ids)
+    question_row = bank.row(st.session_state.question_ids[current_idx])
+
     st.subheader(f"Log Entry {current_idx + 1} of {total_questions}")
     
     with st.container(border=True):
@@ -434,11 +573,8 @@ def test_screen():
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    options_map = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
-    options_list = ['A', 'B', 'C', 'D']
-    
     formatted_options = []
-    for option in options_list:
+    for option in OPTION_LETTERS:
         eng_text = question_row.get(f'Option {option} (English)', '')
         hin_text = question_row.get(f'Option {option} (Hindi)', '')
         display_text = f"{option}: {eng_text}"
@@ -446,8 +582,8 @@ def test_screen():
             display_text += f" ({hin_text})"
         formatted_options.append(display_text)
     
-    current_answer = st.session_state.user_answers.get(current_idx)
-    current_index = options_map.get(current_answer)
+    current_answer = st.session_state.answers[current_idx]
+    current_index = current_answer if current_answer != NO_ANSWER else None
 
     st.radio(
         "Select your response:", 
@@ -462,25 +598,34 @@ def test_screen():
 
     nav_cols = st.columns([1, 1, 1])
     with nav_cols[0]:
-        if st.button("⬅️ Previous Log", use_container_width=True, disabled=(current_idx == 0)):
-            st.session_state.current_question -= 1; st.rerun()
+        st.button("⬅️ Previous Log", use_container_width=True, disabled=(current_idx == 0),
+                  on_click=move_question, args=(-1,))
     
     with nav_cols[1]:
         if st.button("🛑 Abort Mission", use_container_width=True):
-            st.session_state.test_submitted = True
+            submit_test()
             st.rerun()
 
     with nav_cols[2]:
         if current_idx < total_questions - 1:
-            if st.button("Next Log ➡️", use_container_width=True):
-                st.session_state.current_question += 1; st.rerun()
+            st.button("Next Log ➡️", use_container_width=True, on_click=move_question, args=(1,))
         else:
             if st.button("✅ Transmit Logs", use_container_width=True):
-                st.session_state.test_submitted = True; st.rerun()
+                submit_test(); st.rerun()
 
-    if st.session_state.test_submitted:
-        st.session_state.current_screen = "results"; st.rerun()
+def set_notes_page(page):
+    """Moves Study Notes to another page. Reveal state is kept per page, so it is reset."""
+    if page != st.session_state.notes_page:
+        st.session_state.revealed_answers = {}
+    st.session_state.notes_page = max(0, page)
 
+def jump_to_note():
+    """Callback for the jump control: opens the page that contains the requested question."""
+    question_number = st.session_state.get("notes_jump")
+    if question_number:
+        set_notes_page((int(question_number) - 1) // st.session_state.notes_page_size)
+
+@instrument("screen.notes")
 def notes_screen():
     """Displays the notes/study mode screen."""
     st.title(f"📖 Study Notes: {st.session_state.selected_test}")
@@ -490,17 +635,35 @@ def notes_screen():
         st.rerun()
 
     try:
-        test_path = f"uploaded_tests/{st.session_state.selected_test}.csv"
-        df = pd.read_csv(test_path)
+        bank = load_test(st.session_state.selected_test)
     except Exception as e:
         st.error(f"Could not load mission data: {e}")
         return
 
+    # The CSV is generated only when the button is clicked.
+    st.download_button("⬇️ Export Mission CSV", data=partial(export_test_csv, st.session_state.selected_test),
+                       file_name=f"{st.session_state.selected_test}.csv", mime="text/csv")
+
+    total_questions = len(bank)
+    page_size = st.session_state.notes_page_size
+    page_count = max(1, -(-total_questions // page_size))
+    if st.session_state.notes_page >= page_count:
+        set_notes_page(page_count - 1)
+
     st.markdown("---")
     st.info("Click on any option to reveal the correct answer for that question.", icon="💡")
+
+    control_cols = st.columns(2)
+    with control_cols[0]:
+        st.selectbox("Questions per page", NOTES_PAGE_SIZES, key="notes_page_size", on_change=set_notes_page, args=(0,))
+    with control_cols[1]:
+        st.number_input("Jump to question", min_value=1, max_value=max(1, total_questions), value=None,
+                        step=1, key="notes_jump", on_change=jump_to_note)
     st.markdown("---")
 
-    for i, row in df.iterrows():
+    start = st.session_state.notes_page * page_size
+    end = min(start + page_size, total_questions)
+    for i, row in enumerate(bank.page(start, end), start=start):
         with st.container(border=True):
             st.markdown(f"**Q{i+1}: {row.get('Question (English)', 'N/A')}**")
             if pd.notna(row.get('Question (Hindi)')):
@@ -509,8 +672,7 @@ def notes_screen():
             st.markdown("<br>", unsafe_allow_html=True)
 
             cols = st.columns(2)
-            options = ['A', 'B', 'C', 'D']
-            for j, option in enumerate(options):
+            for j, option in enumerate(OPTION_LETTERS):
                 with cols[j % 2]:
                     eng_text = row.get(f'Option {option} (English)', '')
                     hin_text = row.get(f'Option {option} (Hindi)', '')
@@ -518,12 +680,12 @@ def notes_screen():
                     if pd.notna(hin_text) and hin_text:
                         display_text += f" ({hin_text})"
                     
+                    # The reveal is drawn below the buttons, so no extra rerun is needed.
                     if st.button(display_text, key=f"note_q{i}_opt{option}", use_container_width=True):
                         st.session_state.revealed_answers[i] = True
-                        st.rerun() 
 
             if st.session_state.revealed_answers.get(i):
-                correct_ans_letter = map_answer_to_option(row, row.get('Correct Answer (English)'))
+                correct_ans_letter = correct_answer_label(row, bank.answer_key[i])
                 
                 correct_eng = row.get(f'Option {correct_ans_letter} (English)', 'N/A')
                 correct_hin = row.get(f'Option {correct_ans_letter} (Hindi)', '')
@@ -533,20 +695,40 @@ def notes_screen():
                 
                 st.success(f"💡 Correct Answer: {correct_ans_letter} - {correct_display}")
 
+    nav_cols = st.columns([1, 1, 1])
+    with nav_cols[0]:
+        st.button("⬅️ Previous Page", use_container_width=True, disabled=(st.session_state.notes_page == 0),
+                  on_click=set_notes_page, args=(st.session_state.notes_page - 1,))
+    with nav_cols[1]:
+        st.caption(f"Page {st.session_state.notes_page + 1} of {page_count} · Q{start + 1}-{end} of {total_questions}")
+    with nav_cols[2]:
+        st.button("Next Page ➡️", use_container_width=True, disabled=(st.session_state.notes_page >= page_count - 1),
+                  on_click=set_notes_page, args=(st.session_state.notes_page + 1,))
+
+def set_review_page(page):
+    """Callback to move the Detailed Log Review to another page."""
+    st.session_state.review_page = max(0, page)
+
+@instrument("screen.results")
 def results_screen():
     """Displays the test results, score, and detailed review."""
     st.title("📊 Mission Debriefing")
-    df = st.session_state.test_data
-    
-    correct_count = 0
-    for i, row in df.iterrows():
-        user_ans = st.session_state.user_answers.get(i)
-        correct_ans_text = row.get('Correct Answer (English)')
-        correct_ans_letter = map_answer_to_option(row, correct_ans_text)
-        if user_ans == correct_ans_letter: correct_count += 1
-            
-    total = len(df)
-    percentage = (correct_count / total) * 100 if total > 0 else 0
+    bank = load_exam_bank()
+    if bank is None:
+        st.error("Mission data is no longer available.")
+        if st.button("⬅️ Return to Hangar"): st.session_state.current_screen = "home"; st.rerun()
+        return
+
+    if st.session_state.results_summary is None:
+        submit_test()
+    summary = st.session_state.results_summary
+    question_ids = st.session_state.question_ids
+    answers = np.frombuffer(st.session_state.answers, dtype=np.int8)
+    answer_key = summary["answer_key"]
+    correct_mask = summary["correct_mask"]
+    total = summary["total"]
+    correct_count = summary["correct"]
+    percentage = summary["percentage"]
 
     st.subheader("Performance Analysis")
     score_cols = st.columns(3)
@@ -554,9 +736,13 @@ def results_screen():
     score_cols[1].metric("Correct Logs", correct_count)
     score_cols[2].metric("Mission Success", f"{percentage:.1f}%")
     st.progress(percentage / 100)
+    if isinstance(bank, CompositeBank):
+        st.dataframe(bank.breakdown(question_ids, correct_mask).round(1), use_container_width=True)
     
     if percentage >= 80:
-        st.balloons(); st.success("Stellar performance, Explorer! You've conquered this sector.")
+        if not summary["celebrated"]:
+            st.balloons(); summary["celebrated"] = True
+        st.success("Stellar performance, Explorer! You've conquered this sector.")
     elif percentage >= 50:
         st.warning("Good navigation. Some asteroid fields were tricky, but you made it.")
     else:
@@ -565,15 +751,27 @@ def results_screen():
     st.divider()
 
     st.subheader("Detailed Log Review")
-    for i, row in df.iterrows():
+    st.toggle("Show incorrect logs only", key="review_incorrect_only", on_change=set_review_page, args=(0,))
+    if st.session_state.get("review_incorrect_only"):
+        review_indices = np.flatnonzero(~correct_mask)
+    else:
+        review_indices = np.arange(total)
+
+    page_count = max(1, -(-len(review_indices) // REVIEW_PAGE_SIZE))
+    review_page = min(st.session_state.review_page, page_count - 1)
+    page_indices = review_indices[review_page * REVIEW_PAGE_SIZE:(review_page + 1) * REVIEW_PAGE_SIZE]
+    if len(review_indices) == 0:
+        st.info("No incorrect logs. Flawless mission!")
+
+    for i, row in zip(page_indices, bank.rows(question_ids[page_indices])):
         with st.container(border=True):
             st.markdown(f"**Log {i+1}: {row.get('Question (English)', 'N/A')}**")
             if pd.notna(row.get('Question (Hindi)')):
                 st.caption(f"({row.get('Question (Hindi)')})")
             
-            user_ans_letter = st.session_state.user_answers.get(i)
-            correct_ans_letter = map_answer_to_option(row, row.get('Correct Answer (English)'))
-            is_correct = (user_ans_letter == correct_ans_letter)
+            user_ans_letter = answer_letter(answers[i])
+            correct_ans_letter = correct_answer_label(row, answer_key[i])
+            is_correct = bool(correct_mask[i])
             
             if user_ans_letter:
                 user_eng = row.get(f'Option {user_ans_letter} (English)', 'N/A')
@@ -597,28 +795,169 @@ def results_screen():
                     correct_display += f" ({correct_hin})"
                 st.info(f"💡 Correct Log: {correct_ans_letter} - {correct_display}")
 
+    if page_count > 1:
+        nav_cols = st.columns([1, 1, 1])
+        with nav_cols[0]:
+            st.button("⬅️ Previous Logs", use_container_width=True, disabled=(review_page == 0),
+                      on_click=set_review_page, args=(review_page - 1,))
+        with nav_cols[1]:
+            st.caption(f"Page {review_page + 1} of {page_count}")
+        with nav_cols[2]:
+            st.button("Next Logs ➡️", use_container_width=True, disabled=(review_page >= page_count - 1),
+                      on_click=set_review_page, args=(review_page + 1,))
+
     st.divider()
+    if st.button("📈 View Mission Analytics", use_container_width=True):
+        st.session_state.current_screen = "analytics"
+        st.rerun()
     if st.button("🚀 Start New Mission", use_container_width=True):
-        for key in ["current_screen", "test_started", "test_submitted", "test_data", "user_answers", "revealed_answers"]:
+        for key in ["current_screen", "test_started", "test_submitted", "question_ids", "answers", "results_summary", "attempt_id", "revealed_answers"]:
             if key == "current_screen":
                 st.session_state[key] = "home"
             else:
-                st.session_state[key] = None if key in ["test_data"] else {}
+                st.session_state[key] = None if key in ["question_ids", "answers", "results_summary", "attempt_id"] else {}
+        st.query_params.pop("attempt", None)
+        st.rerun()
+
+@instrument("screen.search")
+def search_screen():
+    """Displays full-text search over the questions of every mission, one page of ranked matches at a time."""
+    st.title("🔎 Search Logs")
+    if st.button("⬅️ Return to Hangar"):
+        st.session_state.current_screen = "home"
+        st.rerun()
+
+    query = st.text_input("Search", key="question_query", placeholder="🔍 Search questions and options in English or Hindi",
+                          label_visibility="collapsed", on_change=set_search_page, args=(0,))
+    if not query.strip():
+        st.info("Type a word or phrase to search the logs of every mission.")
+        return
+
+    search_page = st.session_state.search_page
+    total, results = search_questions(query, search_page, SEARCH_PAGE_SIZE)
+    if total and not results:
+        # The page ran past the end, e.g. after a mission was deleted.
+        search_page = st.session_state.search_page = 0
+        total, results = search_questions(query, search_page, SEARCH_PAGE_SIZE)
+    if not total:
+        st.info(f"No logs match '{query}'.")
+        return
+
+    start = search_page * SEARCH_PAGE_SIZE
+    if total > SEARCH_RANK_LIMIT:
+        total = SEARCH_RANK_LIMIT
+        st.caption(f"More than {SEARCH_RANK_LIMIT:,} logs match, newest missions first. Add words to rank them by relevance.")
+    st.caption(f"Showing {start + 1}-{start + len(results)} of {total:,} logs")
+    for result in results:
+        with st.container(border=True):
+            st.caption(f"{result['mission']} · Q{result['position'] + 1}")
+            st.markdown(f"**{result['question_en']}**")
+            if result["question_hi"]:
+                st.caption(f"({result['question_hi']})")
+            st.markdown(f"🔍 {result['snippet']}")
+            st.button("📖 Open in Study Notes", key=f"search_open_{result['id']}",
+                      on_click=open_in_notes, args=(result["mission"], result["position"]))
+
+    page_count = -(-total // SEARCH_PAGE_SIZE)
+    if page_count > 1:
+        nav_cols = st.columns([1, 1, 1])
+        with nav_cols[0]:
+            st.button("⬅️ Previous", use_container_width=True, disabled=(search_page == 0),
+                      on_click=set_search_page, args=(search_page - 1,))
+        with nav_cols[1]:
+            st.caption(f"Page {search_page + 1} of {page_count}")
+        with nav_cols[2]:
+            st.button("Next ➡️", use_container_width=True, disabled=(search_page >= page_count - 1),
+                      on_click=set_search_page, args=(search_page + 1,))
+
+def set_search_page(page):
+    """Callback to move the search results to another page."""
+    st.session_state.search_page = max(0, page)
+
+def open_in_notes(test_name, position):
+    """Callback: opens Study Notes on the page holding a search result, with its answer revealed."""
+    st.session_state.selected_test = test_name
+    st.session_state.current_screen = "notes"
+    st.session_state.notes_page = position // st.session_state.notes_page_size
+    st.session_state.revealed_answers = {position: True}
+
+@instrument("screen.analytics")
+def analytics_screen():
+    """Displays aggregate performance analysis across every recorded attempt and mission."""
+    st.title("📈 Mission Analytics")
+    if st.button("⬅️ Return to Hangar"):
+        st.session_state.current_screen = "home"
         st.rerun()
 
+    scores = analytics.score_frame(get_journal().scores())
+    if scores.empty:
+        st.info("No completed missions yet. Transmit a mission to start collecting analytics.")
+    else:
+        score_cols = st.columns(3)
+        score_cols[0].metric("Completed Missions", len(scores))
+        score_cols[1].metric("Average Success", f"{scores['Score %'].mean():.1f}%")
+        score_cols[2].metric("Missions Flown", scores["Mission"].nunique())
+
+        st.subheader("Scores by Mission")
+        st.dataframe(analytics.mission_summary(scores).round(1), use_container_width=True)
+        st.subheader("Score Distribution")
+        st.bar_chart(analytics.score_distribution(scores), x="Band", y="Attempts", color="Mission")
+        st.subheader("Score Trend")
+        trend = analytics.score_trend(scores)
+        st.line_chart(trend["Mean %"])
+        st.caption(f"{int(trend['Attempts'].sum())} attempts over {len(trend)} active days.")
+
+    st.divider()
+    st.subheader("Question Analysis")
+    test_name = st.selectbox("Mission", load_available_tests(), key="analytics_test")
+    try:
+        bank = load_test(test_name)
+    except KeyError:
+        st.error("Mission data is no longer available.")
+        return
+    attempts, correct, _ = bank.stats.bank_stats(bank.record)
+    answered = int((attempts > 0).sum())
+    if answered == 0:
+        st.info("No logs of this mission have been answered yet.")
+        return
+    st.caption(f"{answered} of {len(bank)} logs answered at least once.")
+    st.bar_chart(analytics.difficulty_histogram(attempts, correct))
+    st.markdown(f"**Hardest {analytics.HARDEST_QUESTIONS} logs** · option columns show how often each was picked")
+    hardest = bank.stats.hardest_questions(bank.record, analytics.HARDEST_QUESTIONS)
+    st.dataframe(analytics.hardest_questions_frame(hardest).round(1), hide_index=True, use_container_width=True)
+
 
 # --- MAIN APP CONTROLLER ---
 
 def main():
     """The main function that controls the app flow."""
+    configure_page()
+    try:
+        bootstrap()
+    except Exception as e:
+        st.error(f"Could not load or create default mission file: {e}")
+    if metrics.ENABLED:
+        metrics.install_element_counter()
+        metrics.start_rerun()
+    init_session_state()
     load_css()
-    
+
     screen = st.session_state.current_screen
-    if screen == "home": home_screen()
-    elif screen == "setup": setup_screen()
-    elif screen == "test": test_screen()
-    elif screen == "notes": notes_screen()
-    elif screen == "results": results_screen()
+    try:
+        if screen == "home": home_screen()
+        elif screen == "setup": setup_screen()
+        elif screen == "test": test_screen()
+        elif screen == "notes": notes_screen()
+        elif screen == "results": results_screen()
+        elif screen == "analytics": analytics_screen()
+        elif screen == "search": search_screen()
+        elif screen == "compose": compose_screen()
+        if metrics.ENABLED:
+            diagnostics_panel()
+    finally:
+        # Reruns triggered by st.rerun() end in an exception but are still recorded.
+        if metrics.ENABLED:
+            metrics.finish_rerun(screen, st.session_state)
 
 if __name__ == "__main__":
     main()
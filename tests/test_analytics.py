@@ -0,0 +1,51 @@
+"""
+Mission Analytics aggregates, and the score distribution chart for mission names that
+charts would otherwise misread, such as the "Mock: …" names of composite exams.
+
+    python -m pytest tests
+"""
+
+import unittest
+
+from quiz import analytics
+
+MOCK_NAME = "Mock: P0 + P1 +2"
+
+
+def scores():
+    return analytics.score_frame([
+        (MOCK_NAME, 1.7e9, 3, 10),
+        (MOCK_NAME, 1.7e9, 9, 10),
+        ("Alpha", 1.7e9, 10, 10),
+    ])
+
+
+def distribution_chart():
+    import streamlit as st
+
+    from quiz import analytics
+    from tests.test_analytics import scores
+    st.bar_chart(analytics.score_distribution(scores()), x="Band", y="Attempts", color="Mission")
+
+
+class ScoreDistributionTest(unittest.TestCase):
+
+    def test_counts_attempts_per_band_and_mission(self):
+        distribution = analytics.score_distribution(scores())
+        self.assertEqual(list(distribution.columns), ["Band", "Mission", "Attempts"])
+        self.assertEqual(len(distribution), len(analytics.SCORE_LABELS) * 2)
+        counts = distribution.set_index(["Mission", "Band"])["Attempts"]
+        self.assertEqual(counts[(MOCK_NAME, "20-40%")], 1)
+        self.assertEqual(counts[(MOCK_NAME, "80-100%")], 1)
+        self.assertEqual(counts[("Alpha", "80-100%")], 1)
+        self.assertEqual(counts[("Alpha", "0-20%")], 0)
+
+    def test_chart_accepts_a_mission_name_with_a_colon(self):
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_function(distribution_chart).run()
+        self.assertFalse(app.exception, app.exception and app.exception[0].value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Two NetworkBackend workers sharing one state server, each with its own question store:
+missions, deletions, attempts and statistics reach the other worker, and failed commits
+leave nothing behind.
+
+    python -m pytest tests
+"""
+
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from bench import make_synthetic_bank
+from quiz import backends
+from quiz.backends import NetworkBackend
+from quiz.bank import QuestionBankCache
+from quiz.ingest import ingest_csv
+from quiz.stateserver import start_server
+from quiz.store import QuestionStore
+
+
+def mission_csv(n, seed=0):
+    return make_synthetic_bank(n, seed).to_csv(index=False).encode("utf-8")
+
+
+class NetworkBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="quiz-backends-")
+        self.dir = self._tmp.name
+        self.server = start_server(os.path.join(self.dir, "state"))
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.state = self.server.state
+        self.a = self.worker("a")
+        self.b = self.worker("b")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._tmp.cleanup()
+
+    def worker(self, name):
+        return NetworkBackend(self.url, QuestionStore(os.path.join(self.dir, f"{name}.db")))
+
+    def import_ok(self, backend, *missions):
+        reports = backend.import_missions(list(missions))
+        for report in reports:
+            self.assertTrue(report.ok, report.fatal)
+        return reports
+
+    def test_upload_reaches_other_worker(self):
+        self.import_ok(self.a, ("Alpha", mission_csv(30)), ("Beta", mission_csv(20, seed=1)))
+        self.b.sync()
+        for name, count in (("Alpha", 30), ("Beta", 20)):
+            here, there = self.a.store.get_bank(name), self.b.store.get_bank(name)
+            self.assertEqual(there["question_count"], count)
+            self.assertEqual(there["first_question_id"], here["first_question_id"])
+        self.assertEqual(self.b.store.fetch_questions([here["first_question_id"]]),
+                         self.a.store.fetch_questions([here["first_question_id"]]))
+        self.assertFalse(self.b.sync(), "a second sync has nothing to apply")
+
+    def test_delete_reaches_other_worker(self):
+        self.import_ok(self.a, ("Alpha", mission_csv(30)))
+        self.b.sync()
+        self.assertTrue(self.b.delete_mission("Alpha"))
+        self.a.sync()
+        self.assertIsNone(self.a.store.get_bank("Alpha"))
+        self.assertIsNone(self.state.mission("Alpha"))
+
+    def test_attempt_resumes_and_grades_once_across_workers(self):
+        attempt_id = self.a.journal.start_attempt("Alpha", [5, 6, 7], 10, time.time())
+        self.a.journal.record_answer(attempt_id, 0, 2)
+        self.a.journal.record_answer(attempt_id, 2, 1)
+        self.a.journal.record_position(attempt_id, 1)
+        self.assertTrue(self.a.journal.flush())
+
+        attempt = self.b.journal.load_attempt(attempt_id)
+        self.assertEqual(attempt["question_ids"].tolist(), [5, 6, 7])
+        self.assertEqual(attempt["answers"].tolist(), [2, -1, 1])
+        self.assertEqual(attempt["last_position"], 1)
+        self.assertTrue(self.b.journal.finish_attempt(attempt_id, 2, 3))
+        self.assertFalse(self.a.journal.finish_attempt(attempt_id, 2, 3))
+        self.assertIsNone(self.b.journal.load_attempt("missing"))
+
+    def test_attempt_closes_without_a_score(self):
+        attempt_id = self.a.journal.start_attempt("Deleted", [5, 6], 1, time.time() - 3600)
+        self.assertTrue(self.a.journal.flush())
+        self.assertEqual(self.b.journal.pending_deadlines()[0][0], attempt_id)
+        self.assertTrue(self.b.journal.finish_attempt(attempt_id, None, None))
+        self.assertTrue(self.a.journal.load_attempt(attempt_id)["submitted"])
+        self.assertEqual(self.a.journal.pending_deadlines(), [])
+        self.assertEqual(self.a.journal.scores(), [])
+
+    def test_results_count_on_every_worker(self):
+        self.import_ok(self.a, ("Alpha", mission_csv(30)))
+        self.b.sync()
+        bank = QuestionBankCache(self.a.store, self.a.stats).get("Alpha")
+        bank.record_results([bank.first_question_id, bank.first_question_id + 1], [0, 1], [True, False])
+
+        attempts, correct, _ = self.b.stats.bank_stats(self.b.store.get_bank("Alpha"))
+        self.assertEqual(attempts[:3].tolist(), [1, 1, 0])
+        self.assertEqual(correct[:3].tolist(), [1, 0, 0])
+        hardest = self.b.stats.hardest_questions(self.b.store.get_bank("Alpha"), 5)
+        self.assertEqual([row["position"] for row in hardest], [1, 0])
+        self.assertEqual(hardest[0]["picks"], [0, 1, 0, 0])
+
+    def test_failed_publish_saves_nothing(self):
+        with mock.patch.object(self.state, "publish", side_effect=OSError("disk full")):
+            reports = self.a.import_missions([("Alpha", mission_csv(30)), ("Beta", mission_csv(20, seed=1))])
+        self.assertTrue(all(not report.ok and "disk full" in report.fatal for report in reports))
+        self.assertEqual(self.a.store.list_banks(), [])
+        self.assertIsNone(self.state.mission("Alpha"))
+        # The worker is still in sync, and its ids stay unique, once the server recovers.
+        self.import_ok(self.a, ("Beta", mission_csv(20, seed=1)))
+        self.b.sync()
+        self.assertEqual([bank["name"] for bank in self.b.store.list_banks()], ["Beta"])
+
+    def test_join_publishes_local_missions(self):
+        store = QuestionStore(os.path.join(self.dir, "c.db"))
+        self.assertTrue(ingest_csv(io.BytesIO(mission_csv(25, seed=2)), "Local", store).ok)
+        self.import_ok(self.a, ("Alpha", mission_csv(30)))
+        c = NetworkBackend(self.url, store)
+        self.b.sync()
+        for backend in (self.a, self.b):
+            backend.sync()
+            self.assertEqual(backend.store.get_bank("Local")["first_question_id"], c.store.get_bank("Local")["first_question_id"])
+        self.assertEqual(c.store.get_bank("Alpha")["first_question_id"], self.a.store.get_bank("Alpha")["first_question_id"])
+        self.assertEqual(sorted(bank["name"] for bank in c.store.list_banks()), ["Alpha", "Local"])
+
+    def test_journal_resends_until_the_server_commits(self):
+        commit = self.state.record
+        failures = iter([False, False])
+        with mock.patch.object(backends, "SYNC_RETRY_SECONDS", 0.05), \
+                mock.patch.object(self.state, "record", side_effect=lambda records: next(failures, None) is None and commit(records)):
+            attempt_id = self.a.journal.start_attempt("Alpha", [1, 2], 0, time.time())
+            self.a.journal.record_answer(attempt_id, 1, 3)
+            self.assertTrue(self.a.journal.flush())
+        self.assertIsNone(next(failures, None), "both failed commits were resent")
+        self.assertEqual(self.b.journal.load_attempt(attempt_id)["answers"].tolist(), [-1, 3])
+
+    def test_journal_drops_records_the_server_rejects(self):
+        self.a.journal._queue.put(["answer", "some-attempt", "not a position", 1, time.time()])
+        self.assertFalse(self.a.journal.flush())
+        attempt_id = self.a.journal.start_attempt("Alpha", [1, 2], 0, time.time())
+        self.assertTrue(self.a.journal.flush())
+        self.assertIsNotNone(self.b.journal.load_attempt(attempt_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
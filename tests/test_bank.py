@@ -0,0 +1,64 @@
+"""
+QuestionBankCache: entries are charged for everything their bank holds in memory, including
+the adaptive sampler and duplicate groups loaded after the bank was cached.
+
+    python -m pytest tests
+"""
+
+import io
+import os
+import tempfile
+import unittest
+
+from bench import make_synthetic_bank
+from quiz.bank import QuestionBankCache
+from quiz.ingest import ingest_csv
+from quiz.store import QuestionStore
+
+QUESTIONS = 200
+
+
+class QuestionBankCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="quiz-bank-")
+        self.store = QuestionStore(os.path.join(self._tmp.name, "questions.db"))
+        for i, name in enumerate(("Alpha", "Beta")):
+            csv = make_synthetic_bank(QUESTIONS, seed=i).to_csv(index=False).encode("utf-8")
+            self.assertTrue(ingest_csv(io.BytesIO(csv), name, self.store).ok)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_lazily_loaded_arrays_are_charged(self):
+        cache = QuestionBankCache(self.store)
+        bank = cache.get("Alpha")
+        self.assertEqual(cache.stats()["bytes"], QUESTIONS)
+
+        bank.sample_adaptive(10, distinct=True)
+        self.assertEqual(cache.stats()["bytes"], bank.nbytes)
+        self.assertGreater(bank.nbytes, QUESTIONS * 40)
+
+    def test_growing_entry_evicts_to_stay_within_budget(self):
+        # Room for one bank with its sampler (40 B per question), not for a second answer key too.
+        cache = QuestionBankCache(self.store, max_bytes=QUESTIONS * 41 + QUESTIONS // 2)
+        alpha = cache.get("Alpha")
+        cache.get("Beta")
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        alpha.sample_adaptive(10)
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+        self.assertEqual(stats["entries"], 1)
+        self.assertIs(cache.get("Alpha"), alpha, "the bank that grew is the most recently used")
+
+    def test_entry_larger_than_the_budget_is_dropped(self):
+        cache = QuestionBankCache(self.store, max_bytes=QUESTIONS * 2)
+        bank = cache.get("Alpha")
+        bank.duplicate_groups()
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
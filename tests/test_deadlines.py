@@ -0,0 +1,54 @@
+"""
+DeadlineScheduler: attempts expire at their deadline unless cancelled, and cancelling
+attempts that aren't scheduled leaves nothing behind.
+
+    python -m pytest tests
+"""
+
+import threading
+import time
+import unittest
+
+from quiz.deadlines import DeadlineScheduler
+
+
+class DeadlineSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expired = []
+        self.event = threading.Event()
+
+        def expire(attempt_id):
+            self.expired.append(attempt_id)
+            self.event.set()
+        self.scheduler = DeadlineScheduler(expire)
+
+    def test_expires_at_the_deadline_unless_cancelled(self):
+        now = time.time()
+        self.scheduler.schedule("cancelled", now + 0.05)
+        self.scheduler.schedule("due", now + 0.1)
+        self.scheduler.cancel("cancelled")
+        self.assertEqual(self.scheduler.pending(), 1)
+        self.assertTrue(self.event.wait(5))
+        self.assertEqual(self.expired, ["due"])
+        self.assertEqual(self.scheduler.pending(), 0)
+
+    def test_rescheduling_keeps_the_latest_deadline(self):
+        self.scheduler.schedule("a", time.time() + 0.05)
+        self.scheduler.schedule("a", time.time() + 0.2)
+        time.sleep(0.1)
+        self.assertEqual(self.expired, [])
+        self.assertTrue(self.event.wait(5))
+        self.assertEqual(self.expired, ["a"])
+
+    def test_cancelling_unscheduled_attempts_keeps_nothing(self):
+        self.scheduler.schedule("timed", time.time() + 3600)
+        for i in range(50):
+            self.scheduler.cancel(f"untimed-{i}")
+        self.scheduler.cancel("timed")
+        self.assertEqual(self.scheduler.pending(), 0)
+        self.assertEqual(self.scheduler._scheduled, {})
+
+
+if __name__ == "__main__":
+    unittest.main()